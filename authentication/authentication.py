@@ -1,10 +1,15 @@
 # authentication/authentication.py
 import traceback
+from functools import wraps
 import jwt
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.http import JsonResponse
 from rest_framework import authentication
 from rest_framework import exceptions
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
+from utils.mongo_client import get_async_db
 from .utils import get_user_by_id
 from .user_wrapper import AuthenticatedMongoUser
 
@@ -87,3 +92,41 @@ class MongoDBAuthentication(authentication.BaseAuthentication):
             print(f"Authentication error: {str(e)}")
             traceback.print_exc()
             raise exceptions.AuthenticationFailed(f"Authentication error: {str(e)}")
+
+
+async def authenticate_async(request):
+    """
+    The AuthenticatedMongoUser behind a request's bearer token, or None, for
+    async views; the same token check as MongoDBAuthentication, with the user
+    looked up through the async driver.
+    """
+    auth = authentication.get_authorization_header(request).split()
+    if len(auth) != 2 or auth[0].lower() != MongoDBAuthentication.keyword.lower().encode():
+        return None
+    try:
+        payload = jwt.decode(auth[1].decode(), settings.SECRET_KEY, algorithms=['HS256'])
+        user_id = ObjectId(payload.get('user_id'))
+    except (jwt.InvalidTokenError, UnicodeError, InvalidId, TypeError) as e:
+        print(f"Async authentication failed: {e}")
+        return None
+
+    user = await get_async_db()['users'].find_one({'_id': user_id}, {'password': 0})
+    if not user:
+        return None
+    user['_id'] = str(user['_id'])
+    return AuthenticatedMongoUser(user)
+
+
+def async_authenticated(view):
+    """Require a valid bearer token on an async view; sets request.user"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await authenticate_async(request)
+        if user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+        request.user = user
+        return await view(request, *args, **kwargs)
+
+    # Token authenticated like the DRF views, so no CSRF cookie is involved
+    wrapper.csrf_exempt = True
+    return wrapper
@@ -0,0 +1,8 @@
+# authentication/indexes.py
+INDEXES = [
+    {"collection": "users", "keys": [("email", 1)], "name": "email_1", "unique": True},
+]
+
+QUERY_SHAPES = [
+    {"name": "user by email", "collection": "users", "filter": {"email": "teacher@example.com"}},
+]
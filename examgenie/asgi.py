@@ -12,5 +12,31 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'examgenie.settings')
+# Route the async endpoints (papers/async_views.py, questions/async_views.py)
+os.environ.setdefault('ASYNC_VIEWS_ENABLED', 'True')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from papers.llm_client import close_async_ollama_client  # noqa: E402
+from utils.mongo_client import close_async_clients  # noqa: E402
+
+
+async def lifespan(scope, receive, send):
+    """Close the server loop's async Ollama and MongoDB clients on shutdown"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_ollama_client()
+            await close_async_clients()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    # Django's handler only speaks HTTP
+    if scope['type'] == 'lifespan':
+        await lifespan(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
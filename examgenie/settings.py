@@ -5,7 +5,6 @@ from datetime import timedelta
 from pathlib import Path
 from dotenv import load_dotenv
 import logging
-from mongoengine import connect
 # Load environment variables
 load_dotenv()
 
@@ -24,11 +23,15 @@ MONGODB_DB = os.getenv('MONGODB_DB')
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv('SECRET_KEY', 'django-insecure-default-key')
 
-
-connect(
-    db=MONGODB_DB,
-    host=MONGODB_URI
-)
+# Every module shares one MongoClient per process (utils/mongo_client.py)
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 50))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 300000))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 10000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 10000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 30000))
+# How new papers are stored: 'normalized' (papers/sections/questions) or 'embedded' (one document per paper)
+PAPER_STORAGE_LAYOUT = os.getenv('PAPER_STORAGE_LAYOUT', 'normalized')
 
 # Configure logging
 LOGGING = {
@@ -111,6 +114,10 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'examgenie.wsgi.application'
+ASGI_APPLICATION = 'examgenie.asgi.application'
+# The async endpoints are routed only when served by examgenie/asgi.py, which sets this;
+# under WSGI each async view would run on a new event loop per request
+ASYNC_VIEWS_ENABLED = os.getenv('ASYNC_VIEWS_ENABLED', 'False') == 'True'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
@@ -190,5 +197,77 @@ AWS_S3_OBJECT_PARAMETERS = {
     'CacheControl': 'max-age=86400',
 }
 
+# Question generation (Ollama) settings
+OLLAMA_URL = os.getenv('OLLAMA_URL', 'http://localhost:11434')
+OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'mistral')
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv('OLLAMA_CONNECT_TIMEOUT', 5))
+OLLAMA_READ_TIMEOUT = float(os.getenv('OLLAMA_READ_TIMEOUT', 300))
+OLLAMA_MAX_INFLIGHT = int(os.getenv('OLLAMA_MAX_INFLIGHT', 2))  # concurrent inference calls per process
+OLLAMA_QUEUE_TIMEOUT = float(os.getenv('OLLAMA_QUEUE_TIMEOUT', 300))
+OLLAMA_POOL_SIZE = int(os.getenv('OLLAMA_POOL_SIZE', 10))
+OLLAMA_MAX_PARALLEL_SECTIONS = int(os.getenv('OLLAMA_MAX_PARALLEL_SECTIONS', 4))
+GENERATION_JOB_WORKERS = int(os.getenv('GENERATION_JOB_WORKERS', 4))
+# A queued or running job with no progress for this many seconds is reported failed (e.g. its worker exited)
+GENERATION_JOB_TIMEOUT = int(os.getenv('GENERATION_JOB_TIMEOUT', 30 * 60))
+MAX_PAPER_VARIANTS = int(os.getenv('MAX_PAPER_VARIANTS', 4))
+# Over-generate this many candidates per slot for the assembler to pick exact quotas from
+# (1 = no choice: the assembler then only fixes section counts and marks)
+GENERATION_POOL_FACTOR = int(os.getenv('GENERATION_POOL_FACTOR', 2))
+ASSEMBLER_TIME_BUDGET_MS = float(os.getenv('ASSEMBLER_TIME_BUDGET_MS', 100))
+
+# Extra prompts allowed per section to fill slots left missing or invalid by the first answer
+LLM_REPAIR_ROUNDS = int(os.getenv('LLM_REPAIR_ROUNDS', 1))
+
+# Question generation backend: 'ollama', or 't5' / 't5-onnx' for the bundled question_gen_model on CPU
+QUESTION_GENERATION_BACKEND = os.getenv('QUESTION_GENERATION_BACKEND', 'ollama')
+T5_MODEL_DIR = os.getenv('T5_MODEL_DIR', os.path.join(BASE_DIR, 'question_gen_model'))
+T5_ONNX_DIR = os.getenv('T5_ONNX_DIR', os.path.join(BASE_DIR, 'question_gen_model_onnx'))  # manage.py export_t5_onnx
+T5_NUM_THREADS = int(os.getenv('T5_NUM_THREADS', 0))  # 0 keeps torch's default
+T5_NUM_BEAMS = int(os.getenv('T5_NUM_BEAMS', 1))  # 1 = greedy decoding
+T5_MAX_INPUT_TOKENS = int(os.getenv('T5_MAX_INPUT_TOKENS', 128))
+T5_MAX_NEW_TOKENS = int(os.getenv('T5_MAX_NEW_TOKENS', 64))
+T5_PROMPT_TEMPLATE = os.getenv(
+    'T5_PROMPT_TEMPLATE',
+    'generate {difficulty} {kind} {question_type} question: subject: {subject} topic: {topic}'
+)
+
+# Retrieval-first generation: reuse banked questions before asking the LLM
+QUESTION_BANK_ENABLED = os.getenv('QUESTION_BANK_ENABLED', 'True') == 'True'
+# Previous-year questions would inflate the PYQ overlap report, so they are opt-in
+QUESTION_BANK_INCLUDE_PYQ = os.getenv('QUESTION_BANK_INCLUDE_PYQ', 'False') == 'True'
+
+# LLM response cache: set LLM_CACHE_ENABLED=False to always call the model
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'True') == 'True'
+LLM_CACHE_TTL_SECONDS = int(os.getenv('LLM_CACHE_TTL_SECONDS', 7 * 24 * 60 * 60))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', 5000))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv('LLM_CACHE_MEMORY_ENTRIES', 256))
+# Per-stage generation timings kept in a capped collection
+GENERATION_METRICS_MAX_BYTES = int(os.getenv('GENERATION_METRICS_MAX_BYTES', 16 * 1024 * 1024))
+GENERATION_METRICS_MAX_DOCS = int(os.getenv('GENERATION_METRICS_MAX_DOCS', 50000))
+
+# Previous-year question listing (keyset pagination)
+PYQ_PAGE_SIZE = int(os.getenv('PYQ_PAGE_SIZE', 50))
+PYQ_MAX_PAGE_SIZE = int(os.getenv('PYQ_MAX_PAGE_SIZE', 500))
+# Most subjects a subject_name search expands to
+PYQ_SUBJECT_MATCH_LIMIT = int(os.getenv('PYQ_SUBJECT_MATCH_LIMIT', 20))
+
+# Serialized paper cache: in-process LRU, optionally backed by a shared CACHES alias (e.g. redis).
+# Without a shared alias each worker only sees its own invalidations, so run one worker or
+# keep PAPER_CACHE_TIMEOUT as short as a stale paper may be served
+PAPER_CACHE_ENTRIES = int(os.getenv('PAPER_CACHE_ENTRIES', 512))
+PAPER_CACHE_REDIS_URL = os.getenv('PAPER_CACHE_REDIS_URL', '')
+PAPER_CACHE_BACKEND = os.getenv('PAPER_CACHE_BACKEND', 'papers' if PAPER_CACHE_REDIS_URL else '')
+PAPER_CACHE_TIMEOUT = int(os.getenv('PAPER_CACHE_TIMEOUT', 3600))
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+if PAPER_CACHE_REDIS_URL:
+    CACHES['papers'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': PAPER_CACHE_REDIS_URL,
+        'TIMEOUT': PAPER_CACHE_TIMEOUT,
+    }
+
 # Storage settings
 DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
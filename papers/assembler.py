@@ -0,0 +1,184 @@
+# papers/assembler.py
+import random
+import time
+from .distribution import allocate_quota
+
+# Relative weight of each constraint in the assembler's cost function
+TOPIC_WEIGHT = 2      # per paper topic left uncovered
+REUSE_WEIGHT = 10     # per reuse of a question already placed in another paper of the set
+
+
+def paper_targets(paper_params):
+    """Exact category counts a paper built from `paper_params` should hit"""
+    total = sum(section['numQuestions'] for section in paper_params['sections'])
+    practical = allocate_quota(paper_params['practicalTheoretical'], total)
+    return {
+        'total_questions': total,
+        'total_marks': sum(s['numQuestions'] * s['marksPerQuestion'] for s in paper_params['sections']),
+        'difficulty': allocate_quota(paper_params['difficultyDistribution'], total),
+        'cognitive': allocate_quota(paper_params['cognitiveDistribution'], total),
+        'practical': practical.get('practical', 0),
+    }
+
+
+class PaperAssembler:
+    """
+    Select questions from a candidate pool so a paper hits exact quotas.
+
+    Every section slot is filled from candidates of that section. The selection
+    minimises the distance between the realised and target counts for difficulty,
+    cognitive level and practical questions, penalises uncovered topics and (when
+    building a set of papers) reuse of questions placed in earlier papers. A greedy
+    fill is followed by best-improvement swaps until no swap helps or the time
+    budget runs out. Total marks are met by construction because each slot carries
+    its section's marks.
+    """
+
+    def __init__(self, candidates, paper_params, time_budget_ms=100, seed=None, usage=None):
+        self.candidates = candidates
+        self.sections = paper_params['sections']
+        self.targets = paper_targets(paper_params)
+        self.deadline = time.perf_counter() + time_budget_ms / 1000.0
+        self.rng = random.Random(seed)
+        self.usage = usage if usage is not None else {}
+
+        # Only topics that some candidate can actually cover count against the paper
+        candidate_topics = {c.get('topic') for c in candidates}
+        self.required_topics = {t for t in paper_params.get('topics', []) if t in candidate_topics}
+        if len(self.required_topics) > self.targets['total_questions']:
+            self.required_topics = set()
+
+        self.difficulty = {key: 0 for key in self.targets['difficulty']}
+        self.cognitive = {key: 0 for key in self.targets['cognitive']}
+        self.practical = 0
+        self.topics = {}
+
+    # -- cost bookkeeping -------------------------------------------------
+
+    def _key_delta(self, counts, targets, out_key, in_key):
+        if out_key == in_key:
+            return 0
+        delta = 0
+        if out_key in targets:
+            current = counts[out_key]
+            delta += abs(current - 1 - targets[out_key]) - abs(current - targets[out_key])
+        if in_key in targets:
+            current = counts[in_key]
+            delta += abs(current + 1 - targets[in_key]) - abs(current - targets[in_key])
+        return delta
+
+    def swap_delta(self, out_idx, in_idx):
+        """Change in cost from replacing candidate `out_idx` (or nothing) with `in_idx`"""
+        out_q = self.candidates[out_idx] if out_idx is not None else {}
+        in_q = self.candidates[in_idx]
+
+        delta = self._key_delta(self.difficulty, self.targets['difficulty'],
+                                out_q.get('difficulty'), in_q.get('difficulty'))
+        delta += self._key_delta(self.cognitive, self.targets['cognitive'],
+                                 out_q.get('cognitiveLevel'), in_q.get('cognitiveLevel'))
+
+        practical_change = bool(in_q.get('isPractical')) - bool(out_q.get('isPractical'))
+        if practical_change:
+            target = self.targets['practical']
+            delta += abs(self.practical + practical_change - target) - abs(self.practical - target)
+
+        out_topic, in_topic = out_q.get('topic'), in_q.get('topic')
+        if out_topic != in_topic:
+            if out_topic in self.required_topics and self.topics.get(out_topic, 0) == 1:
+                delta += TOPIC_WEIGHT
+            if in_topic in self.required_topics and self.topics.get(in_topic, 0) == 0:
+                delta -= TOPIC_WEIGHT
+
+        delta += REUSE_WEIGHT * (self.usage.get(in_idx, 0) - (self.usage.get(out_idx, 0) if out_idx is not None else 0))
+        return delta
+
+    def _apply(self, idx, sign):
+        question = self.candidates[idx]
+        if question.get('difficulty') in self.difficulty:
+            self.difficulty[question['difficulty']] += sign
+        if question.get('cognitiveLevel') in self.cognitive:
+            self.cognitive[question['cognitiveLevel']] += sign
+        if question.get('isPractical'):
+            self.practical += sign
+        topic = question.get('topic')
+        self.topics[topic] = self.topics.get(topic, 0) + sign
+
+    # -- solver -----------------------------------------------------------
+
+    def solve(self):
+        """Return one list of candidate indexes per section"""
+        pools = []
+        for section in self.sections:
+            pool = [idx for idx, c in enumerate(self.candidates) if c.get('sectionName') == section['name']]
+            self.rng.shuffle(pool)  # random tie-breaking between equally good candidates
+            pools.append(pool)
+
+        # Greedy fill, slot by slot
+        chosen = []
+        for section, pool in zip(self.sections, pools):
+            picked = []
+            remaining = list(pool)
+            for _ in range(min(section['numQuestions'], len(remaining))):
+                best = min(remaining, key=lambda idx: self.swap_delta(None, idx))
+                remaining.remove(best)
+                picked.append(best)
+                self._apply(best, 1)
+            chosen.append(picked)
+
+        # Repair: best-improvement swaps within each section
+        improved = True
+        while improved and time.perf_counter() < self.deadline:
+            improved = False
+            for picked, pool in zip(chosen, pools):
+                picked_set = set(picked)
+                unpicked = [idx for idx in pool if idx not in picked_set]
+                best_delta, best_swap = 0, None
+                for position, out_idx in enumerate(picked):
+                    for in_idx in unpicked:
+                        delta = self.swap_delta(out_idx, in_idx)
+                        if delta < best_delta:
+                            best_delta, best_swap = delta, (position, out_idx, in_idx)
+                    if time.perf_counter() >= self.deadline:
+                        break
+                if best_swap:
+                    position, out_idx, in_idx = best_swap
+                    self._apply(out_idx, -1)
+                    self._apply(in_idx, 1)
+                    picked[position] = in_idx
+                    improved = True
+
+        return chosen
+
+    def report(self):
+        return {
+            'targets': self.targets,
+            'achieved': {
+                'difficulty': dict(self.difficulty),
+                'cognitive': dict(self.cognitive),
+                'practical': self.practical,
+                'uncovered_topics': sorted(t for t in self.required_topics if not self.topics.get(t)),
+            },
+        }
+
+
+def assemble_paper(candidates, paper_params, time_budget_ms=100, seed=None, usage=None):
+    """
+    Pick questions for one paper from `candidates`.
+
+    Returns the selected questions (copies, in section order, with each section's
+    marks) and a report of target versus achieved counts. `usage` maps candidate
+    indexes to how often they were already used; it is updated in place so that
+    successive calls build papers with minimal overlap.
+    """
+    assembler = PaperAssembler(candidates, paper_params, time_budget_ms, seed, usage)
+    chosen = assembler.solve()
+
+    questions = []
+    for section, picked in zip(paper_params['sections'], chosen):
+        for idx in picked:
+            question = dict(candidates[idx])
+            question['marks'] = section['marksPerQuestion']
+            questions.append(question)
+            if usage is not None:
+                usage[idx] = usage.get(idx, 0) + 1
+    return questions, assembler.report()
@@ -0,0 +1,181 @@
+# papers/async_views.py
+"""
+Async counterparts of the I/O-bound paper endpoints, for deployments served
+through examgenie/asgi.py (e.g. `uvicorn examgenie.asgi:application`).
+
+They share their logic with papers/views.py but talk to MongoDB through motor
+and to Ollama through httpx, so a request waiting on either holds no thread.
+Blocking steps that have no async form (question bank and LLM cache lookups,
+T5 inference, PDF rendering, assembly) borrow a worker thread only while they
+run.
+"""
+import asyncio
+import json
+import traceback
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+from authentication.authentication import async_authenticated
+from utils.async_db import get_paper, get_paper_sections, insert_paper_bundle
+from utils.mongo_client import get_async_db
+from utils.paper_cache import get_paper_cache
+from .llm_client import get_async_ollama_client
+from .pagination import KEYSET_SORT, InvalidCursor, encode_cursor
+from .steps import run_steps_async
+from .subjects import search_subjects_async
+from .timing import StageTimer, record_stage_timings
+from .views import (
+    InvalidGenerationParam, PaperViewSet, positive_int_param, pyq_question_json, pyq_question_query,
+    render_paper_pdf, require_generation_fields,
+)
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder)
+
+
+async def generate_questions_async(view, paper_params, timer):
+    """generate_questions_with_ollama on the event loop: every section is one task"""
+    client = get_async_ollama_client()
+    section_results = await asyncio.gather(*(
+        run_steps_async(view.section_generation_steps(paper_params, section, client.model, timer), client)
+        for section in paper_params['sections']
+    ))
+    return view.number_questions(paper_params, section_results)
+
+
+async def get_serialized_paper_async(paper_id):
+    """get_serialized_paper with the async driver"""
+    async def load():
+        paper = await get_paper(paper_id)
+        if not paper:
+            return None
+        sections = await get_paper_sections(paper)
+        questions = [question for section in sections for question in section["questions"]]
+        return PaperViewSet().serialize_paper_docs(paper, sections, questions)
+    return await get_paper_cache().aget_or_load(paper_id, load)
+
+
+@async_authenticated
+async def generate_paper(request):
+    """POST: generate and store one paper, like PaperViewSet.generate"""
+    if request.method != 'POST':
+        return json_response({'error': 'Method not allowed'}, status=405)
+
+    view = PaperViewSet()
+    try:
+        data = json.loads(request.body) if request.body else view.get_dummy_paper_params()
+    except ValueError as e:
+        return json_response({'error': f'Invalid JSON: {e}'}, status=400)
+
+    try:
+        require_generation_fields(data)
+        user_id = str(request.user._id)
+
+        # Variant sets and background jobs stay on the sync endpoint
+        variants = positive_int_param(request.GET.get('variants') or data.get('variants'), 'variants')
+        if variants > 1 or request.GET.get('mode') == 'job' or data.get('mode') == 'job':
+            return json_response(
+                {'error': 'Variants and job mode are served by /api/papers/generate/'}, status=400
+            )
+
+        timer = StageTimer()
+
+        # 1. Over-generate the questions and assemble the paper to its quotas
+        candidates = await generate_questions_async(view, view.pool_params(data, view.pool_factor(data)), timer)
+        generated_questions = await sync_to_async(view.assemble_candidates, thread_sensitive=False)(
+            candidates, data, timer
+        )
+
+        # 2. Write the published paper, its sections and its questions in one go
+        with timer.stage('persist'):
+            paper_doc, section_docs, question_docs = await insert_paper_bundle(
+                view.paper_record(data), user_id, data['sections'], generated_questions
+            )
+
+        # 3. Return the paper data, serialized from the documents just written
+        with timer.stage('serialize'):
+            paper_data = view.serialize_paper_docs(paper_doc, section_docs, question_docs)
+
+        response = json_response(paper_data, status=201)
+        response['Server-Timing'] = timer.server_timing_header()
+        await sync_to_async(record_stage_timings, thread_sensitive=False)(timer, 'generate-async', user_id)
+        return response
+
+    except InvalidGenerationParam as e:
+        return json_response({'error': str(e)}, status=400)
+    except Exception as e:
+        traceback.print_exc()
+        return json_response({'error': str(e)}, status=500)
+
+
+@async_authenticated
+async def list_questions(request):
+    """GET: PYQ listing, keyset-paginated or streamed as NDJSON, like PaperViewSet.get_questions"""
+    if request.method != 'GET':
+        return json_response({'error': 'Method not allowed'}, status=405)
+
+    try:
+        subject_name = request.GET.get('subject_name')
+        subjects = None
+        if subject_name:
+            subjects = await search_subjects_async(subject_name, limit=settings.PYQ_SUBJECT_MATCH_LIMIT)
+        filter_query, page_size = pyq_question_query(request.GET, subjects)
+        collection = get_async_db()["pyq_questions"]
+
+        # Stream straight from the Mongo cursor, one JSON document per line
+        if request.GET.get('format') == 'ndjson':
+            cursor = collection.find(filter_query).sort(KEYSET_SORT)
+            if page_size:
+                cursor = cursor.limit(page_size)
+
+            async def lines():
+                async for question in cursor:
+                    yield pyq_question_json(question)
+            return StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+
+        # One page, plus one document to tell whether more follow
+        page_size = page_size or settings.PYQ_PAGE_SIZE
+        questions = await collection.find(filter_query).sort(KEYSET_SORT).limit(page_size + 1).to_list(None)
+        has_more = len(questions) > page_size
+        questions = questions[:page_size]
+        next_cursor = encode_cursor(questions[-1]) if has_more else None
+
+        for question in questions:
+            question['_id'] = str(question['_id'])
+            question['isEditing'] = False
+
+        return json_response({
+            'success': True,
+            'questions': questions,
+            'count': len(questions),
+            'next_cursor': next_cursor
+        })
+
+    except (InvalidCursor, ValueError) as e:
+        return json_response({'error': str(e)}, status=400)
+    except Exception as e:
+        return json_response({'error': f'Failed to fetch questions: {str(e)}'}, status=500)
+
+
+@async_authenticated
+async def download_paper_pdf(request, paper_id):
+    """GET: the paper rendered as PDF, like views.download_paper_pdf"""
+    try:
+        paper = await get_serialized_paper_async(paper_id)
+        if not paper or paper["user_id"] != str(request.user._id):
+            return json_response({"error": "Paper not found"}, status=404)
+
+        # xhtml2pdf is CPU-bound; keep it off the event loop
+        buffer = await sync_to_async(render_paper_pdf, thread_sensitive=False)(paper)
+        if buffer is None:
+            return json_response({"error": "PDF generation failed"}, status=500)
+
+        return HttpResponse(buffer.getvalue(), content_type='application/pdf', headers={
+            'Content-Disposition': f'attachment; filename="{paper["title"]}.pdf"'
+        })
+
+    except Exception as e:
+        traceback.print_exc()
+        return json_response({"error": str(e)}, status=500)
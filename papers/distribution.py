@@ -0,0 +1,28 @@
+# papers/distribution.py
+
+
+def allocate_quota(distribution, total):
+    """
+    Turn a percentage distribution into exact integer counts that add up to `total`.
+
+    Uses the largest remainder method, e.g. {'easy': 30, 'medium': 50, 'hard': 20}
+    over 7 questions gives {'easy': 2, 'medium': 4, 'hard': 1}.
+    """
+    weights = {category: max(float(weight or 0), 0.0) for category, weight in distribution.items()}
+    weight_sum = sum(weights.values())
+    if total <= 0 or not weights:
+        return {category: 0 for category in weights}
+    if weight_sum == 0:
+        weights = {category: 1.0 for category in weights}
+        weight_sum = float(len(weights))
+
+    exact = {category: total * weight / weight_sum for category, weight in weights.items()}
+    counts = {category: int(value) for category, value in exact.items()}
+
+    # Hand the leftover slots to the categories with the largest fractional parts
+    leftover = total - sum(counts.values())
+    by_remainder = sorted(exact, key=lambda category: exact[category] - counts[category], reverse=True)
+    for category in by_remainder[:leftover]:
+        counts[category] += 1
+    return counts
+
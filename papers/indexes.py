@@ -0,0 +1,83 @@
+# papers/indexes.py
+from bson import ObjectId
+from datetime import datetime, timezone
+from .pagination import KEYSET_SORT, encode_cursor
+from .retrieval import bank_match, pyq_bank_match
+from .subjects import _subject_search
+from .views import pyq_question_query
+
+# Placeholder values for explain(); only the shape of each query matters
+_ID = ObjectId()
+_NOW = datetime.now(timezone.utc)
+
+INDEXES = [
+    # Generated papers
+    {"collection": "papers", "keys": [("user_id", 1), ("created_at", -1)], "name": "user_created"},
+    {"collection": "papers", "keys": [("sections.questions._id", 1)], "name": "embedded_question_id", "sparse": True},
+    {"collection": "sections", "keys": [("paper_id", 1), ("order", 1)], "name": "paper_order"},
+    {"collection": "questions", "keys": [("section_id", 1)], "name": "section_id_1"},
+    {"collection": "questions", "keys": [("paper_id", 1)], "name": "paper_id_1"},
+    {"collection": "questions", "keys": [
+        ("subject_name", 1), ("question_type", 1), ("marks", 1), ("difficulty", 1), ("topic", 1),
+    ], "name": "bank_lookup"},
+
+    # Uploaded previous-year questions
+    # Unique: concurrent uploads of the same question cannot both insert it
+    {"collection": "pyq_questions", "keys": [("hash", 1)], "name": "hash_1", "unique": True},
+    {"collection": "pyq_questions", "keys": [("subject_code", 1), ("unit", 1), ("uploaded_at", -1), ("_id", -1)],
+     "name": "subject_code_unit_uploaded"},
+    {"collection": "pyq_questions", "keys": [("uploaded_at", -1), ("_id", -1)], "name": "uploaded_at_id"},
+    {"collection": "pyq_questions", "keys": [("uploaded_by", 1), ("uploaded_at", -1)], "name": "uploaded_by_uploaded"},
+    {"collection": "pyq_questions", "keys": [("subject_key", 1), ("marks", 1)], "name": "pyq_bank_lookup"},
+    {"collection": "pyq_questions", "keys": [("subject_key", 1), ("uploaded_at", -1), ("_id", -1)],
+     "name": "subject_key_uploaded"},
+    {"collection": "pyq_subjects", "keys": [("subject_key", 1)], "name": "subject_key_1"},
+    {"collection": "pyq_subjects", "keys": [("subject_code_key", 1)], "name": "subject_code_key_1"},
+    {"collection": "pyq_subjects", "keys": [("subject_words", 1)], "name": "subject_words_1"},
+
+    # Generation bookkeeping
+    # Mongo drops cache entries once expires_at has passed
+    {"collection": "llm_cache", "keys": [("expires_at", 1)], "name": "expires_at_1", "expireAfterSeconds": 0},
+    {"collection": "llm_cache", "keys": [("last_used_at", 1)], "name": "last_used_at_1"},
+    {"collection": "generation_metrics", "keys": [("created_at", 1)], "name": "created_at_1"},
+]
+
+# Filters come from the helpers the views and lookups query with, so the check
+# cannot drift from production. The bank lookups are aggregates starting with a
+# $match, which the server plans exactly like a find with that filter.
+_PAPER = {"subjectName": "Database Management Systems", "topics": ["SQL", "Normalization"]}
+_SECTION = {"name": "Section A", "questionType": "descriptive", "marksPerQuestion": 5}
+_LISTING_SORT = dict(KEYSET_SORT)
+
+QUERY_SHAPES = [
+    {"name": "latest paper of a user", "collection": "papers",
+     "filter": {"user_id": "user"}, "sort": {"created_at": -1}},
+    {"name": "paper containing an embedded question", "collection": "papers",
+     "filter": {"sections.questions._id": _ID}},
+    {"name": "sections of a paper", "collection": "sections",
+     "filter": {"paper_id": _ID}, "sort": {"order": 1}},
+    {"name": "questions of a section", "collection": "questions", "filter": {"section_id": _ID}},
+    {"name": "questions of a paper", "collection": "questions", "filter": {"paper_id": _ID}},
+    {"name": "question bank lookup", "collection": "questions",
+     "filter": bank_match(_PAPER, _SECTION, "easy")},
+    {"name": "pyq duplicate check", "collection": "pyq_questions", "filter": {"hash": {"$in": ["0" * 32, "1" * 32]}}},
+    {"name": "pyq listing", "collection": "pyq_questions",
+     "filter": pyq_question_query({})[0], "sort": _LISTING_SORT},
+    {"name": "pyq listing, next page", "collection": "pyq_questions",
+     "filter": pyq_question_query({"cursor": encode_cursor({"_id": _ID, "uploaded_at": _NOW})})[0],
+     "sort": _LISTING_SORT},
+    {"name": "pyq listing by subject code and unit", "collection": "pyq_questions",
+     "filter": pyq_question_query({"subject_code": "414441", "unit": "1"})[0], "sort": _LISTING_SORT},
+    {"name": "pyq upload history", "collection": "pyq_questions",
+     "filter": pyq_question_query({"uploaded_by": "1"})[0], "sort": _LISTING_SORT},
+    {"name": "pyq bank lookup", "collection": "pyq_questions", "filter": pyq_bank_match(_PAPER, _SECTION)},
+    {"name": "pyq listing by subject", "collection": "pyq_questions",
+     "filter": pyq_question_query({}, [{"subject_key": "data structures"}, {"subject_key": "database management"}])[0],
+     "sort": _LISTING_SORT},
+    {"name": "subject autocomplete", "collection": "pyq_subjects", "filter": _subject_search("data")[0]},
+    {"name": "subject autocomplete, several words", "collection": "pyq_subjects",
+     "filter": _subject_search("database manage")[0]},
+    {"name": "llm cache eviction order", "collection": "llm_cache", "filter": {}, "sort": {"last_used_at": 1}},
+    {"name": "generation metrics window", "collection": "generation_metrics",
+     "filter": {"created_at": {"$gte": _NOW}}},
+]
@@ -0,0 +1,193 @@
+# papers/jobs.py
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from django.conf import settings
+from utils.db_utils import db, delete_draft_paper, insert_questions, update_paper_status
+from .timing import StageTimer, record_stage_timings
+
+ACTIVE_STATUSES = ["queued", "running"]
+STALE_JOB_ERROR = "Generation stopped making progress (its worker exited or stalled)"
+
+
+
+class JobExpired(Exception):
+    """The job was expired (see expire_stale_jobs) while its worker was still on it"""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process-wide worker pool used for generation jobs"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.GENERATION_JOB_WORKERS,
+                thread_name_prefix='generation-job'
+            )
+            # First job in this process: clear out jobs orphaned by earlier ones
+            try:
+                expire_stale_jobs()
+            except Exception as e:
+                print(f"Stale generation job sweep failed: {e}")
+    return _executor
+
+
+def create_job(paper_id, user_id, sections_total):
+    now = datetime.now(timezone.utc)
+    job_doc = {
+        "type": "generate_paper",
+        "paper_id": paper_id,
+        "user_id": user_id,
+        "status": "queued",
+        "progress": 0,
+        "sections_total": sections_total,
+        "sections_done": 0,
+        "question_count": 0,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+        "started_at": None,
+        "finished_at": None,
+    }
+    return db['jobs'].insert_one(job_doc).inserted_id
+
+
+def update_job(job_id, **fields):
+    fields['updated_at'] = datetime.now(timezone.utc)
+    db['jobs'].update_one({'_id': ObjectId(job_id)}, {'$set': fields})
+
+
+def update_running_job(job_id, **fields):
+    """update_job for the job's own worker: applies only while the job is still running, else raises JobExpired"""
+    fields['updated_at'] = datetime.now(timezone.utc)
+    result = db['jobs'].update_one({'_id': ObjectId(job_id), 'status': 'running'}, {'$set': fields})
+    if not result.matched_count:
+        raise JobExpired(f"Generation job {job_id} is no longer running")
+
+
+def get_job(job_id):
+    job = db['jobs'].find_one({'_id': ObjectId(job_id)})
+    if job and job['status'] in ACTIVE_STATUSES and expire_stale_jobs({'_id': job['_id']}):
+        job = db['jobs'].find_one({'_id': job['_id']})
+    return job
+
+
+def fail_job(job_id, paper_id, error):
+    """Mark a job failed and remove the draft paper it was filling in"""
+    update_job(job_id, status="failed", error=error, finished_at=datetime.now(timezone.utc))
+    try:
+        delete_draft_paper(paper_id)
+    except Exception as e:
+        print(f"Failed to remove the draft paper {paper_id} of job {job_id}: {e}")
+
+
+def expire_stale_jobs(job_filter=None):
+    """
+    Report queued or running jobs that made no progress for GENERATION_JOB_TIMEOUT
+    seconds as failed, and remove their draft papers. Such jobs belonged to a
+    process that exited (jobs live in an in-process pool) or are stuck.
+    Returns how many jobs were expired.
+    """
+    now = datetime.now(timezone.utc)
+    stale = {
+        'status': {'$in': ACTIVE_STATUSES},
+        'updated_at': {'$lt': now - timedelta(seconds=settings.GENERATION_JOB_TIMEOUT)},
+    }
+    stale.update(job_filter or {})
+
+    expired = 0
+    for job in db['jobs'].find(stale, {'paper_id': 1}):
+        # Same filter again, so a job that progressed in the meantime is left alone
+        result = db['jobs'].update_one(dict(stale, _id=job['_id']), {'$set': {
+            'status': 'failed', 'error': STALE_JOB_ERROR, 'finished_at': now, 'updated_at': now,
+        }})
+        if result.modified_count:
+            expired += 1
+            try:
+                delete_draft_paper(job['paper_id'])
+            except Exception as e:
+                print(f"Failed to remove the draft paper {job['paper_id']} of stale job {job['_id']}: {e}")
+    return expired
+
+
+def serialize_job(job):
+    return {
+        "id": str(job["_id"]),
+        "paper_id": str(job["paper_id"]),
+        "status": job["status"],
+        "progress": job["progress"],
+        "sections_total": job["sections_total"],
+        "sections_done": job["sections_done"],
+        "question_count": job["question_count"],
+        "error": job.get("error"),
+        "created_at": job["created_at"],
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+    }
+
+
+def enqueue_generation_job(job_id, paper_id, section_ids, paper_params, generate_questions):
+    """
+    Queue a paper for background generation. `generate_questions(paper_params,
+    on_section_done, timer)` is the view's generator, the same one the
+    synchronous endpoint uses.
+    """
+    get_executor().submit(
+        run_generation_job, job_id, paper_id, section_ids, paper_params, generate_questions
+    )
+
+
+def run_generation_job(job_id, paper_id, section_ids, paper_params, generate_questions):
+    try:
+        now = datetime.now(timezone.utc)
+        started = db['jobs'].update_one(
+            {'_id': ObjectId(job_id), 'status': 'queued'},
+            {'$set': {'status': 'running', 'started_at': now, 'updated_at': now}}
+        )
+        if not started.modified_count:
+            # Expired while it waited for a worker
+            return
+        timer = StageTimer()
+
+        def on_section_done(sections_done, sections_total):
+            # Keep the last few percent for inserting the questions; an expired job stops here
+            update_running_job(
+                job_id,
+                sections_done=sections_done,
+                progress=int(sections_done / sections_total * 90)
+            )
+
+        generated_questions = generate_questions(paper_params, on_section_done=on_section_done, timer=timer)
+
+        with timer.stage('persist'):
+            # Its draft paper is gone if the job expired during generation; don't write into it
+            update_running_job(job_id, progress=90)
+            question_docs = insert_questions(generated_questions, paper_id, section_ids)
+            try:
+                update_running_job(
+                    job_id,
+                    status="completed",
+                    progress=100,
+                    question_count=len(question_docs),
+                    finished_at=datetime.now(timezone.utc)
+                )
+            except JobExpired:
+                # Expired during the insert: drop what the expiry sweep could not see yet
+                delete_draft_paper(paper_id)
+                db['questions'].delete_many({'paper_id': ObjectId(paper_id)})
+                raise
+            update_paper_status(paper_id)
+        record_stage_timings(timer, 'generate-job', get_job(job_id)['user_id'])
+
+    except JobExpired as e:
+        # Already reported as failed; the expiry removed the draft paper
+        print(f"Stopped generation: {e}")
+    except Exception as e:
+        traceback.print_exc()
+        fail_job(job_id, paper_id, str(e))
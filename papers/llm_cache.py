@@ -0,0 +1,152 @@
+# papers/llm_cache.py
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING
+from django.conf import settings
+from utils.db_utils import db
+from utils.indexes import ensure_collection_indexes
+
+
+def make_cache_key(prompt, model):
+    """Canonical hash of a prompt and model; indentation and spacing in the prompt template are ignored"""
+    canonical_prompt = ' '.join(prompt.split())
+    payload = json.dumps({'model': model, 'prompt': canonical_prompt}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Two-level cache of raw LLM responses.
+
+    A small in-process LRU sits in front of a Mongo collection that holds the
+    shared copy. Entries expire after `ttl_seconds` (enforced by a TTL index and
+    on read), and the collection is trimmed back to `max_entries` by evicting the
+    least recently used documents.
+    """
+
+    def __init__(self, collection_name, ttl_seconds, max_entries, memory_entries):
+        self.collection = db[collection_name]
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()  # key -> (response, expires_at)
+        self.lock = threading.Lock()
+        self.counters = {
+            'memory_hits': 0,
+            'store_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+            'errors': 0,
+        }
+
+    def get(self, prompt, model):
+        key = make_cache_key(prompt, model)
+        now = datetime.now(timezone.utc)
+
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry:
+                response, expires_at = entry
+                if expires_at > now:
+                    self.memory.move_to_end(key)
+                    self.counters['memory_hits'] += 1
+                    return response
+                del self.memory[key]
+
+        try:
+            doc = self.collection.find_one_and_update(
+                {'_id': key, 'expires_at': {'$gt': now}},
+                {'$set': {'last_used_at': now}, '$inc': {'hits': 1}}
+            )
+        except Exception as e:
+            print(f"LLM cache lookup failed: {e}")
+            doc = None
+            self._count('errors')
+
+        if not doc:
+            self._count('misses')
+            return None
+
+        self._remember(key, doc['response'], doc['expires_at'])
+        self._count('store_hits')
+        return doc['response']
+
+    def set(self, prompt, model, response):
+        key = make_cache_key(prompt, model)
+        now = datetime.now(timezone.utc)
+        expires_at = now + self.ttl
+
+        self._remember(key, response, expires_at)
+        try:
+            self._ensure_indexes()
+            self.collection.replace_one({'_id': key}, {
+                'model': model,
+                'response': response,
+                'hits': 0,
+                'created_at': now,
+                'last_used_at': now,
+                'expires_at': expires_at,
+            }, upsert=True)
+            self._count('stores')
+            self._evict_least_recently_used()
+        except Exception as e:
+            print(f"LLM cache store failed: {e}")
+            self._count('errors')
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+            counters['memory_size'] = len(self.memory)
+        lookups = counters['memory_hits'] + counters['store_hits'] + counters['misses']
+        counters['hit_rate'] = round((lookups - counters['misses']) / lookups, 4) if lookups else 0
+        return counters
+
+    def _remember(self, key, response, expires_at):
+        if expires_at.tzinfo is None:
+            # pymongo hands back naive UTC datetimes
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        with self.lock:
+            self.memory[key] = (response, expires_at)
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+
+    def _evict_least_recently_used(self):
+        overflow = self.collection.estimated_document_count() - self.max_entries
+        if overflow <= 0:
+            return
+        stale = self.collection.find({}, {'_id': 1}).sort('last_used_at', ASCENDING).limit(overflow)
+        stale_ids = [doc['_id'] for doc in stale]
+        if stale_ids:
+            deleted = self.collection.delete_many({'_id': {'$in': stale_ids}}).deleted_count
+            self._count('evictions', deleted)
+
+    def _ensure_indexes(self):
+        # TTL index on expires_at and LRU order on last_used_at, declared in papers/indexes.py
+        ensure_collection_indexes(self.collection.name)
+
+    def _count(self, counter, amount=1):
+        with self.lock:
+            self.counters[counter] += amount
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide LLM response cache"""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = LLMResponseCache(
+                collection_name='llm_cache',
+                ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+                max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+                memory_entries=settings.LLM_CACHE_MEMORY_ENTRIES,
+            )
+    return _response_cache
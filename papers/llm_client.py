@@ -0,0 +1,403 @@
+# papers/llm_client.py
+import asyncio
+import collections
+import json
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+
+class OllamaQueueTimeout(Exception):
+    """Raised when a request waits too long for a free inference slot"""
+    pass
+
+
+class _Waiter:
+    def __init__(self, wake):
+        self.wake = wake
+        self.granted = False
+
+
+class InflightLimit:
+    """
+    Process-wide cap on in-flight Ollama requests, shared by the sync client's
+    threads and the async client's coroutines.
+
+    Works like a BoundedSemaphore whose waiters can be threads (acquire) or
+    coroutines (acquire_async); a released slot is handed straight to the
+    longest waiter, whichever kind it is.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.waiters = collections.deque()
+
+    def _enter(self, waiter):
+        """Take a free slot, or queue `waiter` for the next released one"""
+        with self.lock:
+            if self.in_use < self.limit and not self.waiters:
+                self.in_use += 1
+                return True
+            self.waiters.append(waiter)
+            return False
+
+    def _give_up(self, waiter):
+        """Leave the queue after a timeout; True if a slot arrived meanwhile"""
+        with self.lock:
+            if waiter.granted:
+                return True
+            self.waiters.remove(waiter)
+            return False
+
+    def acquire(self, timeout=None):
+        event = threading.Event()
+        waiter = _Waiter(event.set)
+        if self._enter(waiter) or event.wait(timeout):
+            return True
+        return self._give_up(waiter)
+
+    async def acquire_async(self, timeout=None):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = _Waiter(wake)
+        if self._enter(waiter):
+            return True
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return self._give_up(waiter)
+        except asyncio.CancelledError:
+            if self._give_up(waiter):
+                self.release()
+            raise
+
+    def release(self):
+        with self.lock:
+            while self.waiters:
+                waiter = self.waiters.popleft()
+                waiter.granted = True
+                try:
+                    waiter.wake()
+                    return
+                except RuntimeError:
+                    # The waiter's event loop has closed; try the next one
+                    waiter.granted = False
+            if self.in_use <= 0:
+                raise ValueError("InflightLimit released too many times")
+            self.in_use -= 1
+
+    def stats(self):
+        with self.lock:
+            return {'limit': self.limit, 'in_use': self.in_use, 'waiting': len(self.waiters)}
+
+
+class OllamaClient:
+    """
+    Shared HTTP client for the Ollama API.
+
+    Connections are kept alive in a pooled `requests.Session`, every call has
+    connect/read timeouts, and an InflightLimit caps how many inference
+    requests are in flight at once so bursts queue here instead of piling onto
+    Ollama. Pass the same `slots` to the async client to share the cap.
+    """
+
+    def __init__(self, base_url, model, connect_timeout, read_timeout,
+                 max_inflight, queue_timeout, pool_size, slots=None):
+        self.generate_url = f"{base_url.rstrip('/')}/api/generate"
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_inflight = max_inflight
+        self.queue_timeout = queue_timeout
+
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+        self.slots = slots or InflightLimit(max_inflight)
+        self.lock = threading.Lock()
+        self.metrics = {
+            'requests': 0,
+            'failures': 0,
+            'queue_timeouts': 0,
+            'waiting': 0,
+            'in_flight': 0,
+            'total_wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+        }
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the inference slots for the duration of the block"""
+        started = time.monotonic()
+        with self.lock:
+            self.metrics['waiting'] += 1
+        acquired = self.slots.acquire(timeout=self.queue_timeout)
+        waited = time.monotonic() - started
+
+        with self.lock:
+            self.metrics['waiting'] -= 1
+            self.metrics['total_wait_seconds'] += waited
+            self.metrics['max_wait_seconds'] = max(self.metrics['max_wait_seconds'], waited)
+            if not acquired:
+                self.metrics['queue_timeouts'] += 1
+            else:
+                self.metrics['requests'] += 1
+                self.metrics['in_flight'] += 1
+
+        if not acquired:
+            raise OllamaQueueTimeout(f"No free Ollama slot after {waited:.1f}s")
+
+        try:
+            yield
+        except Exception:
+            with self.lock:
+                self.metrics['failures'] += 1
+            raise
+        finally:
+            with self.lock:
+                self.metrics['in_flight'] -= 1
+            self.slots.release()
+
+    def generate(self, prompt, model=None):
+        """Run a prompt to completion and return the generated text"""
+        with self.slot():
+            response = self.session.post(
+                self.generate_url,
+                json={
+                    'model': model or self.model,
+                    'prompt': prompt,
+                    'stream': False
+                },
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            return response.json().get('response', '')
+
+    def stream_generate(self, prompt, model=None):
+        """Yield chunks of generated text as Ollama streams them back"""
+        with self.slot():
+            with self.session.post(
+                self.generate_url,
+                json={
+                    'model': model or self.model,
+                    'prompt': prompt,
+                    'stream': True
+                },
+                timeout=self.timeout,
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                # Ollama sends one JSON object per line, each carrying the next few tokens
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    yield chunk.get('response', '')
+                    if chunk.get('done'):
+                        break
+
+    def stats(self):
+        with self.lock:
+            metrics = dict(self.metrics)
+        waits = metrics['requests'] + metrics['queue_timeouts']
+        metrics['avg_wait_seconds'] = round(metrics['total_wait_seconds'] / waits, 4) if waits else 0
+        metrics['total_wait_seconds'] = round(metrics['total_wait_seconds'], 4)
+        metrics['max_wait_seconds'] = round(metrics['max_wait_seconds'], 4)
+        metrics['max_inflight'] = self.max_inflight
+
+        pools = []
+        pool_manager = self.adapter.poolmanager
+        for key in pool_manager.pools.keys():
+            pool = pool_manager.pools.get(key)
+            if pool is None:
+                continue
+            pools.append({
+                'host': f"{pool.scheme}://{pool.host}:{pool.port}",
+                'connections_opened': pool.num_connections,
+                'requests_sent': pool.num_requests,
+                'idle_connections': pool.pool.qsize() if pool.pool else 0,
+                'max_size': pool.pool.maxsize if pool.pool else 0,
+            })
+
+        return {'queue': metrics, 'pools': pools, 'slots': self.slots.stats()}
+
+
+_client = None
+_client_lock = threading.Lock()
+_inflight_limit = None
+
+
+def _shared_slots():
+    """The process-wide InflightLimit; call with _client_lock held"""
+    global _inflight_limit
+    if _inflight_limit is None:
+        _inflight_limit = InflightLimit(settings.OLLAMA_MAX_INFLIGHT)
+    return _inflight_limit
+
+
+def get_ollama_client():
+    """Return the process-wide Ollama client"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient(
+                base_url=settings.OLLAMA_URL,
+                model=settings.OLLAMA_MODEL,
+                connect_timeout=settings.OLLAMA_CONNECT_TIMEOUT,
+                read_timeout=settings.OLLAMA_READ_TIMEOUT,
+                max_inflight=settings.OLLAMA_MAX_INFLIGHT,
+                queue_timeout=settings.OLLAMA_QUEUE_TIMEOUT,
+                pool_size=settings.OLLAMA_POOL_SIZE,
+                slots=_shared_slots(),
+            )
+    return _client
+
+
+class AsyncOllamaClient:
+    """
+    Event-loop counterpart of OllamaClient for the async views.
+
+    Uses a pooled `httpx.AsyncClient` and waits on the same InflightLimit as
+    the sync client, so OLLAMA_MAX_INFLIGHT stays a per-process cap and
+    requests waiting for a slot are parked coroutines rather than blocked
+    threads. Belongs to the event loop it was created on, so
+    there is one per process (see get_async_ollama_client).
+    """
+
+    def __init__(self, base_url, model, connect_timeout, read_timeout,
+                 max_inflight, queue_timeout, pool_size, slots=None):
+        # Only the async views need httpx
+        import httpx
+
+        self.generate_url = f"{base_url.rstrip('/')}/api/generate"
+        self.model = model
+        self.max_inflight = max_inflight
+        self.queue_timeout = queue_timeout
+        self.http = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            # No more connections than requests allowed in flight; pool_size of them are kept alive
+            limits=httpx.Limits(max_connections=max_inflight,
+                                max_keepalive_connections=min(pool_size, max_inflight)),
+        )
+        self.slots = slots or InflightLimit(max_inflight)
+        self.metrics = {
+            'requests': 0,
+            'failures': 0,
+            'queue_timeouts': 0,
+            'waiting': 0,
+            'in_flight': 0,
+            'total_wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+        }
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the inference slots for the duration of the block"""
+        # Only the event loop thread touches the metrics, so no lock is needed
+        started = time.monotonic()
+        self.metrics['waiting'] += 1
+        try:
+            acquired = await self.slots.acquire_async(timeout=self.queue_timeout)
+        finally:
+            self.metrics['waiting'] -= 1
+        waited = time.monotonic() - started
+
+        self.metrics['total_wait_seconds'] += waited
+        self.metrics['max_wait_seconds'] = max(self.metrics['max_wait_seconds'], waited)
+        if not acquired:
+            self.metrics['queue_timeouts'] += 1
+            raise OllamaQueueTimeout(f"No free Ollama slot after {waited:.1f}s")
+        self.metrics['requests'] += 1
+        self.metrics['in_flight'] += 1
+
+        try:
+            yield
+        except Exception:
+            self.metrics['failures'] += 1
+            raise
+        finally:
+            self.metrics['in_flight'] -= 1
+            self.slots.release()
+
+    async def generate(self, prompt, model=None):
+        """Run a prompt to completion and return the generated text"""
+        async with self.slot():
+            response = await self.http.post(
+                self.generate_url,
+                json={
+                    'model': model or self.model,
+                    'prompt': prompt,
+                    'stream': False
+                }
+            )
+            response.raise_for_status()
+            return response.json().get('response', '')
+
+    def stats(self):
+        metrics = dict(self.metrics)
+        waits = metrics['requests'] + metrics['queue_timeouts']
+        metrics['avg_wait_seconds'] = round(metrics['total_wait_seconds'] / waits, 4) if waits else 0
+        metrics['total_wait_seconds'] = round(metrics['total_wait_seconds'], 4)
+        metrics['max_wait_seconds'] = round(metrics['max_wait_seconds'], 4)
+        metrics['max_inflight'] = self.max_inflight
+        return {'queue': metrics, 'slots': self.slots.stats()}
+
+
+_async_client = None  # (event loop, AsyncOllamaClient)
+
+
+def get_async_ollama_client():
+    """
+    Return the process-wide async Ollama client.
+
+    It is bound to the loop it was created on: the ASGI server's, which closes
+    it at lifespan shutdown (close_async_ollama_client). A client left behind
+    by a loop that has since closed is replaced, and a second running loop
+    asking for it is an error rather than a reason to open another pool.
+    """
+    global _async_client
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        if _async_client is not None and _async_client[0] is not loop:
+            if not _async_client[0].is_closed():
+                raise RuntimeError(
+                    "The async Ollama client belongs to another running event loop; "
+                    "serve the async views through examgenie.asgi"
+                )
+            # Its loop is gone and its connections with it
+            _async_client = None
+        if _async_client is None:
+            _async_client = (loop, AsyncOllamaClient(
+                base_url=settings.OLLAMA_URL,
+                model=settings.OLLAMA_MODEL,
+                connect_timeout=settings.OLLAMA_CONNECT_TIMEOUT,
+                read_timeout=settings.OLLAMA_READ_TIMEOUT,
+                max_inflight=settings.OLLAMA_MAX_INFLIGHT,
+                queue_timeout=settings.OLLAMA_QUEUE_TIMEOUT,
+                pool_size=settings.OLLAMA_POOL_SIZE,
+                slots=_shared_slots(),
+            ))
+    return _async_client[1]
+
+
+async def close_async_ollama_client():
+    """Close the async client if the running loop owns it (ASGI lifespan shutdown)"""
+    global _async_client
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        entry = _async_client
+        if entry is None or entry[0] is not loop:
+            return
+        _async_client = None
+    await entry[1].http.aclose()
@@ -0,0 +1,34 @@
+# papers/management/commands/backfill_search_keys.py
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+from utils.db_utils import db
+from utils.search_keys import subject_search_fields
+from papers.subjects import rebuild_subjects
+
+
+class Command(BaseCommand):
+    help = "Store normalized subject search keys on previous-year questions and rebuild pyq_subjects"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--all', action='store_true', help="Recompute keys that are already set as well")
+
+    def handle(self, *args, **options):
+        query = {} if options['all'] else {"subject_key": {"$exists": False}}
+        projection = {"subject_name": 1, "subject_code": 1}
+
+        updated = 0
+        operations = []
+        for question in db['pyq_questions'].find(query, projection, batch_size=options['batch_size']):
+            fields = subject_search_fields(question.get('subject_name'), question.get('subject_code'))
+            operations.append(UpdateOne({"_id": question['_id']}, {"$set": fields}))
+            if len(operations) >= options['batch_size']:
+                updated += db['pyq_questions'].bulk_write(operations, ordered=False).modified_count
+                operations = []
+        if operations:
+            updated += db['pyq_questions'].bulk_write(operations, ordered=False).modified_count
+
+        subjects = rebuild_subjects()
+        self.stdout.write(self.style.SUCCESS(
+            f"Set search keys on {updated} question(s); pyq_subjects now lists {subjects} subject(s)"
+        ))
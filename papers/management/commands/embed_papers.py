@@ -0,0 +1,55 @@
+# papers/management/commands/embed_papers.py
+from django.core.management.base import BaseCommand
+from utils.db_utils import db, EMBEDDED_LAYOUT, embed_paper, ensure_embedded_indexes
+
+
+class Command(BaseCommand):
+    help = "Convert papers stored across papers/sections/questions into the embedded layout"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help="Papers loaded per round of queries")
+        parser.add_argument('--limit', type=int, default=0, help="Stop after this many papers (0 = all)")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would change without writing")
+
+    def handle(self, *args, **options):
+        ensure_embedded_indexes()
+        batch_size, limit, dry_run = options['batch_size'], options['limit'], options['dry_run']
+
+        converted = 0
+        cursor = db['papers'].find({'layout': {'$ne': EMBEDDED_LAYOUT}}, batch_size=batch_size)
+        if limit:
+            cursor = cursor.limit(limit)
+
+        batch = []
+        for paper in cursor:
+            batch.append(paper)
+            if len(batch) >= batch_size:
+                converted += self.convert_batch(batch, dry_run)
+                batch = []
+        if batch:
+            converted += self.convert_batch(batch, dry_run)
+
+        verb = "Would convert" if dry_run else "Converted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {converted} paper(s) to the embedded layout"))
+
+    def convert_batch(self, papers, dry_run):
+        """Load the sections and questions of a batch of papers with two queries and embed them"""
+        paper_ids = [paper['_id'] for paper in papers]
+        sections = {}
+        for section in db['sections'].find({'paper_id': {'$in': paper_ids}}):
+            sections.setdefault(section['paper_id'], []).append(section)
+        questions = {}
+        for question in db['questions'].find({'paper_id': {'$in': paper_ids}}):
+            questions.setdefault(question['paper_id'], []).append(question)
+
+        converted = 0
+        for paper in papers:
+            embedded = embed_paper(paper, sections.get(paper['_id'], []), questions.get(paper['_id'], []))
+            if dry_run:
+                converted += 1
+                continue
+            # Guard on the layout so a paper converted concurrently is not overwritten.
+            # The sections/questions documents stay: questions doubles as the question bank.
+            result = db['papers'].replace_one({'_id': paper['_id'], 'layout': {'$ne': EMBEDDED_LAYOUT}}, embedded)
+            converted += result.modified_count
+        return converted
@@ -0,0 +1,38 @@
+# papers/management/commands/ensure_indexes.py
+from django.core.management.base import BaseCommand, CommandError
+from utils.indexes import collect_indexes, collect_query_shapes, ensure_indexes, explain_query_shape
+
+
+class Command(BaseCommand):
+    help = "Build the MongoDB indexes declared in each app's indexes.py"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--collection', help="Only build the indexes of this collection")
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Also explain() every declared query shape and fail if any of them scans a whole collection"
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Ensuring {len(collect_indexes(options['collection']))} declared index(es)...")
+        created, failed = ensure_indexes(options['collection'])
+        for name in created:
+            self.stdout.write(f"  ok      {name}")
+        for name, error in failed.items():
+            self.stdout.write(self.style.ERROR(f"  failed  {name}: {error}"))
+
+        collscans = []
+        if options['check']:
+            self.stdout.write("Checking query plans...")
+            for shape in collect_query_shapes():
+                stages = explain_query_shape(shape)
+                plan = ' <- '.join(stages)
+                if 'COLLSCAN' in stages:
+                    collscans.append(shape['name'])
+                    self.stdout.write(self.style.ERROR(f"  COLLSCAN  {shape['collection']}: {shape['name']} ({plan})"))
+                else:
+                    self.stdout.write(f"  ok        {shape['collection']}: {shape['name']} ({plan})")
+
+        if failed or collscans:
+            raise CommandError(f"{len(failed)} index(es) failed to build, {len(collscans)} query shape(s) scan a collection")
+        self.stdout.write(self.style.SUCCESS("Indexes are up to date"))
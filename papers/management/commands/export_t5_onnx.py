@@ -0,0 +1,44 @@
+# papers/management/commands/export_t5_onnx.py
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Export question_gen_model to ONNX and quantize it to int8 for the t5-onnx backend"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-dir', default=str(settings.T5_MODEL_DIR))
+        parser.add_argument('--output-dir', default=str(settings.T5_ONNX_DIR))
+        parser.add_argument(
+            '--arch', default='avx2', choices=['avx2', 'avx512', 'avx512_vnni', 'arm64'],
+            help="Instruction set the quantized kernels should target"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTQuantizer
+            from optimum.onnxruntime.configuration import AutoQuantizationConfig
+            from transformers import T5Tokenizer
+        except ImportError as e:
+            raise CommandError(f"ONNX export needs optimum[onnxruntime] installed: {e}")
+
+        model_dir, output_dir = options['model_dir'], options['output_dir']
+        os.makedirs(output_dir, exist_ok=True)
+
+        # 1. Export encoder, decoder and decoder-with-past (KV cache) graphs
+        self.stdout.write(f"Exporting {model_dir} to ONNX...")
+        model = ORTModelForSeq2SeqLM.from_pretrained(model_dir, export=True, use_cache=True, use_merged=False)
+        model.save_pretrained(output_dir)
+        T5Tokenizer.from_pretrained(model_dir).save_pretrained(output_dir)
+
+        # 2. Dynamic int8 quantization: weights stored as int8, activations quantized at run time
+        quantization_config = getattr(AutoQuantizationConfig, options['arch'])(is_static=False, per_channel=False)
+        for file_name in ('encoder_model.onnx', 'decoder_model.onnx', 'decoder_with_past_model.onnx'):
+            if not os.path.exists(os.path.join(output_dir, file_name)):
+                raise CommandError(f"Export did not produce {file_name}")
+            quantizer = ORTQuantizer.from_pretrained(output_dir, file_name=file_name)
+            quantizer.quantize(save_dir=output_dir, quantization_config=quantization_config)
+            self.stdout.write(f"Quantized {file_name}")
+
+        self.stdout.write(self.style.SUCCESS(f"Quantized ONNX model written to {output_dir}"))
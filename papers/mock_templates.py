@@ -0,0 +1,255 @@
+# papers/mock_templates.py
+import random
+from functools import lru_cache
+from .distribution import allocate_quota
+
+# Sample question templates for each topic and question type
+TOPIC_TEMPLATES = {
+    'SQL': {
+        'mcq': [
+            "Which SQL statement is used to retrieve data from a database?",
+            "What is the purpose of the GROUP BY clause in SQL?",
+            "Which of the following is NOT a valid SQL join type?"
+        ],
+        'descriptive': [
+            "Explain the difference between INNER JOIN and OUTER JOIN in SQL.",
+            "Describe how subqueries work in SQL and provide an example."
+        ],
+        'programming': [
+            "Write a SQL query to retrieve the name and department of all employees who earn more than the average salary.",
+            "Write a SQL query that uses GROUP BY and HAVING to find departments with more than 10 employees."
+        ],
+        'numerical': [
+            "If a database table has 1000 rows and a query returns 200 rows, what is the selectivity ratio of the query?"
+        ]
+    },
+    'Normalization': {
+        'mcq': [
+            "Which normal form eliminates transitive dependencies?",
+            "What is the highest normal form that a relation can satisfy?"
+        ],
+        'descriptive': [
+            "Explain the concept of functional dependency in database normalization.",
+            "Compare and contrast 3NF and BCNF with examples."
+        ],
+        'numerical': [
+            "A table has 5 attributes and 3 candidate keys. Calculate the maximum number of functional dependencies possible."
+        ]
+    },
+    'Transaction Management': {
+        'mcq': [
+            "Which property of ACID ensures that a transaction brings the database from one valid state to another?",
+            "What concurrency control protocol uses timestamps to order transactions?"
+        ],
+        'descriptive': [
+            "Explain the difference between optimistic and pessimistic concurrency control.",
+            "Describe the two-phase commit protocol and its importance in distributed transactions."
+        ],
+        'numerical': [
+            "Calculate the wait-for graph for the following transaction schedule: T1→T2, T2→T3, T3→T4, T4→T1."
+        ]
+    },
+    'Indexing': {
+        'mcq': [
+            "Which data structure is commonly used for implementing indexes in databases?",
+            "What type of index would be most efficient for range queries?"
+        ],
+        'descriptive': [
+            "Compare B-tree and hash-based indexing techniques.",
+            "Explain the concept of index clustering and when it should be used."
+        ],
+        'numerical': [
+            "Calculate the height of a B+ tree with 1000 records, if each node can store up to 100 keys."
+        ]
+    },
+    'ER Modeling': {
+        'mcq': [
+            "In ER modeling, what does a diamond shape represent?",
+            "Which relationship type has a maximum cardinality of one on both sides?"
+        ],
+        'descriptive': [
+            "Explain how to convert a many-to-many relationship to relational schema.",
+            "Describe the differences between strong and weak entities with examples."
+        ],
+        'programming': [
+            "Design an ER diagram for a library management system with entities for books, authors, and borrowers."
+        ]
+    }
+}
+
+# MCQ options templates
+MCQ_OPTIONS = {
+    'SQL': [
+        ["SELECT", "RETRIEVE", "GET", "FETCH"],
+        ["To group rows with similar values", "To filter rows after aggregation", "To sort the result set", "To join tables"],
+        ["INNER JOIN", "NATURAL JOIN", "OUTER JOIN", "BETWEEN JOIN"]
+    ],
+    'Normalization': [
+        ["First Normal Form (1NF)", "Second Normal Form (2NF)", "Third Normal Form (3NF)", "Boyce-Codd Normal Form (BCNF)"],
+        ["3NF", "BCNF", "4NF", "5NF"]
+    ],
+    'Transaction Management': [
+        ["Atomicity", "Consistency", "Isolation", "Durability"],
+        ["Two-Phase Locking", "Timestamp Ordering", "Multi-Version Concurrency Control", "Optimistic Concurrency Control"]
+    ],
+    'Indexing': [
+        ["Linked List", "Array", "B-Tree", "Hash Table"],
+        ["Hash Index", "B-Tree Index", "Bitmap Index", "Dense Index"]
+    ],
+    'ER Modeling': [
+        ["Entity", "Attribute", "Relationship", "Cardinality"],
+        ["One-to-one", "One-to-many", "Many-to-one", "Many-to-many"]
+    ]
+}
+
+# Sample answers for MCQs
+MCQ_ANSWERS = {
+    'SQL': ["A", "A", "D"],
+    'Normalization': ["C", "D"],
+    'Transaction Management': ["B", "B"],
+    'Indexing': ["C", "B"],
+    'ER Modeling': ["C", "A"]
+}
+
+
+def build_template_index():
+    """
+    Index the templates by (topic, question type) once at import time.
+
+    Each entry is a tuple of (text, options, answer); MCQ templates are paired
+    with the options and answer listed at the same position for their topic.
+    """
+    index = {}
+    for topic, templates_by_type in TOPIC_TEMPLATES.items():
+        for question_type, texts in templates_by_type.items():
+            entries = []
+            for position, text in enumerate(texts):
+                options = answer = None
+                if question_type == 'mcq':
+                    topic_options = MCQ_OPTIONS.get(topic, [])
+                    topic_answers = MCQ_ANSWERS.get(topic, [])
+                    if position < len(topic_options):
+                        options = tuple(topic_options[position])
+                        answer = topic_answers[position] if position < len(topic_answers) else None
+                entries.append((text, options, answer))
+            index[(topic, question_type)] = tuple(entries)
+    return index
+
+
+TEMPLATE_INDEX = build_template_index()
+
+
+@lru_cache(maxsize=1024)
+def _quota_sequence(distribution_items, total):
+    labels = []
+    for category, count in allocate_quota(dict(distribution_items), total).items():
+        labels.extend([category] * count)
+    return tuple(labels)
+
+
+def _shuffled_quota(distribution, total, rng):
+    """Exact quota labels in random order; the allocation itself is computed once per layout"""
+    labels = list(_quota_sequence(tuple(distribution.items()), total))
+    rng.shuffle(labels)
+    return labels
+
+
+def plan_section(paper_params, section, rng):
+    """
+    Lay out a section's slots: difficulty, cognitive level, practical/theory and
+    topic for each question, following exact per-section quotas.
+    """
+    num_questions = section['numQuestions']
+    question_type = section['questionType']
+
+    difficulties = _shuffled_quota(paper_params['difficultyDistribution'], num_questions, rng)
+    cognitive_levels = _shuffled_quota(paper_params['cognitiveDistribution'], num_questions, rng)
+    practical_labels = _shuffled_quota(paper_params['practicalTheoretical'], num_questions, rng)
+
+    # Spread the section evenly over the topics that have templates for this type
+    available_topics = [topic for topic in paper_params['topics'] if (topic, question_type) in TEMPLATE_INDEX]
+    topics = _shuffled_quota(
+        {topic: 1 for topic in (available_topics or paper_params['topics'] or ['General'])}, num_questions, rng
+    )
+
+    return [
+        {
+            'difficulty': difficulties[i],
+            'cognitiveLevel': cognitive_levels[i],
+            'isPractical': practical_labels[i] == 'practical',
+            'topic': topics[i],
+        }
+        for i in range(num_questions)
+    ]
+
+
+def generate_mock_questions(paper_params, seed=None):
+    """
+    Generate mock questions as a fallback.
+
+    All sampling goes through a generator seeded per call, so the same `seed`
+    always gives the same paper and concurrent callers never share state.
+    Difficulty, cognitive level, practical/theory and topic follow exact
+    per-section quotas.
+    """
+    rng = random.Random(seed)
+    questions = []
+    question_id = 1
+
+    for section in paper_params['sections']:
+        section_name = section['name']
+        question_type = section['questionType']
+        marks_per_question = section['marksPerQuestion']
+
+        slots = plan_section(paper_params, section, rng)
+
+        # Unused templates per topic, drawn without replacement
+        remaining_templates = {}
+
+        for slot in slots:
+            difficulty = slot['difficulty']
+            topic = slot['topic']
+            is_practical = slot['isPractical']
+
+            options = answer = None
+            if topic not in remaining_templates:
+                remaining_templates[topic] = list(TEMPLATE_INDEX.get((topic, question_type), ()))
+            templates = remaining_templates[topic]
+            if templates:
+                # Swap-remove a random unused template
+                position = rng.randrange(len(templates))
+                templates[position], templates[-1] = templates[-1], templates[position]
+                question_text, options, answer = templates.pop()
+            else:
+                # No (more) templates for this topic, create a generic one
+                question_text = f"{'Practical' if is_practical else 'Theoretical'} {question_type} question on {topic} ({difficulty} difficulty)"
+
+            question = {
+                'id': question_id,
+                'sectionName': section_name,
+                'text': question_text,
+                'questionType': question_type,
+                'difficulty': difficulty,
+                'cognitiveLevel': slot['cognitiveLevel'],
+                'marks': marks_per_question,
+                'isPractical': is_practical,
+                'answer': 'Sample answer for this question',
+                'topic': topic,
+                'subjectName': paper_params.get('subjectName', ''),
+                'source': 'mock'
+            }
+
+            # Add options for MCQs
+            if question_type == 'mcq':
+                if options:
+                    question['options'] = list(options)
+                    question['answer'] = answer or rng.choice(['A', 'B', 'C', 'D'])
+                else:
+                    question['options'] = [f"Option A for {topic}", f"Option B for {topic}",
+                                           f"Option C for {topic}", f"Option D for {topic}"]
+                    question['answer'] = rng.choice(['A', 'B', 'C', 'D'])
+
+            questions.append(question)
+            question_id += 1
+
+    return questions
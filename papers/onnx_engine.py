@@ -0,0 +1,77 @@
+# papers/onnx_engine.py
+import os
+import threading
+from django.conf import settings
+from .t5_engine import T5QuestionGenerator
+
+# File names written by `manage.py export_t5_onnx`
+QUANTIZED_FILES = {
+    'encoder_file_name': 'encoder_model_quantized.onnx',
+    'decoder_file_name': 'decoder_model_quantized.onnx',
+    'decoder_with_past_file_name': 'decoder_with_past_model_quantized.onnx',
+}
+
+
+class ONNXT5QuestionGenerator(T5QuestionGenerator):
+    """
+    The T5 question generator running on ONNX Runtime instead of PyTorch.
+
+    Loads the int8 dynamically quantized export from `manage.py export_t5_onnx`.
+    `generate` runs the encoder once per batch and reuses its output at every
+    decoding step, and the decoder-with-past graph carries the attention KV cache
+    forward, so each step only processes the newest token.
+    """
+
+    def load(self):
+        with self.load_lock:
+            if self.model is not None:
+                return
+            try:
+                import onnxruntime
+                import torch
+                from optimum.onnxruntime import ORTModelForSeq2SeqLM
+                from transformers import T5Tokenizer
+            except ImportError as e:
+                raise RuntimeError(f"The t5-onnx backend needs onnxruntime and optimum installed: {e}")
+
+            if not os.path.exists(os.path.join(self.model_dir, QUANTIZED_FILES['encoder_file_name'])):
+                raise RuntimeError(
+                    f"No quantized ONNX export in {self.model_dir}; run `python manage.py export_t5_onnx` first"
+                )
+
+            session_options = onnxruntime.SessionOptions()
+            if self.num_threads:
+                session_options.intra_op_num_threads = self.num_threads
+            session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+            tokenizer = T5Tokenizer.from_pretrained(self.model_dir)
+            model = ORTModelForSeq2SeqLM.from_pretrained(
+                self.model_dir,
+                use_cache=True,
+                session_options=session_options,
+                provider='CPUExecutionProvider',
+                **QUANTIZED_FILES
+            )
+            # generate() still goes through torch tensors for the decoding loop
+            self.torch, self.tokenizer, self.model = torch, tokenizer, model
+            print(f"Loaded quantized ONNX T5 question generator from {self.model_dir}")
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def get_onnx_t5_generator():
+    """Return the process-wide ONNX Runtime T5 generator"""
+    global _generator
+    with _generator_lock:
+        if _generator is None:
+            _generator = ONNXT5QuestionGenerator(
+                model_dir=settings.T5_ONNX_DIR,
+                num_threads=settings.T5_NUM_THREADS,
+                num_beams=settings.T5_NUM_BEAMS,
+                max_input_tokens=settings.T5_MAX_INPUT_TOKENS,
+                max_new_tokens=settings.T5_MAX_NEW_TOKENS,
+                prompt_template=settings.T5_PROMPT_TEMPLATE,
+            )
+    return _generator
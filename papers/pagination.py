@@ -0,0 +1,46 @@
+# papers/pagination.py
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Newest first; _id breaks ties between questions uploaded in the same batch
+KEYSET_SORT = [('uploaded_at', -1), ('_id', -1)]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(doc):
+    """Opaque continuation token pointing just past `doc` in KEYSET_SORT order"""
+    uploaded_at = doc.get('uploaded_at')
+    payload = {
+        't': uploaded_at.isoformat() if uploaded_at else None,
+        'id': str(doc['_id']),
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        uploaded_at = datetime.fromisoformat(payload['t']) if payload['t'] else None
+        return uploaded_at, ObjectId(payload['id'])
+    except (ValueError, TypeError, KeyError, InvalidId) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+
+
+def keyset_filter(token):
+    """Filter matching the documents that sort after the one `token` points at"""
+    uploaded_at, last_id = decode_cursor(token)
+    if uploaded_at is None:
+        # Undated questions sort last; only later ids among them remain
+        return {'uploaded_at': None, '_id': {'$lt': last_id}}
+    return {'$or': [
+        {'uploaded_at': {'$lt': uploaded_at}},
+        {'uploaded_at': uploaded_at, '_id': {'$lt': last_id}},
+        {'uploaded_at': None},
+    ]}
@@ -0,0 +1,39 @@
+# papers/renderers.py
+import json
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+from .streaming import format_sse
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets DRF content negotiation accept `Accept: text/event-stream`.
+    Streaming views return a StreamingHttpResponse; the plain Responses of
+    their error paths are sent as a single `error` (or `message`) event.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        response = (renderer_context or {}).get('response')
+        event = 'error' if response is not None and response.status_code >= 400 else 'message'
+        return format_sse(event, data).encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Lets DRF content negotiation accept `Accept: application/x-ndjson` (or `?format=ndjson`).
+    Like EventStreamRenderer, the views stream the body themselves; plain
+    Responses (errors, mostly) are sent as a single JSON line.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (json.dumps(data, cls=JSONEncoder) + '\n').encode(self.charset)
@@ -0,0 +1,128 @@
+# papers/retrieval.py
+from utils.db_utils import db
+from utils.indexes import ensure_collection_indexes
+from utils.search_keys import subject_key
+from .distribution import allocate_quota
+from .validation import normalize_text
+
+BANK_PROJECTION = {
+    "text": 1, "question_type": 1, "difficulty": 1, "cognitive_level": 1, "marks": 1,
+    "options": 1, "answer": 1, "is_practical": 1, "topic": 1, "tags": 1,
+}
+PYQ_PROJECTION = {"question_text": 1, "marks": 1, "unit": 1, "subject_name": 1}
+
+
+def ensure_bank_indexes():
+    """Build the indexes the bank lookups rely on (bank_lookup, pyq_bank_lookup in papers/indexes.py)"""
+    ensure_collection_indexes('questions')
+    ensure_collection_indexes('pyq_questions')
+
+
+def bank_match(paper_params, section, difficulty):
+    """Generated questions a section can reuse at one difficulty (mock fallbacks never count)"""
+    return {
+        "subject_name": paper_params['subjectName'],
+        "question_type": section['questionType'],
+        "marks": section['marksPerQuestion'],
+        "difficulty": difficulty,
+        "topic": {"$in": list(paper_params['topics'])},
+        "source": {"$ne": "mock"},
+    }
+
+
+def pyq_bank_match(paper_params, section):
+    """Previous-year questions of the paper's subject worth a section's marks"""
+    return {
+        "subject_key": subject_key(paper_params['subjectName']),
+        "marks": section['marksPerQuestion'],
+    }
+
+
+def retrieve_bank_questions(paper_params, section, include_pyq=False):
+    """
+    Fill as many of a section's slots as possible from previously generated questions.
+
+    Questions are drawn per difficulty so the section still follows the requested
+    difficulty distribution. Mock fallback questions are never reused. When
+    `include_pyq` is set, descriptive sections may also be topped up from the
+    previous-year question bank.
+    """
+    ensure_bank_indexes()
+
+    wanted = section['numQuestions']
+    quotas = allocate_quota(paper_params['difficultyDistribution'], wanted)
+    results = []
+    seen = set()
+
+    def take(doc, question):
+        key = normalize_text(question['text'])
+        if not key or key in seen:
+            return False
+        seen.add(key)
+        question['bankId'] = str(doc['_id'])
+        results.append(question)
+        return True
+
+    for difficulty, count in quotas.items():
+        if count == 0:
+            continue
+        pipeline = [
+            {"$match": bank_match(paper_params, section, difficulty)},
+            # Over-sample a little so duplicates of the same text can be skipped
+            {"$sample": {"size": count * 2}},
+            {"$project": BANK_PROJECTION},
+        ]
+        taken = 0
+        for doc in db['questions'].aggregate(pipeline):
+            if taken == count:
+                break
+            if take(doc, bank_question_to_dict(doc, section)):
+                taken += 1
+
+    if include_pyq and section['questionType'] == 'descriptive' and len(results) < wanted:
+        missing = wanted - len(results)
+        pipeline = [
+            {"$match": pyq_bank_match(paper_params, section)},
+            {"$sample": {"size": missing * 2}},
+            {"$project": PYQ_PROJECTION},
+        ]
+        for doc in db['pyq_questions'].aggregate(pipeline):
+            if len(results) == wanted:
+                break
+            take(doc, pyq_to_dict(doc, section))
+
+    return results
+
+
+def bank_question_to_dict(doc, section):
+    return {
+        'sectionName': section['name'],
+        'text': doc['text'],
+        'questionType': doc['question_type'],
+        'difficulty': doc['difficulty'],
+        'cognitiveLevel': doc.get('cognitive_level', 'understand'),
+        'marks': section['marksPerQuestion'],
+        'options': doc.get('options'),
+        'answer': doc.get('answer', ''),
+        'isPractical': doc.get('is_practical', False),
+        'topic': doc.get('topic', ''),
+        'tags': doc.get('tags', []),
+        'source': 'bank',
+    }
+
+
+def pyq_to_dict(doc, section):
+    # Previous-year questions carry no difficulty or cognitive tags
+    return {
+        'sectionName': section['name'],
+        'text': doc['question_text'],
+        'questionType': section['questionType'],
+        'difficulty': 'medium',
+        'cognitiveLevel': 'understand',
+        'marks': section['marksPerQuestion'],
+        'answer': '',
+        'isPractical': False,
+        'topic': f"Unit {doc['unit']}" if doc.get('unit') else '',
+        'tags': ['pyq'],
+        'source': 'pyq',
+    }
@@ -0,0 +1,50 @@
+# papers/steps.py
+from asgiref.sync import sync_to_async
+
+
+class LLMCall:
+    """Step asking the LLM to complete `prompt`; the driver sends back the generated text"""
+
+    def __init__(self, prompt):
+        self.prompt = prompt
+
+
+# A step generator yields LLMCall objects and zero-argument callables (blocking
+# work such as Mongo lookups or T5 inference), receives each result back through
+# send(), and returns its outcome. Errors are thrown back in at the yield, so the
+# generator's own try/except blocks behave as if the call had been made inline.
+
+def run_steps(steps, client):
+    """Drive a step generator on the current thread with the blocking Ollama client"""
+    send, value = steps.send, None
+    while True:
+        try:
+            step = send(value)
+        except StopIteration as done:
+            return done.value
+        try:
+            value = client.generate(step.prompt) if isinstance(step, LLMCall) else step()
+            send = steps.send
+        except Exception as e:
+            value, send = e, steps.throw
+
+
+async def run_steps_async(steps, client):
+    """
+    Drive a step generator from the event loop: LLM calls await the async
+    Ollama client, other steps borrow a worker thread only while they run.
+    """
+    send, value = steps.send, None
+    while True:
+        try:
+            step = send(value)
+        except StopIteration as done:
+            return done.value
+        try:
+            if isinstance(step, LLMCall):
+                value = await client.generate(step.prompt)
+            else:
+                value = await sync_to_async(step, thread_sensitive=False)()
+            send = steps.send
+        except Exception as e:
+            value, send = e, steps.throw
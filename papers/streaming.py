@@ -0,0 +1,77 @@
+# papers/streaming.py
+import json
+
+
+def format_sse(event, data):
+    """Format a single Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class JSONArrayStreamParser:
+    """
+    Incrementally parse a JSON array of objects as text arrives.
+
+    Chunks of model output are passed to `feed`, which returns every top-level
+    object that has been completed so far. Text before the opening `[` is
+    ignored, and objects that fail to decode are skipped so that one malformed
+    question does not lose the rest of the array. With `require_array=False`
+    every top-level object in the text is returned, array or not.
+    """
+
+    def __init__(self, require_array=True):
+        self.require_array = require_array
+        self.started = not require_array
+        self.finished = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.buffer = []
+
+    def feed(self, chunk):
+        objects = []
+        for char in chunk:
+            if self.finished:
+                break
+
+            if not self.started:
+                if char == '[':
+                    self.started = True
+                continue
+
+            if self.depth == 0:
+                # Between objects: only look for the next object or the end of the array
+                if char == '{':
+                    self.depth = 1
+                    self.buffer = [char]
+                elif char == ']' and self.require_array:
+                    self.finished = True
+                continue
+
+            self.buffer.append(char)
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == '{':
+                self.depth += 1
+            elif char == '}':
+                self.depth -= 1
+                if self.depth == 0:
+                    obj = self._decode(''.join(self.buffer))
+                    self.buffer = []
+                    if obj is not None:
+                        objects.append(obj)
+        return objects
+
+    def _decode(self, text):
+        try:
+            obj = json.loads(text)
+        except ValueError as e:
+            print(f"Skipping malformed streamed object: {e}")
+            return None
+        return obj if isinstance(obj, dict) else None
@@ -0,0 +1,146 @@
+# papers/subjects.py
+import re
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from utils.db_utils import db
+from utils.mongo_client import get_async_db
+from utils.search_keys import code_key, subject_key
+
+# One document per (subject, code) seen in pyq_questions, with its question count.
+# Small enough that prefix lookups on its indexed keys answer in a few milliseconds.
+SUBJECTS_COLLECTION = 'pyq_subjects'
+CANDIDATE_LIMIT = 200
+
+
+def subject_doc_id(subject_key_value, code_key_value):
+    return f"{subject_key_value}|{code_key_value}"
+
+
+def record_subject_questions(questions, delta=1):
+    """Adjust the per-subject question counts for questions just inserted (delta=1) or deleted (delta=-1)"""
+    counts = {}
+    for question in questions:
+        key = (question.get('subject_key', ''), question.get('subject_code_key', ''))
+        if not key[0] and not key[1]:
+            continue
+        entry = counts.setdefault(key, {
+            "subject_name": question.get('subject_name'),
+            "subject_code": question.get('subject_code'),
+            "count": 0,
+        })
+        entry["count"] += delta
+
+    if not counts:
+        return
+    now = datetime.now(timezone.utc)
+    db[SUBJECTS_COLLECTION].bulk_write([
+        UpdateOne(
+            {"_id": subject_doc_id(*key)},
+            {
+                "$set": {"subject_name": entry["subject_name"], "subject_code": entry["subject_code"], "updated_at": now},
+                "$setOnInsert": {
+                    "subject_key": key[0],
+                    "subject_code_key": key[1],
+                    "subject_words": key[0].split(),
+                },
+                "$inc": {"question_count": entry["count"]},
+            },
+            upsert=True
+        )
+        for key, entry in counts.items()
+    ], ordered=False)
+
+
+def rebuild_subjects():
+    """Recount pyq_subjects from pyq_questions; returns the number of subjects"""
+    pipeline = [
+        {"$match": {"subject_key": {"$exists": True}}},
+        {"$group": {
+            "_id": {"subject_key": "$subject_key", "subject_code_key": "$subject_code_key"},
+            "subject_name": {"$last": "$subject_name"},
+            "subject_code": {"$last": "$subject_code"},
+            "question_count": {"$sum": 1},
+        }},
+    ]
+    now = datetime.now(timezone.utc)
+    operations, seen = [], []
+    for group in db['pyq_questions'].aggregate(pipeline, allowDiskUse=True):
+        keys = group['_id']
+        doc_id = subject_doc_id(keys['subject_key'], keys.get('subject_code_key', ''))
+        seen.append(doc_id)
+        operations.append(UpdateOne({"_id": doc_id}, {"$set": {
+            "subject_name": group['subject_name'],
+            "subject_code": group['subject_code'],
+            "subject_key": keys['subject_key'],
+            "subject_code_key": keys.get('subject_code_key', ''),
+            "subject_words": keys['subject_key'].split(),
+            "question_count": group['question_count'],
+            "updated_at": now,
+        }}, upsert=True))
+
+    if operations:
+        db[SUBJECTS_COLLECTION].bulk_write(operations, ordered=False)
+    db[SUBJECTS_COLLECTION].delete_many({"_id": {"$nin": seen}})
+    return len(seen)
+
+
+def _relevance(subject, key, code):
+    # 0: exact name or code, 1: name or code starts with the query, 2: every query word starts a name word
+    if subject['subject_key'] == key or (code and subject['subject_code_key'] == code):
+        return 0
+    if (key and subject['subject_key'].startswith(key)) or (code and subject['subject_code_key'].startswith(code)):
+        return 1
+    return 2
+
+
+def _subject_search(query):
+    """(filter, projection, key, code) for a subject search, or None when the query has no usable key"""
+    key, code = subject_key(query), code_key(query)
+    if not key:
+        return None
+
+    clauses = [{"subject_key": {"$regex": f"^{re.escape(key)}"}}]
+    if code:
+        clauses.append({"subject_code_key": {"$regex": f"^{re.escape(code)}"}})
+    words = key.split()
+    if len(words) > 1:
+        clauses.append({"subject_words": {"$all": [re.compile(f"^{re.escape(word)}") for word in words]}})
+    else:
+        clauses.append({"subject_words": {"$regex": f"^{re.escape(key)}"}})
+
+    projection = {
+        "_id": 0, "subject_name": 1, "subject_code": 1, "subject_key": 1, "subject_code_key": 1, "question_count": 1,
+    }
+    return {"$or": clauses, "question_count": {"$gt": 0}}, projection, key, code
+
+
+def _rank_subjects(candidates, key, code, limit):
+    candidates.sort(key=lambda subject: (
+        _relevance(subject, key, code), -subject['question_count'], subject['subject_key']
+    ))
+    return candidates[:limit]
+
+
+def search_subjects(query, limit=10):
+    """
+    Subjects matching `query` by name or code, best match first.
+
+    Every clause is a left-anchored regex on a lowercase key, so each one is
+    answered from an index instead of scanning the collection.
+    """
+    search = _subject_search(query)
+    if not search:
+        return []
+    filter_query, projection, key, code = search
+    candidates = list(db[SUBJECTS_COLLECTION].find(filter_query, projection).limit(CANDIDATE_LIMIT))
+    return _rank_subjects(candidates, key, code, limit)
+
+
+async def search_subjects_async(query, limit=10):
+    """search_subjects with the async driver"""
+    search = _subject_search(query)
+    if not search:
+        return []
+    filter_query, projection, key, code = search
+    cursor = get_async_db()[SUBJECTS_COLLECTION].find(filter_query, projection).limit(CANDIDATE_LIMIT)
+    return _rank_subjects(await cursor.to_list(None), key, code, limit)
@@ -0,0 +1,127 @@
+# papers/t5_engine.py
+import random
+import threading
+from django.conf import settings
+from .mock_templates import plan_section
+
+
+class T5QuestionGenerator:
+    """
+    In-process question generator backed by the bundled `question_gen_model` T5 checkpoint.
+
+    The model is loaded lazily, once per process, on first use. Every question
+    of a section is generated in one batched `generate` call (greedy decoding,
+    or beam search when `num_beams` > 1). torch is imported only here, so the
+    rest of the app does not need it unless this backend is selected.
+    """
+
+    def __init__(self, model_dir, num_threads, num_beams, max_input_tokens, max_new_tokens, prompt_template):
+        self.model_dir = str(model_dir)
+        self.num_threads = num_threads
+        self.num_beams = num_beams
+        self.max_input_tokens = max_input_tokens
+        self.max_new_tokens = max_new_tokens
+        self.prompt_template = prompt_template
+        self.model = None
+        self.tokenizer = None
+        self.torch = None
+        self.load_lock = threading.Lock()
+        # torch already parallelises each forward pass; concurrent generate calls just fight over cores
+        self.generate_lock = threading.Lock()
+
+    def load(self):
+        with self.load_lock:
+            if self.model is not None:
+                return
+            try:
+                import torch
+                from transformers import T5ForConditionalGeneration, T5Tokenizer
+            except ImportError as e:
+                raise RuntimeError(f"The t5 backend needs torch, transformers and sentencepiece installed: {e}")
+
+            if self.num_threads:
+                torch.set_num_threads(self.num_threads)
+
+            tokenizer = T5Tokenizer.from_pretrained(self.model_dir)
+            model = T5ForConditionalGeneration.from_pretrained(self.model_dir)
+            model.eval()
+            self.torch, self.tokenizer, self.model = torch, tokenizer, model
+            print(f"Loaded T5 question generator from {self.model_dir} "
+                  f"({torch.get_num_threads()} torch threads)")
+
+    def build_prompt(self, paper_params, section, slot):
+        return self.prompt_template.format(
+            subject=paper_params['subjectName'],
+            topic=slot['topic'],
+            question_type=section['questionType'],
+            difficulty=slot['difficulty'],
+            cognitive_level=slot['cognitiveLevel'],
+            kind='practical' if slot['isPractical'] else 'theoretical',
+        )
+
+    def generate_texts(self, prompts):
+        """Decode one question per prompt in a single batched forward pass"""
+        self.load()
+        with self.generate_lock, self.torch.inference_mode():
+            inputs = self.tokenizer(
+                prompts,
+                return_tensors='pt',
+                padding=True,
+                truncation=True,
+                max_length=self.max_input_tokens
+            )
+            outputs = self.model.generate(
+                **inputs,
+                num_beams=self.num_beams,
+                do_sample=False,
+                max_new_tokens=self.max_new_tokens
+            )
+        return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+    def generate_section_questions(self, paper_params, section, seed=None):
+        """Generate a section's questions in the same shape the Ollama path returns"""
+        slots = plan_section(paper_params, section, random.Random(seed))
+        if not slots:
+            return []
+
+        prompts = [self.build_prompt(paper_params, section, slot) for slot in slots]
+        texts = self.generate_texts(prompts)
+
+        questions = []
+        for slot, text in zip(slots, texts):
+            text = text.strip()
+            if not text:
+                continue
+            questions.append({
+                'sectionName': section['name'],
+                'text': text,
+                'questionType': section['questionType'],
+                'difficulty': slot['difficulty'],
+                'cognitiveLevel': slot['cognitiveLevel'],
+                'marks': section['marksPerQuestion'],
+                'isPractical': slot['isPractical'],
+                'answer': '',
+                'topic': slot['topic'],
+                'source': 't5',
+            })
+        return questions
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def get_t5_generator():
+    """Return the process-wide T5 generator (the model itself loads on first use)"""
+    global _generator
+    with _generator_lock:
+        if _generator is None:
+            _generator = T5QuestionGenerator(
+                model_dir=settings.T5_MODEL_DIR,
+                num_threads=settings.T5_NUM_THREADS,
+                num_beams=settings.T5_NUM_BEAMS,
+                max_input_tokens=settings.T5_MAX_INPUT_TOKENS,
+                max_new_tokens=settings.T5_MAX_NEW_TOKENS,
+                prompt_template=settings.T5_PROMPT_TEMPLATE,
+            )
+    return _generator
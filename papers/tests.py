@@ -1,3 +1,788 @@
-from django.test import TestCase
+import base64
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import patch
+from bson import ObjectId
+from django.conf import settings
+from django.test import SimpleTestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+from pymongo import InsertOne, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 
-# Create your tests here.
+from utils import db_utils
+from utils.db_utils import EMBEDDED_LAYOUT, get_paper_sections, insert_paper_bundle, insert_questions
+from utils.indexes import _plan_stages, collect_query_shapes, ensure_indexes, explain_query_shape
+from utils.memory_store import MemoryClient, MemorySession
+from utils.paper_cache import PaperCache
+from .jobs import STALE_JOB_ERROR, create_job, expire_stale_jobs, get_job, run_generation_job
+from .llm_cache import LLMResponseCache
+from .pagination import KEYSET_SORT, InvalidCursor, decode_cursor, encode_cursor, keyset_filter
+from .retrieval import retrieve_bank_questions
+from .streaming import JSONArrayStreamParser
+from .validation import salvage_questions, validate_questions
+from .views import PaperViewSet, download_paper_pdf
+
+
+class FakeCursor(list):
+    def sort(self, key, direction=1):
+        return FakeCursor(sorted(self, key=lambda doc: doc[key], reverse=direction < 0))
+
+
+class FakeCollection:
+    def __init__(self, name, docs, commands):
+        self.name = name
+        self.docs = docs
+        self.commands = commands
+
+    def find(self, query=None, projection=None):
+        self.commands.append((self.name, 'find', query))
+        query = query or {}
+        return FakeCursor(
+            dict(doc) for doc in self.docs
+            if all(doc.get(field) == value for field, value in query.items())
+        )
+
+
+class FakeDatabase:
+    """Just enough of a pymongo Database to count the commands a read issues"""
+
+    def __init__(self, collections):
+        self.commands = []
+        self.collections = {
+            name: FakeCollection(name, docs, self.commands) for name, docs in collections.items()
+        }
+
+    def __getitem__(self, name):
+        return self.collections[name]
+
+
+def make_paper(num_sections, questions_per_section=3):
+    paper_id = ObjectId()
+    sections, questions = [], []
+    for order in range(num_sections):
+        section_id = ObjectId()
+        sections.append({
+            "_id": section_id, "paper_id": paper_id, "name": f"Section {order + 1}",
+            "question_type": "descriptive", "num_questions": questions_per_section,
+            "marks_per_question": 5, "instructions": "", "order": order,
+        })
+        for number in range(questions_per_section):
+            questions.append({
+                "_id": ObjectId(), "paper_id": paper_id, "section_id": section_id,
+                "text": f"Question {order}.{number}", "question_type": "descriptive",
+                "difficulty": "medium", "cognitive_level": "understand", "marks": 5,
+                "is_practical": False,
+            })
+    # Stored out of order to check the sections come back sorted
+    return {"_id": paper_id}, list(reversed(sections)), questions
+
+
+class PaperSectionsQueryTests(SimpleTestCase):
+    def test_normalized_paper_costs_two_queries_regardless_of_section_count(self):
+        for num_sections in (1, 4, 12):
+            paper, sections, questions = make_paper(num_sections)
+            fake_db = FakeDatabase({"sections": sections, "questions": questions})
+
+            with patch('utils.db_utils.db', fake_db):
+                loaded = get_paper_sections(paper)
+
+            self.assertEqual(len(fake_db.commands), 2, num_sections)
+            self.assertEqual([section["order"] for section in loaded], list(range(num_sections)))
+            for section in loaded:
+                self.assertEqual(len(section["questions"]), 3)
+                self.assertTrue(all(q["section_id"] == section["_id"] for q in section["questions"]))
+
+    def test_embedded_paper_needs_no_further_queries(self):
+        paper, sections, questions = make_paper(3)
+        embedded = dict(paper, layout=EMBEDDED_LAYOUT, sections=[
+            dict(section, questions=[q for q in questions if q["section_id"] == section["_id"]])
+            for section in sorted(sections, key=lambda section: section["order"])
+        ])
+        fake_db = FakeDatabase({"sections": [], "questions": []})
+
+        with patch('utils.db_utils.db', fake_db):
+            loaded = get_paper_sections(embedded)
+
+        self.assertEqual(fake_db.commands, [])
+        self.assertEqual(sum(len(section["questions"]) for section in loaded), 9)
+
+
+def make_pyq(text):
+    return {
+        "subject_name": "Database Management Systems", "question_text": text,
+        "hash": hashlib.md5(text.encode()).hexdigest(), "isEditing": False,
+    }
+
+
+class SavePyqQuestionsTests(SimpleTestCase):
+    """save_questions_to_db against the in-memory store, which enforces hash_1 like MongoDB"""
+
+    def setUp(self):
+        self.db = MemoryClient()['test']
+        self.collection = self.db['pyq_questions']
+        self.collection.create_index('hash', unique=True)
+        self.start_patch('papers.views.db', self.db)
+        self.start_patch('papers.views.ensure_collection_indexes')
+        self.record_subject_questions = self.start_patch('papers.views.record_subject_questions')
+
+    def start_patch(self, target, *args):
+        patcher = patch(target, *args)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def save(self, questions):
+        return PaperViewSet().save_questions_to_db(questions)
+
+    def test_stored_hashes_are_found_with_one_in_lookup(self):
+        stored_id = self.collection.insert_one(make_pyq("Define 3NF.")).inserted_id
+        questions = [make_pyq("Define 3NF."), make_pyq("What is a B+ tree?")]
+
+        with patch.object(self.collection, 'find', wraps=self.collection.find) as find:
+            saved = self.save(questions)
+
+        find.assert_called_once_with({"hash": {"$in": [q["hash"] for q in questions]}})
+        self.assertEqual(saved[0]["_id"], str(stored_id))
+        self.assertFalse(saved[0]["isEditing"])
+        self.assertEqual(saved[1]["question_text"], "What is a B+ tree?")
+        self.assertEqual(self.collection.count_documents({}), 2)
+        self.record_subject_questions.assert_called_once_with([questions[1]])
+
+    def test_repeats_within_one_upload_are_stored_once(self):
+        questions = [make_pyq("Define 3NF."), make_pyq("What is a B+ tree?"), make_pyq("Define 3NF.")]
+
+        saved = self.save(questions)
+
+        self.assertEqual(self.collection.count_documents({}), 2)
+        self.assertEqual([q["question_text"] for q in saved], [q["question_text"] for q in questions])
+        self.assertEqual(saved[2]["_id"], saved[0]["_id"])
+        self.assertEqual(saved[2]["_id"], str(self.collection.find_one({"hash": questions[0]["hash"]})["_id"]))
+
+    def test_duplicate_key_errors_map_back_to_the_stored_documents(self):
+        # Another upload stores the question between our lookup and our insert
+        raced_id = self.collection.insert_one(make_pyq("Define 3NF.")).inserted_id
+        real_find = self.collection.find
+        lookups = iter([[], None])
+
+        def find(query, *args, **kwargs):
+            result = next(lookups)
+            return real_find(query, *args, **kwargs) if result is None else result
+
+        questions = [make_pyq("Define 3NF."), make_pyq("What is a B+ tree?")]
+        with patch.object(self.collection, 'find', side_effect=find):
+            saved = self.save(questions)
+
+        self.assertEqual(saved[0]["_id"], str(raced_id))
+        self.assertFalse(saved[0]["isEditing"])
+        self.assertNotIn("_id", questions[0])
+        self.assertEqual(self.collection.count_documents({}), 2)
+        self.record_subject_questions.assert_called_once_with([questions[1]])
+
+    def test_subject_index_failure_does_not_fail_the_upload(self):
+        self.record_subject_questions.side_effect = RuntimeError("subjects collection unavailable")
+
+        saved = self.save([make_pyq("Define 3NF.")])
+
+        self.assertEqual(len(saved), 1)
+        self.assertEqual(self.collection.count_documents({}), 1)
+
+    def test_other_write_errors_are_raised(self):
+        error = BulkWriteError({"writeErrors": [{"index": 0, "code": 121, "errmsg": "Document failed validation"}]})
+        with patch.object(self.collection, 'insert_many', side_effect=error):
+            with self.assertRaises(BulkWriteError):
+                self.save([make_pyq("Define 3NF.")])
+
+
+class MemoryStoreTests(SimpleTestCase):
+    """The in-memory store (MONGODB_URI=memory://...) has to behave like MongoDB where the app relies on it"""
+
+    def setUp(self):
+        self.collection = MemoryClient()['test']['questions']
+
+    def test_unique_index_rejects_duplicates(self):
+        self.collection.create_index('hash', unique=True)
+        self.collection.insert_one({'hash': 'a'})
+
+        with self.assertRaises(DuplicateKeyError) as raised:
+            self.collection.insert_one({'hash': 'a'})
+
+        self.assertEqual(raised.exception.code, 11000)
+        self.collection.update_one({'hash': 'a'}, {'$set': {'hash': 'b'}})
+        self.collection.insert_one({'hash': 'a'})
+        with self.assertRaises(DuplicateKeyError):
+            self.collection.update_one({'hash': 'a'}, {'$set': {'hash': 'b'}})
+        self.assertEqual(self.collection.count_documents({}), 2)
+
+    def test_in_query_is_narrowed_by_the_index(self):
+        self.collection.create_index('hash')
+        self.collection.insert_many([{'hash': str(number)} for number in range(50)])
+        query = {'hash': {'$in': ['3', '7', 'missing']}}
+
+        self.assertEqual(len(self.collection._candidate_ids(query)), 2)
+        plan = self.collection.explain(query)['queryPlanner']['winningPlan']
+        self.assertEqual(plan['inputStage'], {'stage': 'IXSCAN', 'indexName': 'hash_1'})
+        self.assertEqual(sorted(doc['hash'] for doc in self.collection.find(query)), ['3', '7'])
+
+    def test_explain_models_sort_and_or_index_use(self):
+        self.collection.create_index([('uploaded_at', -1), ('_id', -1)], name='uploaded_at_id')
+        self.collection.create_index('hash')
+
+        def stages(query, sort=None):
+            plan = self.collection.explain(query, sort)['queryPlanner']['winningPlan']
+            return list(_plan_stages(plan))
+
+        self.assertEqual(stages({}, {'uploaded_at': 1, '_id': 1}), ['FETCH', 'IXSCAN'])
+        self.assertEqual(stages({}, {'uploaded_at': -1, '_id': 1}), ['SORT', 'COLLSCAN'])
+        self.assertEqual(stages({'uploaded_at': {'$lt': datetime(2024, 1, 1)}}), ['FETCH', 'IXSCAN'])
+        self.assertEqual(stages({'$or': [{'hash': 'a'}, {'uploaded_at': None}]}),
+                         ['FETCH', 'OR', 'IXSCAN', 'IXSCAN'])
+        self.assertEqual(stages({'$or': [{'hash': 'a'}, {'topic': 'SQL'}]}), ['COLLSCAN'])
+        self.assertEqual(stages({'hash': {'$ne': 'a'}}), ['COLLSCAN'])
+
+    def test_missing_fields_sort_first_like_null(self):
+        self.collection.insert_many([{'n': 2, 'rank': 2}, {'n': 0}, {'n': 1, 'rank': None}, {'n': 3, 'rank': 1}])
+
+        ascending = [doc['n'] for doc in self.collection.find().sort([('rank', 1), ('n', 1)])]
+        descending = [doc['n'] for doc in self.collection.find().sort([('rank', -1), ('n', 1)])]
+
+        self.assertEqual(ascending, [0, 1, 3, 2])
+        self.assertEqual(descending, [2, 3, 0, 1])
+
+    def test_find_one_and_update_returns_before_or_after(self):
+        self.collection.insert_one({'_id': 'job', 'status': 'queued'})
+
+        before = self.collection.find_one_and_update({'_id': 'job'}, {'$set': {'status': 'running'}})
+        after = self.collection.find_one_and_update(
+            {'_id': 'job'}, {'$set': {'status': 'done'}}, return_document=ReturnDocument.AFTER
+        )
+        missing = self.collection.find_one_and_update({'_id': 'other'}, {'$set': {'status': 'done'}})
+
+        self.assertEqual(before['status'], 'queued')
+        self.assertEqual(after['status'], 'done')
+        self.assertIsNone(missing)
+
+    def test_bulk_write_errors_report_the_failed_positions(self):
+        self.collection.create_index('hash', unique=True)
+        requests = [InsertOne({'hash': 'a'}), InsertOne({'hash': 'a'}), InsertOne({'hash': 'b'})]
+
+        with self.assertRaises(BulkWriteError) as raised:
+            self.collection.bulk_write(requests, ordered=False)
+
+        details = raised.exception.details
+        self.assertEqual([(error['index'], error['code']) for error in details['writeErrors']], [(1, 11000)])
+        self.assertEqual(details['nInserted'], 2)
+        with self.assertRaises(BulkWriteError) as raised:
+            self.collection.insert_many([{'hash': 'c'}, {'hash': 'b'}, {'hash': 'd'}])
+        self.assertEqual(raised.exception.details['nInserted'], 1)
+        self.assertEqual(self.collection.count_documents({}), 3)
+
+    def test_dotted_projections(self):
+        self.collection.insert_one({'_id': 1, 's': [{'a': 1, 'b': 2}, {'b': 3}], 't': {'x': 1, 'y': 2}})
+
+        self.assertEqual(self.collection.find_one({}, {'s.a': 1}), {'_id': 1, 's': [{'a': 1}, {}]})
+        self.assertEqual(self.collection.find_one({}, {'t.x': 1, '_id': 0}), {'t': {'x': 1}})
+        self.assertEqual(self.collection.find_one({}, {'s.b': 0, 't.y': 0}),
+                         {'_id': 1, 's': [{'a': 1}, {}], 't': {'x': 1}})
+        with self.assertRaises(OperationFailure):
+            self.collection.find_one({}, {'s': {'$slice': 1}})
+
+    def test_naive_and_aware_datetimes_compare_as_utc(self):
+        self.collection.insert_many([
+            {'n': 1, 'at': datetime(2024, 1, 1, 12)},
+            {'n': 2, 'at': datetime(2024, 1, 1, 13, tzinfo=timezone.utc)},
+        ])
+
+        later = {'at': {'$gt': datetime(2024, 1, 1, 12, 30, tzinfo=timezone.utc)}}
+        self.assertEqual([doc['n'] for doc in self.collection.find(later)], [2])
+        self.assertEqual(self.collection.count_documents({'at': datetime(2024, 1, 1, 13)}), 1)
+        self.assertEqual([doc['n'] for doc in self.collection.find().sort('at', -1)], [2, 1])
+
+
+class KeysetPaginationTests(SimpleTestCase):
+    def setUp(self):
+        self.collection = MemoryClient()['test']['pyq_questions']
+
+    def walk(self, page_size):
+        """Page through the collection the way the list view does, returning the _ids of each page"""
+        pages, query = [], {}
+        while True:
+            page = list(self.collection.find(query).sort(KEYSET_SORT).limit(page_size))
+            if not page:
+                return pages
+            pages.append([doc['_id'] for doc in page])
+            query = keyset_filter(encode_cursor(page[-1]))
+
+    def test_cursor_round_trip(self):
+        doc = {'_id': ObjectId(), 'uploaded_at': datetime(2024, 5, 1, 9, 30, 15, 123000)}
+
+        self.assertEqual(decode_cursor(encode_cursor(doc)), (doc['uploaded_at'], doc['_id']))
+        self.assertEqual(decode_cursor(encode_cursor({'_id': doc['_id']})), (None, doc['_id']))
+        self.assertNotIn('=', encode_cursor(doc))
+
+    def test_invalid_cursors_are_rejected(self):
+        def token(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        for bad in ['not-a-cursor', '', token([1, 2]), token({'t': None}), token({'t': None, 'id': 'nope'}),
+                    token({'t': 'yesterday', 'id': str(ObjectId())})]:
+            with self.subTest(bad=bad), self.assertRaises(InvalidCursor):
+                decode_cursor(bad)
+
+    def test_pages_break_ties_on_equal_upload_times_by_id(self):
+        batch_time = datetime(2024, 5, 1, 9, 30)
+        ids = self.collection.insert_many(
+            [{'uploaded_at': batch_time} for _ in range(5)] + [{'uploaded_at': datetime(2024, 4, 1)}]
+        ).inserted_ids
+
+        pages = self.walk(page_size=2)
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 2])
+        self.assertEqual(sum(pages, []), sorted(ids[:5], reverse=True) + [ids[5]])
+
+    def test_undated_questions_come_last_and_are_paged_by_id(self):
+        dated = self.collection.insert_many(
+            [{'uploaded_at': datetime(2024, 5, day)} for day in (1, 2)]
+        ).inserted_ids
+        undated = self.collection.insert_many(
+            [{'uploaded_at': None}, {}, {'uploaded_at': None}]
+        ).inserted_ids
+
+        pages = self.walk(page_size=2)
+
+        self.assertEqual(sum(pages, []), [dated[1], dated[0]] + sorted(undated, reverse=True))
+
+
+def make_generated_question(text):
+    return {
+        "sectionName": "Section A", "text": text, "questionType": "short", "difficulty": "easy",
+        "cognitiveLevel": "remember", "marks": 2, "isPractical": False,
+    }
+
+
+class GenerationJobExpiryTests(SimpleTestCase):
+    """A job expired by the stale-job sweep while its worker is still running must stay failed"""
+
+    def setUp(self):
+        self.db = MemoryClient()['test']
+        for target in ('papers.jobs.db', 'utils.db_utils.db'):
+            patcher = patch(target, self.db)
+            self.addCleanup(patcher.stop)
+            patcher.start()
+        patcher = patch('papers.jobs.record_stage_timings')
+        self.addCleanup(patcher.stop)
+        patcher.start()
+        self.paper_id = self.db['papers'].insert_one({'status': 'draft'}).inserted_id
+        self.section_id = self.db['sections'].insert_one({'paper_id': self.paper_id, 'name': 'Section A'}).inserted_id
+        self.job_id = create_job(self.paper_id, 'user-1', 1)
+
+    def expire(self):
+        stale = datetime.now(timezone.utc) - timedelta(seconds=settings.GENERATION_JOB_TIMEOUT + 1)
+        self.db['jobs'].update_one({'_id': self.job_id}, {'$set': {'updated_at': stale}})
+        self.assertEqual(expire_stale_jobs(), 1)
+
+    def run_job(self, generate_questions):
+        run_generation_job(self.job_id, self.paper_id, {'Section A': self.section_id}, {}, generate_questions)
+        return self.db['jobs'].find_one({'_id': self.job_id})
+
+    def test_completed_job_publishes_its_paper(self):
+        def generate(paper_params, on_section_done, timer):
+            on_section_done(1, 1)
+            return [make_generated_question("Define 2NF.")]
+
+        job = self.run_job(generate)
+
+        self.assertEqual((job['status'], job['progress'], job['question_count']), ('completed', 100, 1))
+        self.assertEqual(self.db['papers'].find_one({'_id': self.paper_id})['status'], 'published')
+
+    def test_polling_a_stale_job_expires_it(self):
+        self.assertEqual(get_job(self.job_id)['status'], 'queued')
+
+        stale = datetime.now(timezone.utc) - timedelta(seconds=settings.GENERATION_JOB_TIMEOUT + 1)
+        self.db['jobs'].update_one({'_id': self.job_id}, {'$set': {'updated_at': stale}})
+
+        self.assertEqual(get_job(self.job_id)['status'], 'failed')
+        self.assertIsNone(self.db['papers'].find_one({'_id': self.paper_id}))
+
+    def test_job_expired_in_the_queue_never_starts(self):
+        self.expire()
+
+        job = self.run_job(lambda *args, **kwargs: self.fail("an expired job should not generate"))
+
+        self.assertEqual((job['status'], job['started_at']), ('failed', None))
+
+    def test_expiry_during_generation_stops_the_job(self):
+        def generate(paper_params, on_section_done, timer):
+            self.expire()
+            on_section_done(1, 1)
+            self.fail("on_section_done should stop an expired job")
+
+        job = self.run_job(generate)
+
+        self.assertEqual((job['status'], job['error']), ('failed', STALE_JOB_ERROR))
+        self.assertIsNone(self.db['papers'].find_one({'_id': self.paper_id}))
+
+    def test_expiry_after_generation_skips_the_insert(self):
+        def generate(paper_params, on_section_done, timer):
+            self.expire()
+            return [make_generated_question("Define 2NF.")]
+
+        job = self.run_job(generate)
+
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(self.db['questions'].count_documents({}), 0)
+
+    def test_expiry_during_the_insert_removes_the_questions(self):
+        def insert_then_expire(*args):
+            inserted = insert_questions(*args)
+            self.expire()
+            return inserted
+
+        with patch('papers.jobs.insert_questions', side_effect=insert_then_expire):
+            job = self.run_job(lambda paper_params, on_section_done, timer: [make_generated_question("Define 2NF.")])
+
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(self.db['questions'].count_documents({}), 0)
+        self.assertIsNone(self.db['papers'].find_one({'_id': self.paper_id}))
+
+
+class GenerationRequestValidationTests(SimpleTestCase):
+    def post(self, action, data, **headers):
+        request = APIRequestFactory().post(f'/api/papers/{action}/', data, format='json', **headers)
+        force_authenticate(request, user=SimpleNamespace(_id=ObjectId(), is_authenticated=True))
+        method = action.replace('-', '_')
+        # The router passes each action's own options (e.g. renderer_classes) to as_view
+        response = PaperViewSet.as_view({'post': method}, **getattr(PaperViewSet, method).kwargs)(request)
+        return response.render()
+
+    def test_stream_request_missing_a_field_is_a_400_event(self):
+        data = {'department': 'CS', 'topics': ['SQL'], 'duration': 180, 'sections': []}
+
+        response = self.post('generate-stream', data, HTTP_ACCEPT='text/event-stream')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+        self.assertEqual(
+            response.content.decode(),
+            'event: error\ndata: {"error": "Missing required field(s): subjectName"}\n\n'
+        )
+
+    def test_section_missing_a_field_is_a_400(self):
+        data = PaperViewSet().get_dummy_paper_params()
+        del data['sections'][1]['marksPerQuestion']
+
+        response = self.post('generate', data)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'Section 2 is missing required field(s): marksPerQuestion'})
+
+
+class NDJSONListingTests(SimpleTestCase):
+    def test_invalid_cursor_is_a_400_json_line(self):
+        request = APIRequestFactory().get('/api/papers/questions/', {'cursor': 'bad'}, HTTP_ACCEPT='application/x-ndjson')
+        force_authenticate(request, user=SimpleNamespace(_id=ObjectId(), is_authenticated=True))
+
+        view = PaperViewSet.as_view({'get': 'get_questions'}, **PaperViewSet.get_questions.kwargs)
+        response = view(request).render()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = response.content.decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn('Invalid cursor', json.loads(lines[0])['error'])
+
+
+class AssembledGenerationTests(SimpleTestCase):
+    def setUp(self):
+        self.view = PaperViewSet()
+        self.data = dict(self.view.get_dummy_paper_params(), sections=[
+            {'name': 'Section A', 'questionType': 'short', 'numQuestions': 2, 'marksPerQuestion': 5},
+        ], difficultyDistribution={'easy': 50, 'medium': 50, 'hard': 0})
+
+    def generate(self, candidates, **data):
+        with patch.object(PaperViewSet, 'generate_questions_with_ollama', return_value=candidates) as generate:
+            questions = self.view.generate_assembled_questions(dict(self.data, **data))
+        return questions, generate.call_args.args[0]
+
+    def candidate(self, number, difficulty):
+        return dict(make_generated_question(f"Question {number}"), difficulty=difficulty, marks=1)
+
+    def test_default_pool_is_assembled_to_the_quotas(self):
+        candidates = [self.candidate(1, 'easy'), self.candidate(2, 'easy'), self.candidate(3, 'medium'),
+                      self.candidate(4, 'hard')]
+
+        questions, asked = self.generate(candidates)
+
+        self.assertEqual(asked['sections'][0]['numQuestions'], 2 * settings.GENERATION_POOL_FACTOR)
+        self.assertEqual(sorted(q['difficulty'] for q in questions), ['easy', 'medium'])
+        self.assertEqual([(q['id'], q['marks']) for q in questions], [(1, 5), (2, 5)])
+
+    def test_pool_factor_one_still_fixes_counts_and_marks(self):
+        candidates = [self.candidate(number, 'easy') for number in range(1, 4)]
+
+        questions, asked = self.generate(candidates, poolFactor=1)
+
+        self.assertEqual(asked['sections'][0]['numQuestions'], 2)
+        self.assertEqual([(q['id'], q['marks']) for q in questions], [(1, 5), (2, 5)])
+
+
+class QueryShapeTests(SimpleTestCase):
+    def test_declared_query_shapes_are_indexed(self):
+        database = MemoryClient()['test']
+        with patch('utils.indexes.get_db', return_value=database):
+            created, failed = ensure_indexes()
+            plans = {shape['name']: explain_query_shape(shape) for shape in collect_query_shapes()}
+
+        self.assertEqual(failed, {})
+        self.assertEqual({name: stages for name, stages in plans.items() if 'COLLSCAN' in stages}, {})
+
+    def test_bank_lookup_shape_is_the_retrieval_filter(self):
+        shape = next(shape for shape in collect_query_shapes() if shape['name'] == 'question bank lookup')
+        collection = MemoryClient()['test']['questions']
+        paper = {'subjectName': 'DBMS', 'topics': ['SQL'], 'difficultyDistribution': {'easy': 100}}
+        section = {'name': 'A', 'questionType': 'short', 'marksPerQuestion': 2, 'numQuestions': 1}
+
+        with patch('papers.retrieval.db', {'questions': collection}), \
+                patch('papers.retrieval.ensure_bank_indexes'), \
+                patch.object(collection, 'aggregate', return_value=[]) as aggregate:
+            retrieve_bank_questions(paper, section)
+
+        self.assertEqual(set(aggregate.call_args.args[0][0]['$match']), set(shape['filter']))
+
+
+class PaperCacheTests(SimpleTestCase):
+    """The in-process paper cache, without a shared backend"""
+
+    def setUp(self):
+        self.cache = PaperCache(max_entries=2)
+        self.loads = 0
+
+    def load(self, title='Paper'):
+        def loader():
+            self.loads += 1
+            return {'status': 'published', 'title': title}
+        return loader
+
+    def test_invalidation_drops_the_cached_copy(self):
+        self.cache.get_or_load('p1', self.load('old'))
+        self.assertEqual(self.cache.get_or_load('p1', self.load('unused'))['title'], 'old')
+
+        self.cache.invalidate('p1')
+
+        self.assertEqual(self.cache.get_or_load('p1', self.load('new'))['title'], 'new')
+        self.assertEqual(self.loads, 2)
+
+    def test_copy_loaded_across_an_invalidation_is_not_kept(self):
+        def loader():
+            self.cache.invalidate('p1')  # a write lands while the paper is read
+            return {'status': 'published', 'title': 'stale'}
+
+        self.cache.get_or_load('p1', loader)
+
+        self.assertEqual(self.cache.get_or_load('p1', self.load('fresh'))['title'], 'fresh')
+
+    def test_invalidation_bookkeeping_is_bounded(self):
+        def loader():
+            # Enough other writes that the invalidation of p1 itself is forgotten
+            self.cache.invalidate('p1')
+            for number in range(10):
+                self.cache.invalidate(f"other-{number}")
+            return {'status': 'published', 'title': 'stale'}
+
+        self.cache.get_or_load('p1', loader)
+
+        self.assertEqual(self.cache.stats()['tracked_invalidations'], 2)
+        self.assertEqual(self.cache.get_or_load('p1', self.load('fresh'))['title'], 'fresh')
+
+    def test_drafts_are_not_cached(self):
+        self.cache.get_or_load('p1', lambda: {'status': 'draft'})
+
+        self.assertEqual(self.cache.stats()['memory_size'], 0)
+
+
+class DownloadPaperPdfTests(SimpleTestCase):
+    def setUp(self):
+        self.owner = SimpleNamespace(_id=ObjectId(), is_authenticated=True)
+        self.paper = {'_id': 'p1', 'title': 'DBMS Exam Paper', 'user_id': str(self.owner._id)}
+        for target, value in (('papers.views.get_serialized_paper', lambda paper_id: self.paper),
+                              ('papers.views.render_paper_pdf', lambda paper: b'%PDF-1.4')):
+            patcher = patch(target, side_effect=value)
+            self.addCleanup(patcher.stop)
+            patcher.start()
+
+    def download(self, user):
+        request = APIRequestFactory().get('/api/papers/p1/download/')
+        force_authenticate(request, user=user)
+        return download_paper_pdf(request, 'p1')
+
+    def test_owner_gets_the_pdf(self):
+        response = self.download(self.owner)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+    def test_other_users_get_404(self):
+        response = self.download(SimpleNamespace(_id=ObjectId(), is_authenticated=True))
+
+        self.assertEqual(response.status_code, 404)
+
+
+class JSONArrayStreamParserTests(SimpleTestCase):
+    def test_objects_split_across_chunks(self):
+        parser = JSONArrayStreamParser()
+        text = 'Here are the questions:\n[{"text": "Why {braces} and \\"quotes\\"?", "marks": 2}, {"text": "B"}]'
+
+        first_end = text.index('2}') + 2
+        before = parser.feed(text[:first_end - 1])
+        first = parser.feed(text[first_end - 1:first_end])
+        rest = [obj for position in range(first_end, len(text), 3) for obj in parser.feed(text[position:position + 3])]
+
+        # Nothing comes out until the chunk that closes an object
+        self.assertEqual(before, [])
+        self.assertEqual(first, [{"text": 'Why {braces} and "quotes"?', "marks": 2}])
+        self.assertEqual(rest, [{"text": "B"}])
+
+    def test_escaped_backslash_before_a_quote_split_between_chunks(self):
+        parser = JSONArrayStreamParser()
+
+        self.assertEqual(parser.feed('[{"text": "C:\\'), [])
+        self.assertEqual(parser.feed('\\"}'), [{"text": "C:\\"}])
+
+    def test_malformed_objects_are_skipped(self):
+        parser = JSONArrayStreamParser()
+
+        objects = parser.feed('[{"text": "A"}, {"text": "B",}, {"text": "C"}] {"text": "after the array"}')
+
+        self.assertEqual(objects, [{"text": "A"}, {"text": "C"}])
+        self.assertTrue(parser.finished)
+
+    def test_without_require_array_every_top_level_object_counts(self):
+        parser = JSONArrayStreamParser(require_array=False)
+
+        self.assertEqual(parser.feed('{"a": 1} text {"b": {"c": 2}}'), [{"a": 1}, {"b": {"c": 2}}])
+
+
+class QuestionValidationTests(SimpleTestCase):
+    def setUp(self):
+        self.params = PaperViewSet().get_dummy_paper_params()
+        self.short = {'name': 'Section B', 'questionType': 'short', 'marksPerQuestion': 5}
+        self.mcq = {'name': 'Section A', 'questionType': 'mcq', 'marksPerQuestion': 1}
+
+    def test_salvage_survives_prose_truncation_and_wrapping(self):
+        content = 'Sure! {"questions": [{"text": "A"}, {"text": "B"}]} and [{"text": "C"}, {"text": "D", "opt'
+
+        self.assertEqual([q['text'] for q in salvage_questions(content)], ['A', 'B', 'C'])
+        self.assertEqual(salvage_questions(None), [])
+
+    def test_invalid_and_duplicate_questions_are_dropped(self):
+        candidates = [
+            {'text': 'Define normalization.', 'questionType': 'short', 'difficulty': 'EASY', 'marks': 50},
+            {'text': 'define normalization!'},
+            {'text': 'Pick one', 'questionType': 'mcq'},
+            {'text': ''},
+            {'text': 'Explain 2PL.', 'difficulty': 'impossible', 'cognitiveLevel': 'apply', 'isPractical': 'true'},
+            {'text': 'Explain ACID.'},
+        ]
+
+        valid = validate_questions(candidates, self.short, self.params, set(), limit=2)
+
+        self.assertEqual([q['text'] for q in valid], ['Define normalization.', 'Explain 2PL.'])
+        self.assertEqual([q['marks'] for q in valid], [5, 5])
+        self.assertEqual(valid[0]['difficulty'], 'easy')
+        difficulties = self.params['difficultyDistribution']
+        self.assertEqual(valid[1]['difficulty'], max(difficulties, key=difficulties.get))
+        self.assertEqual((valid[1]['cognitiveLevel'], valid[1]['isPractical']), ('apply', True))
+
+    def test_mcqs_need_two_options_and_an_answer(self):
+        candidates = [
+            {'text': 'One option', 'options': ['A'], 'answer': 'A'},
+            {'text': 'No answer', 'options': ['A', 'B']},
+            {'text': 'Blank options', 'options': ['A', ' ', 'B'], 'answer': 'B'},
+        ]
+
+        valid = validate_questions(candidates, self.mcq, self.params, set(), limit=5)
+
+        self.assertEqual([(q['text'], q['options']) for q in valid], [('Blank options', ['A', 'B'])])
+
+
+class LLMResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.db = MemoryClient()['test']
+        for target in ('papers.llm_cache.db', 'papers.llm_cache.ensure_collection_indexes'):
+            patcher = patch(target, self.db) if target.endswith('.db') else patch(target)
+            self.addCleanup(patcher.stop)
+            patcher.start()
+
+    def make_cache(self, **options):
+        options = dict({'ttl_seconds': 60, 'max_entries': 10, 'memory_entries': 10}, **options)
+        return LLMResponseCache('llm_cache', **options)
+
+    def test_responses_are_shared_through_the_collection(self):
+        self.make_cache().set('Write   two\n questions', 'llama3', '[{"text": "A"}]')
+
+        other_process = self.make_cache()
+
+        self.assertEqual(other_process.get('Write two questions', 'llama3'), '[{"text": "A"}]')
+        self.assertIsNone(other_process.get('Write two questions', 'mistral'))
+        self.assertEqual(other_process.get('Write two questions', 'llama3'), '[{"text": "A"}]')
+        stats = other_process.stats()
+        self.assertEqual((stats['store_hits'], stats['memory_hits'], stats['misses']), (1, 1, 1))
+
+    def test_expired_responses_are_misses(self):
+        cache = self.make_cache(ttl_seconds=-1)
+        cache.set('prompt', 'llama3', 'response')
+
+        self.assertIsNone(cache.get('prompt', 'llama3'))
+        self.assertIsNone(self.make_cache().get('prompt', 'llama3'))
+
+    def test_least_recently_used_responses_are_evicted(self):
+        cache = self.make_cache(max_entries=2)
+        cache.set('a', 'llama3', 'A')
+        cache.set('b', 'llama3', 'B')
+        self.make_cache().get('a', 'llama3')  # a is now more recently used than b
+
+        cache.set('c', 'llama3', 'C')
+
+        fresh = self.make_cache()
+        self.assertEqual([fresh.get(prompt, 'llama3') for prompt in 'abc'], ['A', None, 'C'])
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+
+class InsertPaperBundleTests(SimpleTestCase):
+    def setUp(self):
+        self.client = MemoryClient()
+        self.db = self.client['test']
+        for target, value in (('utils.db_utils.db', self.db), ('utils.db_utils.get_client', lambda: self.client),
+                              ('utils.db_utils._transactions_supported', None)):
+            patcher = patch(target, value)
+            self.addCleanup(patcher.stop)
+            patcher.start()
+        view = PaperViewSet()
+        self.params = view.get_dummy_paper_params()
+        self.record = view.paper_record(self.params)
+
+    def test_standalone_servers_fall_back_to_plain_writes(self):
+        questions = [dict(make_generated_question("Define 2NF."), sectionName=self.params['sections'][0]['name'])]
+
+        paper_doc, section_docs, question_docs = insert_paper_bundle(
+            self.record, 'user-1', self.params['sections'], questions
+        )
+
+        self.assertFalse(db_utils._transactions_supported)
+        self.assertEqual(self.db['papers'].find_one({'_id': paper_doc['_id']})['status'], 'published')
+        self.assertEqual(self.db['sections'].count_documents({'paper_id': paper_doc['_id']}), len(section_docs))
+        self.assertEqual(self.db['questions'].count_documents({'paper_id': paper_doc['_id']}), 1)
+
+        # Known to be standalone now: no further transaction attempts
+        with patch.object(self.client, 'start_session') as start_session:
+            insert_paper_bundle(self.record, 'user-1', self.params['sections'], [])
+        start_session.assert_not_called()
+
+    def test_other_transaction_failures_are_raised(self):
+        session = MemorySession()
+        with patch.object(session, 'with_transaction', side_effect=OperationFailure("WriteConflict", 112)), \
+                patch.object(self.client, 'start_session', return_value=session):
+            with self.assertRaises(OperationFailure):
+                insert_paper_bundle(self.record, 'user-1', self.params['sections'], [])
+
+        self.assertEqual(self.db['papers'].count_documents({}), 0)
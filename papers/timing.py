@@ -0,0 +1,115 @@
+# papers/timing.py
+import math
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from django.conf import settings
+from pymongo.errors import CollectionInvalid
+from utils.db_utils import db
+from utils.indexes import ensure_collection_indexes
+
+METRICS_COLLECTION = 'generation_metrics'
+_collection_ready = False
+
+
+class StageTimer:
+    """
+    Accumulates wall-clock time per named stage using the monotonic perf counter.
+
+    Stages timed from several threads (e.g. one per section) are summed, so
+    they can add up to more than the request's total.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        with self.lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def as_ms(self):
+        with self.lock:
+            stages = {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()}
+        stages['total'] = round((time.perf_counter() - self.started) * 1000, 2)
+        return stages
+
+    def server_timing_header(self):
+        """Value for the Server-Timing response header, e.g. `llm;dur=5321.4, total;dur=5410.2`"""
+        return ', '.join(f"{name};dur={ms:.1f}" for name, ms in self.as_ms().items())
+
+
+def _ensure_metrics_collection():
+    global _collection_ready
+    if _collection_ready:
+        return
+    try:
+        # Capped: Mongo drops the oldest samples once the size limit is reached
+        db.create_collection(
+            METRICS_COLLECTION,
+            capped=True,
+            size=settings.GENERATION_METRICS_MAX_BYTES,
+            max=settings.GENERATION_METRICS_MAX_DOCS
+        )
+    except CollectionInvalid:
+        pass  # already exists
+    ensure_collection_indexes(METRICS_COLLECTION)
+    _collection_ready = True
+
+
+def record_stage_timings(timer, endpoint, user_id):
+    """Append one sample to the generation_metrics collection; never fails the request"""
+    try:
+        _ensure_metrics_collection()
+        stages = timer.as_ms()
+        db[METRICS_COLLECTION].insert_one({
+            "endpoint": endpoint,
+            "user_id": user_id,
+            "total_ms": stages.pop('total'),
+            "stages": stages,
+            "created_at": datetime.now(timezone.utc),
+        })
+    except Exception as e:
+        print(f"Failed to record generation metrics: {e}")
+
+
+def _percentile(sorted_values, percent):
+    # Nearest-rank percentile
+    rank = max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def stage_percentiles(since, endpoint=None):
+    """p50/p95/p99 per stage (and for the total) over samples recorded since `since`"""
+    query = {"created_at": {"$gte": since}}
+    if endpoint:
+        query["endpoint"] = endpoint
+
+    samples = {}
+    count = 0
+    for doc in db[METRICS_COLLECTION].find(query, {"stages": 1, "total_ms": 1, "_id": 0}):
+        count += 1
+        samples.setdefault('total', []).append(doc['total_ms'])
+        for name, ms in doc.get('stages', {}).items():
+            samples.setdefault(name, []).append(ms)
+
+    stages = {}
+    for name, values in samples.items():
+        values.sort()
+        stages[name] = {
+            "count": len(values),
+            "p50": _percentile(values, 50),
+            "p95": _percentile(values, 95),
+            "p99": _percentile(values, 99),
+        }
+    return {"samples": count, "stages": stages}
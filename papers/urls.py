@@ -1,9 +1,11 @@
 # papers/urls.py
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
 from authentication import views
-from .views import PaperViewSet, TestOllamaView, download_paper_pdf
+from . import async_views
+from .views import PaperViewSet, TestOllamaView, MongoPoolStatsView, download_paper_pdf
 
 router = DefaultRouter()
 router.register(r'papers', PaperViewSet, basename='paper')
@@ -11,5 +13,14 @@ router.register(r'papers', PaperViewSet, basename='paper')
 urlpatterns = [
     path('', include(router.urls)),
     path('api/test-ollama/', TestOllamaView.as_view(), name='test-ollama'),
-    path('<str:paper_id>/download/', download_paper_pdf, name='download_paper_pdf')
-]
\ No newline at end of file
+    path('mongo-pool-stats/', MongoPoolStatsView.as_view(), name='mongo-pool-stats'),
+    path('<str:paper_id>/download/', download_paper_pdf, name='download_paper_pdf'),
+]
+
+if settings.ASYNC_VIEWS_ENABLED:
+    # Async (ASGI) versions of the I/O-bound endpoints
+    urlpatterns += [
+        path('async/generate/', async_views.generate_paper, name='async_generate_paper'),
+        path('async/questions/', async_views.list_questions, name='async_list_questions'),
+        path('async/<str:paper_id>/download/', async_views.download_paper_pdf, name='async_download_paper_pdf'),
+    ]
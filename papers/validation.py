@@ -0,0 +1,92 @@
+# papers/validation.py
+import re
+from .streaming import JSONArrayStreamParser
+
+
+def normalize_text(text):
+    return re.sub(r'[^\w\s]', '', str(text or '').strip().lower())
+
+
+def salvage_questions(generated_content):
+    """
+    Recover every well-formed question object from an LLM response.
+
+    Unlike slicing between the first `[` and last `]`, this survives prose around
+    the JSON, truncated output and individual malformed objects. Questions wrapped
+    in an object (e.g. {"questions": [...]}) are unwrapped.
+    """
+    parser = JSONArrayStreamParser(require_array=False)
+    questions = []
+    for obj in parser.feed(generated_content or ''):
+        if 'text' in obj:
+            questions.append(obj)
+            continue
+        for value in obj.values():
+            if isinstance(value, list):
+                questions.extend(item for item in value if isinstance(item, dict))
+    return questions
+
+
+def _pick(value, allowed, default):
+    value = str(value or '').strip().lower()
+    return value if value in allowed else default
+
+
+def validate_question(question, section, paper_params, seen_texts):
+    """
+    Check a generated question against its section, returning a cleaned copy or None.
+
+    Rejected: missing text, a duplicate of a question already accepted, a
+    question type that contradicts the section, and MCQs without at least two
+    options and an answer. Marks are set from the section, and unknown difficulty
+    or cognitive labels fall back to the most heavily weighted category.
+    """
+    text = str(question.get('text') or '').strip()
+    key = normalize_text(text)
+    if not key or key in seen_texts:
+        return None
+
+    question_type = section['questionType']
+    claimed_type = str(question.get('questionType') or '').strip().lower()
+    if claimed_type and claimed_type != question_type.lower():
+        return None
+
+    difficulties = paper_params['difficultyDistribution']
+    cognitive_levels = paper_params['cognitiveDistribution']
+    cleaned = dict(question)
+    cleaned.update({
+        'sectionName': section['name'],
+        'text': text,
+        'questionType': question_type,
+        'marks': section['marksPerQuestion'],
+        'difficulty': _pick(question.get('difficulty'), difficulties, max(difficulties, key=difficulties.get)),
+        'cognitiveLevel': _pick(question.get('cognitiveLevel'), cognitive_levels,
+                                max(cognitive_levels, key=cognitive_levels.get)),
+        'isPractical': question.get('isPractical') in (True, 'true', 'True', 1),
+    })
+
+    if question_type == 'mcq':
+        options = question.get('options')
+        if not isinstance(options, list):
+            return None
+        options = [str(option).strip() for option in options if str(option).strip()]
+        if len(options) < 2 or not str(question.get('answer') or '').strip():
+            return None
+        cleaned['options'] = options
+    else:
+        cleaned.pop('options', None)
+
+    seen_texts.add(key)
+    return cleaned
+
+
+def validate_questions(candidates, section, paper_params, seen_texts, limit):
+    """Keep up to `limit` valid questions for `section` from `candidates`"""
+    valid = []
+    for question in candidates:
+        if len(valid) == limit:
+            break
+        cleaned = validate_question(question, section, paper_params, seen_texts)
+        if cleaned:
+            valid.append(cleaned)
+    return valid
@@ -0,0 +1,33 @@
+# papers/variants.py
+from .assembler import assemble_paper
+from .validation import normalize_text
+
+VARIANT_LABELS = 'ABCDEFGHIJ'
+
+
+def split_into_variants(candidates, paper_params, num_variants, time_budget_ms=100):
+    """
+    Build `num_variants` papers from one over-generated candidate pool.
+
+    Each variant is assembled against the paper's exact difficulty, cognitive,
+    practical and topic quotas. Questions already placed in an earlier variant
+    carry a reuse penalty, so variants stay disjoint while the pool allows and
+    overlap as little as possible when it doesn't.
+    """
+    pool = []
+    seen = set()
+    for question in candidates:
+        key = (question.get('sectionName'), normalize_text(question.get('text')))
+        if key in seen:
+            continue
+        seen.add(key)
+        pool.append(question)
+
+    usage = {}
+    variants = []
+    for variant in range(num_variants):
+        questions, _ = assemble_paper(
+            pool, paper_params, time_budget_ms=time_budget_ms, seed=variant, usage=usage
+        )
+        variants.append(questions)
+    return variants
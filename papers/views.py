@@ -3,63 +3,103 @@ import hashlib
 from io import BytesIO
 import json
 import re
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 import fitz
-import requests
 import traceback
-import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.views import APIView
 from .models import Paper
 from .serializers import PaperSerializer
+from .renderers import EventStreamRenderer, NDJSONRenderer
+from .pagination import KEYSET_SORT, InvalidCursor, encode_cursor, keyset_filter
+from .subjects import record_subject_questions, search_subjects
+from .streaming import JSONArrayStreamParser, format_sse
+from .jobs import create_job, enqueue_generation_job, get_job, serialize_job
+from .llm_cache import get_response_cache
+from .llm_client import get_ollama_client
+from .steps import LLMCall, run_steps
+from .variants import VARIANT_LABELS, split_into_variants
+from .retrieval import retrieve_bank_questions
+from .validation import normalize_text, salvage_questions, validate_question, validate_questions
+from .assembler import assemble_paper
+from .mock_templates import generate_mock_questions
+from .t5_engine import get_t5_generator
+from .onnx_engine import get_onnx_t5_generator
+from .timing import StageTimer, record_stage_timings, stage_percentiles
 from bson import ObjectId
-from pymongo import MongoClient
-from utils.db_utils import get_paper
-from datetime import datetime, timezone
-from pymongo import ASCENDING
+from bson.errors import InvalidId
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from utils.db_utils import get_paper, get_paper_sections
+from datetime import datetime, timedelta, timezone
 import os
-from dotenv import load_dotenv
 from rest_framework.decorators import api_view, permission_classes
 from utils.db_utils import db
+from utils.indexes import ensure_collection_indexes
+from utils.mongo_client import pool_stats
+from utils.search_keys import subject_search_fields
+from utils.paper_cache import get_paper_cache
 from xhtml2pdf import pisa
 from django.template.loader import render_to_string
-from utils.db_utils import insert_section, insert_question, update_paper_status, insert_paper
+from utils.db_utils import insert_section, insert_question, update_paper_status, insert_paper, insert_paper_bundle
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
 from django.conf import settings
-from django.core.files.storage import FileSystemStorage
-
 
 class TestOllamaView(APIView):
     def get(self, request):
         try:
-            return Response({"message": "Ollama API is working!"})
+            return Response({
+                "message": "Ollama API is working!",
+                "client": get_ollama_client().stats(),
+                "cache": get_response_cache().stats(),
+                "paper_cache": get_paper_cache().stats(),
+            })
         except Exception as e:
             print(f"Error in TestOllamaView: {str(e)}")
             traceback.print_exc()
             return Response({"error": "An error occurred"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class MongoPoolStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """Connection pool checkout and wait statistics per MongoDB server"""
+        return Response({"pools": pool_stats.stats()})
+
 class PaperViewSet(viewsets.ModelViewSet):
     serializer_class = PaperSerializer
     permission_classes = [IsAuthenticated]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        load_dotenv()  # Load .env variables
-
-        mongo_uri = os.getenv("MONGODB_URI")
-        db_name = os.getenv("MONGODB_DB")
-
-        client = MongoClient(mongo_uri)
-        self.db = client[db_name]
+        # DRF builds a view instance per request, so reuse the process-wide client
+        self.db = db
 
     def get_queryset(self):
         # This still uses Django ORM for relational models (Django's Paper model)
         return Paper.objects.filter(user=self.request.user).order_by('-created_at')
 
+    def retrieve(self, request, *args, **kwargs):
+        """Generated papers live in MongoDB and are served through the paper cache"""
+        pk = kwargs.get('pk')
+        if not ObjectId.is_valid(pk):
+            return super().retrieve(request, *args, **kwargs)
+
+        try:
+            paper = get_serialized_paper(pk)
+            if not paper or paper["user_id"] != str(request.user._id):
+                return Response({"error": "Paper not found"}, status=status.HTTP_404_NOT_FOUND)
+            return Response(paper)
+
+        except Exception as e:
+            traceback.print_exc()
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
     @action(detail=False, methods=['get'])
     def user(self, request):
         papers = self.get_queryset()
@@ -77,89 +117,274 @@ class PaperViewSet(viewsets.ModelViewSet):
 
             # Ensure user.id is accessed correctly
             user_id = str(request.user._id)  # This will get the _id from the MongoDB user
-            
-            paper_doc = {
-                "user_id": user_id,
-                "title": f"{data['subjectName']} Exam Paper",
-                "subject_name": data['subjectName'],
-                "department": data['department'],
-                "topics": data['topics'],
-                "total_marks": data.get('totalMarks', 0),
-                "duration": data['duration'],
-                "include_formula": data.get('includeFormula', False),
-                "include_diagrams": data.get('includeDiagrams', False),
-                "include_answer_key": data.get('includeAnswerKey', True),
-                "status": "draft",
-                "created_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc),
-            }
-            # 1. Insert Paper into MongoDB
-            paper_id = insert_paper(paper_doc, user_id)
-            # paper_id = ObjectId("681878d00b4563cb1baa6b48")  # Convert to ObjectId for MongoDB
+
+            require_generation_fields(data)
+
+            # Several equivalent papers (sets A/B/C...) from a single generation pass
+            variants = positive_int_param(request.query_params.get('variants') or data.get('variants'), 'variants')
+            # Checked here so job mode reports a bad poolFactor too, not just its worker
+            self.pool_factor(data)
+            job_mode = request.query_params.get('mode') == 'job' or data.get('mode') == 'job'
+            if variants > 1:
+                if job_mode:
+                    return Response(
+                        {"error": "Variant sets cannot be generated in job mode"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                if variants > settings.MAX_PAPER_VARIANTS:
+                    return Response(
+                        {"error": f"At most {settings.MAX_PAPER_VARIANTS} variants can be generated at once"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                return self.generate_variant_set(data, user_id, variants)
+
+            # Job mode: hand generation to the background pool and return straight away
+            if job_mode:
+                # The draft paper and its sections must exist before the job fills them in
+                paper_id, section_ids = self.create_draft_paper(data, user_id)
+                if not paper_id:
+                    return Response({"error": "Failed to create paper"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                job_id = create_job(paper_id, user_id, len(data['sections']))
+                enqueue_generation_job(job_id, paper_id, section_ids, data, self.generate_assembled_questions)
+                return Response({
+                    "job_id": str(job_id),
+                    "paper_id": str(paper_id),
+                    "status": "queued"
+                }, status=status.HTTP_202_ACCEPTED)
+
+            timer = StageTimer()
+
+            # 1. Generate Questions using Ollama
+            generated_questions = self.generate_assembled_questions(data, timer)
+
+            # 2. Write the published paper, its sections and its questions in one go
+            with timer.stage('persist'):
+                paper_doc, section_docs, question_docs = insert_paper_bundle(
+                    self.paper_record(data), user_id, data['sections'], generated_questions
+                )
+
+            # 3. Return the paper data, serialized from the documents just written
+            with timer.stage('serialize'):
+                paper_data = self.serialize_paper_docs(paper_doc, section_docs, question_docs)
+
+            response = Response(paper_data, status=status.HTTP_201_CREATED)
+            response['Server-Timing'] = timer.server_timing_header()
+            record_stage_timings(timer, 'generate', user_id)
+            return response
+
+        except InvalidGenerationParam as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            traceback.print_exc()
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=['post'], url_path='generate-stream',
+            renderer_classes=[JSONRenderer, EventStreamRenderer])
+    def generate_stream(self, request):
+        """Generate a paper, pushing each question to the client as a Server-Sent Event"""
+        data = request.data if request.data else self.get_dummy_paper_params()
+
+        try:
+            require_generation_fields(data)
+            user_id = str(request.user._id)
+            paper_id, section_ids = self.create_draft_paper(data, user_id)
             if not paper_id:
                 return Response({"error": "Failed to create paper"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        except InvalidGenerationParam as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            traceback.print_exc()
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            # # 2. Insert Sections into MongoDB and keep track of their IDs
-            section_ids = {}
-            for index, section_data in enumerate(data['sections']):
-                section_id = insert_section(section_data, paper_id, index)
-                section_ids[section_data['name']] = section_id
-
-            # # 3. Generate Questions using Ollama
-            generated_questions = self.generate_questions_with_ollama(data)
-            # # 4. Insert Questions into MongoDB
-            for question_data in generated_questions:
-                section_name = question_data['sectionName']
+        response = StreamingHttpResponse(
+            self.stream_generated_questions(data, paper_id, section_ids),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+        return response
+
+    @action(detail=False, methods=['get'], url_path=r'jobs/(?P<job_id>[^/.]+)')
+    def job_status(self, request, job_id=None):
+        """Report the progress of a background generation job"""
+        try:
+            job = get_job(job_id)
+            if not job or job["user_id"] != str(request.user._id):
+                return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+
+            response_data = serialize_job(job)
+            if job["status"] == "completed":
+                paper = get_serialized_paper(job["paper_id"])
+                if paper:
+                    response_data["paper"] = paper
+            return Response(response_data)
+
+        except InvalidId:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            traceback.print_exc()
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=['get'], url_path='generation-metrics', permission_classes=[IsAdminUser])
+    def generation_metrics(self, request):
+        """p50/p95/p99 of each generation stage over the last `minutes` (default 60)"""
+        try:
+            minutes = int(request.query_params.get('minutes', 60))
+            since = datetime.now(timezone.utc) - timedelta(minutes=minutes)
+            endpoint = request.query_params.get('endpoint')
+            return Response(dict(stage_percentiles(since, endpoint), minutes=minutes))
+        except ValueError:
+            return Response({"error": "minutes must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            traceback.print_exc()
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def generate_assembled_questions(self, data, timer=None, on_section_done=None):
+        """
+        Generate poolFactor times the paper's questions and let the assembler pick
+        the ones that meet its quotas. With poolFactor 1 there is nothing to choose
+        between, but the assembler still fixes each section's count and marks.
+        """
+        timer = timer or StageTimer()
+        candidates = self.generate_questions_with_ollama(
+            self.pool_params(data, self.pool_factor(data)), on_section_done=on_section_done, timer=timer
+        )
+        return self.assemble_candidates(candidates, data, timer)
+
+    def pool_factor(self, data):
+        return positive_int_param(data.get('poolFactor'), 'poolFactor', settings.GENERATION_POOL_FACTOR)
+
+    def pool_params(self, data, factor):
+        """The generation request with every section asked for `factor` times as many questions"""
+        return dict(data, sections=[
+            dict(section, numQuestions=section['numQuestions'] * factor)
+            for section in data['sections']
+        ])
+
+    def assemble_candidates(self, candidates, data, timer):
+        """Pick the paper's questions from an over-generated pool to meet the requested quotas"""
+        with timer.stage('assemble'):
+            questions, _ = assemble_paper(candidates, data, time_budget_ms=settings.ASSEMBLER_TIME_BUDGET_MS)
+        for index, question in enumerate(questions, start=1):
+            question['id'] = index
+        return questions
+
+    def generate_variant_set(self, data, user_id, variants):
+        """Generate one over-sized candidate pool and store it as `variants` papers sharing a set id"""
+        # 1. One generation pass with every section asked for `variants` times as many questions
+        candidates = self.generate_questions_with_ollama(self.pool_params(data, variants))
+
+        # 2. Assemble the papers from the shared pool
+        variant_questions = split_into_variants(
+            candidates, data, variants, time_budget_ms=settings.ASSEMBLER_TIME_BUDGET_MS
+        )
+
+        # 3. Store each variant as its own published paper
+        set_id = ObjectId()
+        papers = []
+        for label, questions in zip(VARIANT_LABELS, variant_questions):
+            paper_doc, section_docs, question_docs = insert_paper_bundle(
+                self.paper_record(data, set_id=set_id, variant=label), user_id, data['sections'], questions
+            )
+            papers.append(self.serialize_paper_docs(paper_doc, section_docs, question_docs))
+
+        return Response({"set_id": str(set_id), "papers": papers}, status=status.HTTP_201_CREATED)
+
+    def paper_record(self, data, set_id=None, variant=None):
+        """Map the generation request onto the fields stored on the paper document"""
+        record = {
+            "title": f"{data['subjectName']} Exam Paper" + (f" (Set {variant})" if variant else ""),
+            "subject_name": data['subjectName'],
+            "department": data['department'],
+            "topics": data['topics'],
+            "total_marks": data.get('totalMarks', 0),
+            "duration": data['duration'],
+            "include_formula": data.get('includeFormula', False),
+            "include_diagrams": data.get('includeDiagrams', False),
+            "include_answer_key": data.get('includeAnswerKey', True),
+        }
+        if set_id:
+            record["set_id"] = set_id
+            record["variant"] = variant
+        return record
+
+    def create_draft_paper(self, data, user_id, set_id=None, variant=None):
+        """Insert the draft paper and its sections, returning (paper_id, {section name: section_id})"""
+        paper_id = insert_paper(self.paper_record(data, set_id, variant), user_id)
+        if not paper_id:
+            return None, {}
+
+        section_ids = {}
+        for index, section_data in enumerate(data['sections']):
+            section_id = insert_section(section_data, paper_id, index)
+            section_ids[section_data['name']] = section_id
+        return paper_id, section_ids
+
+    def stream_generated_questions(self, paper_params, paper_id, section_ids):
+        """Yield SSE frames while questions are generated and inserted one by one"""
+        yield format_sse('paper', {
+            'paper_id': str(paper_id),
+            'sections': {name: str(section_id) for name, section_id in section_ids.items()},
+        })
+
+        question_count = 0
+        try:
+            for question_data in self.stream_questions_with_ollama(paper_params):
+                section_name = question_data.get('sectionName')
                 if section_name not in section_ids:
                     continue
 
-                insert_question(question_data, paper_id, section_ids[section_name])
+                try:
+                    question_id = insert_question(question_data, paper_id, section_ids[section_name])
+                except KeyError as e:
+                    print(f"Skipping incomplete streamed question (missing {e})")
+                    continue
 
-            # # 5. Update Paper Status to "published"
-            update_paper_status(paper_id)
+                question_count += 1
+                yield format_sse('question', {
+                    **question_data,
+                    'questionId': str(question_id),
+                    'sectionId': str(section_ids[section_name]),
+                })
 
-            #6. Retrieve the newly created paper data
-            paper = get_paper(paper_id)
-            if not paper:
-                return Response({"error": "Paper not found"}, status=status.HTTP_404_NOT_FOUND)
-            # 7. Return the paper data
-            return Response(self.serialize_paper(paper,paper_id), status=status.HTTP_201_CREATED)
+            update_paper_status(paper_id)
+            yield format_sse('done', {'paper_id': str(paper_id), 'question_count': question_count})
 
         except Exception as e:
             traceback.print_exc()
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            yield format_sse('error', {'paper_id': str(paper_id), 'error': str(e)})
+
     def serialize_paper(self, paper_doc, paper_id):
-        # Get sections for this paper
+        # Get sections (with their questions) for this paper, whichever layout it is stored in
+        sections = get_paper_sections(paper_doc)
 
-        sections = list(self.db["sections"].find({"paper_id": paper_id}).sort([("order", ASCENDING)]))
+        questions = [question for section in sections for question in section["questions"]]
+        return self.serialize_paper_docs(paper_doc, sections, questions)
 
-        
+    def serialize_paper_docs(self, paper_doc, sections, questions):
+        """Serialize a paper from its already-loaded section and question documents"""
         # Prepare section-wise question lists
         section_id_to_questions = {}
-        for section in sections:
-            questions = list(self.db["questions"].find({"section_id": section["_id"]}))
-            section_id_to_questions[str(section["_id"])] = [
-                {
-                    "id": str(q["_id"]),
-                    "text": q["text"],
-                    "question_type": q["question_type"],
-                    "difficulty": q["difficulty"],
-                    "cognitive_level": q["cognitive_level"],
-                    "marks": q["marks"],
-                    "options": q.get("options"),
-                    "answer": q.get("answer", ""),
-                    "is_practical": q["is_practical"],
-                    "topic": q.get("topic", ""),
-                    "tags": q.get("tags", []),
-                    "diagram": q.get("diagram"),
-                    "formula_required": q.get("formula_required", False),
-                }
-                for q in questions
-            ]
+        for q in questions:
+            section_id_to_questions.setdefault(str(q["section_id"]), []).append({
+                "id": str(q["_id"]),
+                "text": q["text"],
+                "question_type": q["question_type"],
+                "difficulty": q["difficulty"],
+                "cognitive_level": q["cognitive_level"],
+                "marks": q["marks"],
+                "options": q.get("options"),
+                "answer": q.get("answer", ""),
+                "is_practical": q["is_practical"],
+                "topic": q.get("topic", ""),
+                "tags": q.get("tags", []),
+                "diagram": q.get("diagram"),
+                "formula_required": q.get("formula_required", False),
+            })
 
         # Serialize sections with nested questions
         serialized_sections = []
-        for section in sections:
+        for section in sorted(sections, key=lambda section: section["order"]):
             serialized_sections.append({
                 "id": str(section["_id"]),
                 "name": section["name"],
@@ -184,6 +409,8 @@ class PaperViewSet(viewsets.ModelViewSet):
             "include_diagrams": paper_doc["include_diagrams"],
             "include_answer_key": paper_doc["include_answer_key"],
             "status": paper_doc["status"],
+            "set_id": str(paper_doc["set_id"]) if paper_doc.get("set_id") else None,
+            "variant": paper_doc.get("variant"),
             "sections": serialized_sections
         }
 
@@ -207,38 +434,20 @@ class PaperViewSet(viewsets.ModelViewSet):
             if not uploaded_file.name.lower().endswith('.pdf'):
                 return Response({'error': 'Only PDF files are supported'}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Define local storage path
-            temp_dir = os.path.join(settings.BASE_DIR, 'media', 'temp_pdfs')
-            os.makedirs(temp_dir, exist_ok=True)
-
-            # Use local file system storage (not S3)
-            local_storage = FileSystemStorage(location=temp_dir)
-            file_name = local_storage.save(uploaded_file.name, ContentFile(uploaded_file.read()))
-            file_path = local_storage.path(file_name)
-
-            try:
-                # Process PDF and extract questions
-                questions = self.extract_questions_from_pdf(
-                    file_path, subject_name, subject_code, exam_type, request.user
-                )
-
-                # Save questions to MongoDB
-                saved_questions = self.save_questions_to_db(questions)
-
-                # Clean up temporary file
-                local_storage.delete(file_name)
+            # Parse straight from the upload: Django keeps small files in memory and spools
+            # larger ones to a temporary file, so nothing is copied to media/ first
+            questions = self.extract_questions_from_pdf(
+                uploaded_file, subject_name, subject_code, exam_type, request.user
+            )
 
-                return Response({
-                    'success': True,
-                    'message': f'Successfully processed {len(saved_questions)} questions',
-                    'questions': saved_questions
-                }, status=status.HTTP_201_CREATED)
+            # Save questions to MongoDB
+            saved_questions = self.save_questions_to_db(questions)
 
-            except Exception as e:
-                # Clean up file if something goes wrong
-                if local_storage.exists(file_name):
-                    local_storage.delete(file_name)
-                raise e
+            return Response({
+                'success': True,
+                'message': f'Successfully processed {len(saved_questions)} questions',
+                'questions': saved_questions
+            }, status=status.HTTP_201_CREATED)
 
         except Exception as e:
             traceback.print_exc()
@@ -279,37 +488,50 @@ class PaperViewSet(viewsets.ModelViewSet):
             else:
                 return Response({'error': 'Question not found or no changes made'}, status=status.HTTP_404_NOT_FOUND)
 
+        except DuplicateKeyError:
+            # hash_1 is unique: the new text is already stored as another question
+            return Response(
+                {'error': 'Another previous-year question already has this text'},
+                status=status.HTTP_409_CONFLICT
+            )
         except Exception as e:
             traceback.print_exc()  # This will show the real error in the console
             return Response({"error": f"Update failed: {str(e)}"}, status=500)
 
-    @action(detail=False, methods=['get'], url_path='questions')
+    @action(detail=False, methods=['get'], url_path='questions',
+            renderer_classes=[JSONRenderer, NDJSONRenderer])
     def get_questions(self, request):
-        """Get questions with optional filtering"""
+        """
+        Get questions with optional filtering, newest first.
+
+        Results are paginated by keyset: pass the returned `next_cursor` as
+        `cursor` to get the next page (`page_size` is capped at PYQ_MAX_PAGE_SIZE).
+        With `?format=ndjson` the matching questions are streamed one per line
+        instead, up to `page_size` if given.
+        """
         try:
-            # Get query parameters for filtering
+            # Resolve a subject search to subject keys first so the question lookup stays indexed
             subject_name = request.query_params.get('subject_name')
-            subject_code = request.query_params.get('subject_code')
-            exam_type = request.query_params.get('exam_type')
-            unit = request.query_params.get('unit')
-            uploaded_by = request.query_params.get('uploaded_by')
-
-            # Build filter query
-            filter_query = {}
-            if subject_name:
-                filter_query['subject_name'] = {'$regex': subject_name, '$options': 'i'}
-            if subject_code:
-                filter_query['subject_code'] = subject_code
-            if exam_type:
-                filter_query['exam_type'] = exam_type
-            if unit:
-                filter_query['unit'] = int(unit)
-            if uploaded_by:
-                filter_query['uploaded_by'] = int(uploaded_by)
-
-            # Get questions from MongoDB
-            questions = list(db["pyq_questions"].find(filter_query).sort('uploaded_at', -1))
-            
+            subjects = search_subjects(subject_name, limit=settings.PYQ_SUBJECT_MATCH_LIMIT) if subject_name else None
+            filter_query, page_size = pyq_question_query(request.query_params, subjects)
+
+            # Stream straight from the Mongo cursor, one JSON document per line
+            if request.accepted_renderer.format == 'ndjson':
+                cursor = db["pyq_questions"].find(filter_query).sort(KEYSET_SORT)
+                if page_size:
+                    cursor = cursor.limit(page_size)
+                return StreamingHttpResponse(
+                    (pyq_question_json(question) for question in cursor),
+                    content_type='application/x-ndjson'
+                )
+
+            # Get one page from MongoDB, plus one document to tell whether more follow
+            page_size = page_size or settings.PYQ_PAGE_SIZE
+            questions = list(db["pyq_questions"].find(filter_query).sort(KEYSET_SORT).limit(page_size + 1))
+            has_more = len(questions) > page_size
+            questions = questions[:page_size]
+            next_cursor = encode_cursor(questions[-1]) if has_more else None
+
             # Convert ObjectId to string for JSON serialization
             for question in questions:
                 question['_id'] = str(question['_id'])
@@ -318,19 +540,53 @@ class PaperViewSet(viewsets.ModelViewSet):
             return Response({
                 'success': True,
                 'questions': questions,
-                'count': len(questions)
+                'count': len(questions),
+                'next_cursor': next_cursor
             })
 
+        except (InvalidCursor, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({'error': f'Failed to fetch questions: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=False, methods=['get'], url_path='subjects/autocomplete')
+    def autocomplete_subjects(self, request):
+        """Suggest subjects by name or code prefix, best match first"""
+        try:
+            query = request.query_params.get('q', '')
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+            subjects = search_subjects(query, limit=limit)
+            return Response({
+                'success': True,
+                'subjects': [
+                    {
+                        'subject_name': subject['subject_name'],
+                        'subject_code': subject['subject_code'],
+                        'question_count': subject['question_count'],
+                    }
+                    for subject in subjects
+                ]
+            })
+
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({'error': f'Autocomplete failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
     @action(detail=True, methods=['delete'], url_path='delete')
     def delete_question(self, request, pk=None):
         """Delete a specific question"""
         try:
-            result = db["pyq_questions"].delete_one({"_id": ObjectId(pk)})
+            deleted = db["pyq_questions"].find_one_and_delete(
+                {"_id": ObjectId(pk)},
+                projection={"subject_name": 1, "subject_code": 1, "subject_key": 1, "subject_code_key": 1}
+            )
             
-            if result.deleted_count > 0:
+            if deleted:
+                try:
+                    record_subject_questions([deleted], delta=-1)
+                except Exception as e:
+                    print(f"Subject index update failed (repair with manage.py backfill_search_keys): {e}")
                 return Response({'success': True, 'message': 'Question deleted successfully'})
             else:
                 return Response({'error': 'Question not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -381,38 +637,75 @@ class PaperViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'error': f'Failed to fetch history: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    def extract_questions_from_pdf(self, file_path, subject_name, subject_code, exam_type, user):
-        """Extract questions from PDF using the provided logic"""
+    def extract_questions_from_pdf(self, uploaded_file, subject_name, subject_code, exam_type, user):
+        """
+        Extract questions from an uploaded PDF using the provided logic.
+
+        The document is read page by page: metadata comes from the cover pages,
+        and only the question currently being read is kept as text, so memory
+        does not grow with the length of the paper.
+        """
+        header_pages = []
+        header_done = False
+        parsed = []   # (main question, OR section index, sub-question letter, text, marks)
+        pending = ''  # whitespace-collapsed text from the last main question marker on
+
+        doc = open_uploaded_pdf(uploaded_file)
+        try:
+            for page in doc:
+                page_text = page.get_text()
+                if not header_done:
+                    header_pages.append(page_text)
+                    header_done = len(header_pages) >= PDF_HEADER_PAGES
+
+                if INSTRUCTIONS_MARKER in page_text:
+                    # Questions start after the last set of instructions
+                    page_text = page_text.split(INSTRUCTIONS_MARKER)[-1]
+                    parsed, pending = [], ''
+                    header_done = True
+
+                # Split by main questions (Q1), Q2), etc.); each one is complete once the next has started
+                pending = re.sub(r'\s+', ' ', pending + '\n' + page_text)
+                parts = MAIN_QUESTION_PATTERN.split(pending)
+                if len(parts) > 3:
+                    parsed += self.parse_main_questions(parts[1:-2])
+                    pending = parts[-2] + parts[-1]
+        finally:
+            doc.close()
+
+        parsed += self.parse_main_questions(MAIN_QUESTION_PATTERN.split(pending.strip())[1:])
+        return self.question_docs(
+            parsed, "\n".join(header_pages), subject_name, subject_code, exam_type, user,
+            os.path.basename(uploaded_file.name)
+        )
+
+    def question_docs(self, parsed, header_text, subject_name, subject_code, exam_type, user, filename):
+        """pyq_questions documents for parse_main_questions output, with metadata read from the header text"""
         from datetime import datetime
-        
-        # Load PDF
-        doc = fitz.open(file_path)
-        full_text = "\n".join([page.get_text() for page in doc])
-        doc.close()
 
         # Extract Metadata
-        
+
         # 1. Academic Year (e.g., SE/TE/BE)
-        year_match = re.search(r'(S\.E\.|T\.E\.|B\.E\.)', full_text, re.IGNORECASE)
+        year_match = re.search(r'(S\.E\.|T\.E\.|B\.E\.)', header_text, re.IGNORECASE)
         academic_year = year_match.group(1).upper().replace('.', '') if year_match else None
 
         # 2. Department
         dept_match = None
         if year_match:
-            text_after_year = full_text.split(year_match.group(1), 1)[1] if len(full_text.split(year_match.group(1))) > 1 else ""
+            text_after_year = header_text.split(year_match.group(1), 1)[1] if len(header_text.split(year_match.group(1))) > 1 else ""
             dept_match = re.search(r'\((.*?)\)', text_after_year)
         department = dept_match.group(1).strip().title() if dept_match else None
 
         # 3. Subject Code
-        subject_code_match = re.search(r'\((\d{6}[A-Z]?)\)', full_text)
+        subject_code_match = re.search(r'\((\d{6}[A-Z]?)\)', header_text)
         extracted_subject_code = subject_code_match.group(1).strip().replace(" ", "") if subject_code_match else subject_code
 
         # 4. Subject Name (first ALL CAPS line after department)
-        subject_name_match = re.search(r'\n([A-Z][A-Z\s&\-]+)\n', full_text)
+        subject_name_match = re.search(r'\n([A-Z][A-Z\s&\-]+)\n', header_text)
         extracted_subject_name = subject_name_match.group(1).strip().title() if subject_name_match else subject_name
 
         # 5. Full Paper Number (e.g., [6353] - 125)
-        papernum_match = re.search(r'\[\d+\]\s*-\s*\d+', full_text)
+        papernum_match = re.search(r'\[\d+\]\s*-\s*\d+', header_text)
         papernumber = papernum_match.group(0) if papernum_match else None
         if papernumber:
             papernumber = re.sub(r'[\[\]]', '', papernumber).strip()
@@ -425,21 +718,45 @@ class PaperViewSet(viewsets.ModelViewSet):
             "Q7": 6, "Q8": 6
         }
 
-        # Extract Questions
-        question_section = full_text
-        if "Instructions to the candidates:" in full_text:
-            question_section = full_text.split("Instructions to the candidates:")[-1]
-
-        # Clean up the text by removing extra whitespace and normalizing
-        question_section = re.sub(r'\s+', ' ', question_section).strip()
-
-        # Split by main questions (Q1), Q2), etc.)
-        main_questions = re.split(r'(Q\d+\))', question_section)[1:]  # Remove empty first element
-
         # Clean and Structure Data
         question_list = []
         current_time = datetime.now()
+        search_fields = subject_search_fields(extracted_subject_name, extracted_subject_code)
+
+        for q_main_clean, section_idx, sub_letter, clean_text, marks in parsed:
+            # Create full question identifier
+            full_question_id = f"{q_main_clean}{sub_letter}"
+            if section_idx > 0:  # If this is from an OR section
+                full_question_id += f" (Alternative)"
+
+            question_list.append({
+                "academic_year": academic_year,
+                "department": department,
+                "subject_name": extracted_subject_name,
+                "subject_code": extracted_subject_code,
+                **search_fields,
+                "papernumber": papernumber,
+                "exam_type": exam_type,
+                "question_id": full_question_id,
+                "main_question": q_main_clean,
+                "sub_question": sub_letter.replace(")", ""),
+                "is_alternative": section_idx > 0,
+                "question_text": clean_text,
+                "unit": unit_map.get(q_main_clean, None),
+                "marks": marks,
+                "hash": hashlib.md5(clean_text.encode()).hexdigest(),
+                "uploaded_by": str(user._id),
+                "uploaded_at": current_time,
+                "updated_at": current_time,
+                "filename": filename,
+                "isEditing": False  # For frontend editing functionality
+            })
 
+        return question_list
+
+    def parse_main_questions(self, main_questions):
+        """Sub-questions of alternating (marker, content) parts such as ["Q1)", "a) ... [6] OR a) ..."]"""
+        parsed = []
         # Process pairs of (question_number, question_content)
         for i in range(0, len(main_questions), 2):
             if i + 1 < len(main_questions):
@@ -481,56 +798,68 @@ class PaperViewSet(viewsets.ModelViewSet):
                             clean_text = clean_text.rstrip('.')
                             
                             if clean_text:  # Only add non-empty questions
-                                # Create full question identifier
-                                full_question_id = f"{q_main_clean}{sub_letter}"
-                                if section_idx > 0:  # If this is from an OR section
-                                    full_question_id += f" (Alternative)"
-                                
-                                question_list.append({
-                                    "academic_year": academic_year,
-                                    "department": department,
-                                    "subject_name": extracted_subject_name,
-                                    "subject_code": extracted_subject_code,
-                                    "papernumber": papernumber,
-                                    "exam_type": exam_type,
-                                    "question_id": full_question_id,
-                                    "main_question": q_main_clean,
-                                    "sub_question": sub_letter.replace(")", ""),
-                                    "is_alternative": section_idx > 0,
-                                    "question_text": clean_text,
-                                    "unit": unit_map.get(q_main_clean, None),
-                                    "marks": marks,
-                                    "hash": hashlib.md5(clean_text.encode()).hexdigest(),
-                                    "uploaded_by": str(user._id),
-                                    "uploaded_at": current_time,
-                                    "updated_at": current_time,
-                                    "filename": file_path.split('/')[-1],
-                                    "isEditing": False  # For frontend editing functionality
-                                })
-
-        return question_list
+                                parsed.append((q_main_clean, section_idx, sub_letter, clean_text, marks))
+        return parsed
 
     def save_questions_to_db(self, questions):
-        """Save questions to MongoDB and return saved questions with IDs"""
+        """
+        Save questions to MongoDB and return saved questions with IDs, in input order.
+
+        One `$in` lookup finds the hashes already stored and one unordered
+        insert_many writes the rest. The unique hash index turns a concurrent
+        upload of the same question into a duplicate-key error, which is mapped
+        back to the copy that won, so every question is stored exactly once.
+        """
+        collection = db["pyq_questions"]
+        ensure_collection_indexes("pyq_questions")
+
+        hashes = list(dict.fromkeys(question["hash"] for question in questions))
+        existing = {doc["hash"]: doc for doc in collection.find({"hash": {"$in": hashes}})}
+
+        # First occurrence of every new hash; later repeats in the same upload resolve to it
+        new_questions = {}
+        for question in questions:
+            if question["hash"] not in existing:
+                new_questions.setdefault(question["hash"], question)
+        to_insert = list(new_questions.values())
+
+        raced_hashes = []
+        if to_insert:
+            try:
+                collection.insert_many(to_insert, ordered=False)
+            except BulkWriteError as e:
+                write_errors = e.details.get("writeErrors", [])
+                if any(error.get("code") != 11000 for error in write_errors):
+                    raise
+                raced_hashes = [to_insert[error["index"]]["hash"] for error in write_errors]
+
+        if raced_hashes:
+            # Inserted by another upload between our lookup and our insert
+            for doc in collection.find({"hash": {"$in": raced_hashes}}):
+                existing[doc["hash"]] = doc
+            for question_hash in raced_hashes:
+                new_questions.pop(question_hash, None)
+
         saved_questions = []
-        
+        inserted_questions = []
         for question in questions:
-            # Check if the question already exists
-            existing_question = db["pyq_questions"].find_one({"hash": question["hash"]})
-            
-            if not existing_question:
-                # Insert the new question
-                result = db["pyq_questions"].insert_one(question)
-                question["_id"] = str(result.inserted_id)
+            if new_questions.get(question["hash"]) is question:
+                question["_id"] = str(question["_id"])
                 saved_questions.append(question)
+                inserted_questions.append(question)
                 print(f"Inserted: {question['question_text']}")
             else:
-                # Return existing question with string ID
-                existing_question["_id"] = str(existing_question["_id"])
-                existing_question["isEditing"] = False
+                # Return the stored question with string ID
+                existing_question = existing.get(question["hash"]) or new_questions.get(question["hash"], question)
+                existing_question = dict(existing_question, _id=str(existing_question["_id"]), isEditing=False)
                 saved_questions.append(existing_question)
                 print(f"Already exists: {existing_question['question_text']}")
-        
+
+        # Keep the subject search index in step with the bank; the questions are saved either way
+        try:
+            record_subject_questions(inserted_questions)
+        except Exception as e:
+            print(f"Subject index update failed (repair with manage.py backfill_search_keys): {e}")
         return saved_questions
     
     def get_dummy_paper_params(self):
@@ -587,46 +916,185 @@ class PaperViewSet(viewsets.ModelViewSet):
             }
         }
     
-    def generate_questions_with_ollama(self, paper_params):
-        """Generate questions using Ollama API"""
-        # Skip actual API call and directly use mock questions
-        # return self.generate_mock_questions(paper_params)
-        
-        # The code below is kept for reference but not used
-    
-        # Prepare a detailed prompt for Ollama
-        prompt = self.prepare_ollama_prompt(paper_params)
-        
-        # Call Ollama API
+    def generate_questions_with_ollama(self, paper_params, on_section_done=None, timer=None):
+        """Generate questions using Ollama API, with one concurrent request per section"""
+        sections = paper_params['sections']
+        if not sections:
+            return []
+        timer = timer or StageTimer()
+
+        # Each section gets its own prompt so a slow or malformed answer only affects that section
+        max_workers = min(len(sections), settings.OLLAMA_MAX_PARALLEL_SECTIONS)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self.generate_section_questions, paper_params, section, timer)
+                for section in sections
+            ]
+            if on_section_done:
+                for sections_done, _ in enumerate(as_completed(futures), start=1):
+                    on_section_done(sections_done, len(sections))
+            # Collect in submission order so the paper keeps its section order
+            section_results = [future.result() for future in futures]
+        return self.number_questions(paper_params, section_results)
+
+    def number_questions(self, paper_params, section_results):
+        """Flatten per-section results in section order, numbering the questions from 1"""
+        questions = []
+        for section_questions in section_results:
+            for question in section_questions:
+                question['id'] = len(questions) + 1
+                question['subjectName'] = paper_params['subjectName']
+                questions.append(question)
+        return questions
+
+    def generate_section_questions(self, paper_params, section, timer=None):
+        """Generate the questions of a single section, falling back to mock questions for that section only"""
+        client = get_ollama_client()
+        return run_steps(self.section_generation_steps(paper_params, section, client.model, timer), client)
+
+    def section_generation_steps(self, paper_params, section, model, timer=None):
+        """
+        Step generator behind generate_section_questions (see papers/steps.py):
+        LLM calls and blocking lookups are yielded to the driver, so the sync
+        and async endpoints share this logic.
+        """
+        timer = timer or StageTimer()
+        # Serve what we can from the question bank and only ask the LLM for the rest
+        banked_questions = []
+        if settings.QUESTION_BANK_ENABLED and paper_params.get('useQuestionBank', True):
+            try:
+                with timer.stage('bank'):
+                    banked_questions = yield lambda: retrieve_bank_questions(
+                        paper_params, section,
+                        include_pyq=paper_params.get('includePyq', settings.QUESTION_BANK_INCLUDE_PYQ)
+                    )
+            except Exception as e:
+                print(f"Question bank lookup failed for section '{section['name']}': {e}")
+
+        deficit = section['numQuestions'] - len(banked_questions)
+        if deficit <= 0:
+            return banked_questions
+
+        section_params = dict(paper_params, sections=[dict(section, numQuestions=deficit)])
+        seen_texts = {normalize_text(question['text']) for question in banked_questions}
+
+        # The bundled T5 model can generate in-process instead of calling Ollama.
+        # It only produces question text, so MCQ sections (which need options) stay on Ollama.
+        backend = paper_params.get('backend', settings.QUESTION_GENERATION_BACKEND)
+        if backend in ('t5', 't5-onnx') and section['questionType'] != 'mcq':
+            generator = get_onnx_t5_generator() if backend == 't5-onnx' else get_t5_generator()
+            questions = []
+            try:
+                with timer.stage('t5'):
+                    generated = yield lambda: generator.generate_section_questions(
+                        section_params, section_params['sections'][0], seed=paper_params.get('seed')
+                    )
+                # T5 drops empty outputs and can repeat itself or a banked question
+                questions = validate_questions(generated, section, paper_params, seen_texts, deficit)
+            except Exception as e:
+                print(f"Error generating section '{section['name']}' with T5: {e}")
+            return banked_questions + self.top_up_with_mocks(paper_params, section, questions, deficit, timer)
+
+        needed = deficit
+        questions = []
         try:
-            # Adjust the URL and model based on your Ollama setup
-            response = requests.post(
-                'http://localhost:11434/api/generate',
-                json={
-                    'model': 'mistral', # or whatever model you're using
-                    'prompt': prompt,
-                    'stream': False
-                }
-            )
-            
-            if response.status_code == 200:
-                # Parse the response to extract questions
-                result = response.json()
-                generated_content = result.get('response', '')
-                
-                # Process the generated content to extract questions
-                questions = self.parse_ollama_response(generated_content, paper_params)  
+            # Prepare a detailed prompt for Ollama
+            with timer.stage('prompt'):
+                prompt = self.prepare_ollama_prompt(section_params)
+
+            # Identical prompts (same subject, topics and section layout) reuse the earlier answer
+            use_cache = settings.LLM_CACHE_ENABLED and paper_params.get('useCache', True)
+            cache = get_response_cache() if use_cache else None
+            with timer.stage('cache'):
+                generated_content = (yield lambda: cache.get(prompt, model)) if cache else None
+
+            if generated_content is None:
+                # Call Ollama API and parse the response to extract questions
+                with timer.stage('llm'):
+                    generated_content = yield LLMCall(prompt)
+                with timer.stage('parse'):
+                    questions = validate_questions(
+                        salvage_questions(generated_content), section, paper_params, seen_texts, needed
+                    )
+                # Only complete answers are worth keeping
+                if len(questions) == needed and cache:
+                    yield lambda: cache.set(prompt, model, generated_content)
             else:
-                # Fallback to mock questions if Ollama fails
-                questions = self.generate_mock_questions(paper_params)
-                
+                with timer.stage('parse'):
+                    questions = validate_questions(
+                        salvage_questions(generated_content), section, paper_params, seen_texts, needed
+                    )
+
+            # Re-prompt only for the slots that are still missing or were invalid
+            for _ in range(settings.LLM_REPAIR_ROUNDS):
+                missing = needed - len(questions)
+                if missing <= 0:
+                    break
+                repair_prompt = self.prepare_repair_prompt(section_params, missing, banked_questions + questions)
+                with timer.stage('llm'):
+                    repair_content = yield LLMCall(repair_prompt)
+                with timer.stage('parse'):
+                    questions += validate_questions(
+                        salvage_questions(repair_content), section, paper_params, seen_texts, missing
+                    )
+
         except Exception as e:
-            print(f"Error calling Ollama API: {e}")
-            # Fallback to mock questions
-            questions = self.generate_mock_questions(paper_params)
-            
-        return questions
-    
+            print(f"Error calling Ollama API for section '{section['name']}': {e}")
+
+        questions = self.top_up_with_mocks(paper_params, section, questions, needed, timer)
+
+        # The model does not always echo the section name back exactly
+        for question in questions:
+            question['sectionName'] = section['name']
+            question.setdefault('source', 'llm')
+        return banked_questions + questions
+
+    def top_up_with_mocks(self, paper_params, section, questions, needed, timer):
+        """`questions` plus mock questions for the slots the generator couldn't fill"""
+        missing = needed - len(questions)
+        if missing <= 0:
+            return questions
+        print(f"Filling {missing} slot(s) of section '{section['name']}' with mock questions")
+        with timer.stage('mock'):
+            return questions + self.generate_mock_questions(
+                dict(paper_params, sections=[dict(section, numQuestions=missing)])
+            )
+
+    def stream_questions_with_ollama(self, paper_params):
+        """Yield questions one at a time as Ollama streams the JSON array back"""
+        prompt = self.prepare_ollama_prompt(paper_params)
+        parser = JSONArrayStreamParser()
+        sections = {section['name']: section for section in paper_params['sections']}
+        counts = {name: 0 for name in sections}
+        seen_texts = set()
+
+        try:
+            for text in get_ollama_client().stream_generate(prompt):
+                for question in parser.feed(text):
+                    section = sections.get(question.get('sectionName'))
+                    if not section or counts[section['name']] >= section['numQuestions']:
+                        continue
+                    question = validate_question(question, section, paper_params, seen_texts)
+                    if not question:
+                        continue
+                    counts[section['name']] += 1
+                    question['source'] = 'llm'
+                    question['subjectName'] = paper_params['subjectName']
+                    yield question
+                if parser.finished:
+                    break
+
+        except Exception as e:
+            print(f"Error streaming from Ollama API: {e}")
+
+        # Stream mock questions for whatever the model left unfilled
+        for name, section in sections.items():
+            missing = section['numQuestions'] - counts[name]
+            if missing > 0:
+                yield from self.generate_mock_questions(
+                    dict(paper_params, sections=[dict(section, numQuestions=missing)])
+                )
+
     def prepare_ollama_prompt(self, paper_params):
         """Prepare a detailed prompt for Ollama to generate appropriate questions"""
         prompt = f"""
@@ -665,6 +1133,7 @@ class PaperViewSet(viewsets.ModelViewSet):
             "difficulty": "easy/medium/hard",
             "cognitiveLevel": "remember/understand/apply/analyze",
             "marks": number,
+            "topic": "one of the topics listed above",
             "options": ["A", "B", "C", "D"] (only for MCQs),
             "answer": "correct answer",
             "isPractical": boolean
@@ -675,255 +1144,149 @@ class PaperViewSet(viewsets.ModelViewSet):
         
         return prompt
     
-    def parse_ollama_response(self, generated_content, paper_params):
-        """Parse the response from Ollama to extract questions"""
-        # This implementation will depend on how your Ollama model formats its response
-        try:
-            # Try to extract JSON array from the response
-            # The response might be the raw JSON or might contain other text
-            start_idx = generated_content.find('[')
-            end_idx = generated_content.rfind(']') + 1
-            
-            if start_idx >= 0 and end_idx > start_idx:
-                json_content = generated_content[start_idx:end_idx]
-                questions = json.loads(json_content)
-                return questions
-            else:
-                # Fallback to mock questions if parsing fails
-                return self.generate_mock_questions(paper_params)
-                
-        except Exception as e:
-            print(f"Error parsing Ollama response: {e}")
-            # Fallback to mock questions
-            return self.generate_mock_questions(paper_params)
-    
+    def prepare_repair_prompt(self, section_params, missing, existing_questions):
+        """Ask for just the missing questions of a section, without repeating the ones we have"""
+        section = section_params['sections'][0]
+        prompt = self.prepare_ollama_prompt(dict(section_params, sections=[dict(section, numQuestions=missing)]))
+        if existing_questions:
+            prompt += "\n        Do not repeat any of these questions:\n"
+            for question in existing_questions:
+                prompt += f"        - {question['text']}\n"
+        return prompt
+
     def generate_mock_questions(self, paper_params):
         """Generate mock questions as a fallback"""
-        questions = []
-        question_id = 1
-        
-        # Sample question templates for each topic and question type
-        topic_templates = {
-            'SQL': {
-                'mcq': [
-                    "Which SQL statement is used to retrieve data from a database?",
-                    "What is the purpose of the GROUP BY clause in SQL?",
-                    "Which of the following is NOT a valid SQL join type?"
-                ],
-                'descriptive': [
-                    "Explain the difference between INNER JOIN and OUTER JOIN in SQL.",
-                    "Describe how subqueries work in SQL and provide an example."
-                ],
-                'programming': [
-                    "Write a SQL query to retrieve the name and department of all employees who earn more than the average salary.",
-                    "Write a SQL query that uses GROUP BY and HAVING to find departments with more than 10 employees."
-                ],
-                'numerical': [
-                    "If a database table has 1000 rows and a query returns 200 rows, what is the selectivity ratio of the query?"
-                ]
-            },
-            'Normalization': {
-                'mcq': [
-                    "Which normal form eliminates transitive dependencies?",
-                    "What is the highest normal form that a relation can satisfy?"
-                ],
-                'descriptive': [
-                    "Explain the concept of functional dependency in database normalization.",
-                    "Compare and contrast 3NF and BCNF with examples."
-                ],
-                'numerical': [
-                    "A table has 5 attributes and 3 candidate keys. Calculate the maximum number of functional dependencies possible."
-                ]
-            },
-            'Transaction Management': {
-                'mcq': [
-                    "Which property of ACID ensures that a transaction brings the database from one valid state to another?",
-                    "What concurrency control protocol uses timestamps to order transactions?"
-                ],
-                'descriptive': [
-                    "Explain the difference between optimistic and pessimistic concurrency control.",
-                    "Describe the two-phase commit protocol and its importance in distributed transactions."
-                ],
-                'numerical': [
-                    "Calculate the wait-for graph for the following transaction schedule: T1→T2, T2→T3, T3→T4, T4→T1."
-                ]
-            },
-            'Indexing': {
-                'mcq': [
-                    "Which data structure is commonly used for implementing indexes in databases?",
-                    "What type of index would be most efficient for range queries?"
-                ],
-                'descriptive': [
-                    "Compare B-tree and hash-based indexing techniques.",
-                    "Explain the concept of index clustering and when it should be used."
-                ],
-                'numerical': [
-                    "Calculate the height of a B+ tree with 1000 records, if each node can store up to 100 keys."
-                ]
-            },
-            'ER Modeling': {
-                'mcq': [
-                    "In ER modeling, what does a diamond shape represent?",
-                    "Which relationship type has a maximum cardinality of one on both sides?"
-                ],
-                'descriptive': [
-                    "Explain how to convert a many-to-many relationship to relational schema.",
-                    "Describe the differences between strong and weak entities with examples."
-                ],
-                'programming': [
-                    "Design an ER diagram for a library management system with entities for books, authors, and borrowers."
-                ]
-            }
-        }
-        
-        # MCQ options templates
-        mcq_options = {
-            'SQL': [
-                ["SELECT", "RETRIEVE", "GET", "FETCH"],
-                ["To group rows with similar values", "To filter rows after aggregation", "To sort the result set", "To join tables"],
-                ["INNER JOIN", "NATURAL JOIN", "OUTER JOIN", "BETWEEN JOIN"]
-            ],
-            'Normalization': [
-                ["First Normal Form (1NF)", "Second Normal Form (2NF)", "Third Normal Form (3NF)", "Boyce-Codd Normal Form (BCNF)"],
-                ["3NF", "BCNF", "4NF", "5NF"]
-            ],
-            'Transaction Management': [
-                ["Atomicity", "Consistency", "Isolation", "Durability"],
-                ["Two-Phase Locking", "Timestamp Ordering", "Multi-Version Concurrency Control", "Optimistic Concurrency Control"]
-            ],
-            'Indexing': [
-                ["Linked List", "Array", "B-Tree", "Hash Table"],
-                ["Hash Index", "B-Tree Index", "Bitmap Index", "Dense Index"]
-            ],
-            'ER Modeling': [
-                ["Entity", "Attribute", "Relationship", "Cardinality"],
-                ["One-to-one", "One-to-many", "Many-to-one", "Many-to-many"]
-            ]
-        }
-        
-        # Sample answers for MCQs
-        mcq_answers = {
-            'SQL': ["A", "A", "D"],
-            'Normalization': ["C", "D"],
-            'Transaction Management': ["B", "B"],
-            'Indexing': ["C", "B"],
-            'ER Modeling': ["C", "A"]
-        }
-        
-        # Generate questions for each section
-        for section in paper_params['sections']:
-            section_name = section['name']
-            question_type = section['questionType']
-            num_questions = section['numQuestions']
-            marks_per_question = section['marksPerQuestion']
-            
-            # Track which templates have been used to avoid duplicates
-            used_templates = set()
-            
-            for i in range(num_questions):
-                # Determine difficulty based on distribution
-                difficulty = self.get_random_weighted_category(paper_params['difficultyDistribution'])
-                
-                # Determine cognitive level based on distribution
-                cognitive_level = self.get_random_weighted_category(paper_params['cognitiveDistribution'])
-                
-                # Determine if question is practical or theoretical
-                is_practical = random.random() * 100 < paper_params['practicalTheoretical']['practical']
-                
-                # Select a random topic that has templates for this question type
-                available_topics = [topic for topic in paper_params['topics'] 
-                                   if topic in topic_templates and question_type in topic_templates[topic]]
-                if not available_topics:
-                    # Fallback to any topic if no templates are available
-                    topic = random.choice(paper_params['topics'])
-                    question_text = f"{'Practical' if is_practical else 'Theoretical'} {question_type} question on {topic} ({difficulty} difficulty)"
-                else:
-                    topic = random.choice(available_topics)
-                    
-                    # Get templates for this topic and question type
-                    templates = topic_templates[topic][question_type]
-                    
-                    # Get a template that hasn't been used yet
-                    available_templates = [idx for idx, _ in enumerate(templates) if (topic, question_type, idx) not in used_templates]
-                    if available_templates:
-                        template_idx = random.choice(available_templates)
-                        used_templates.add((topic, question_type, template_idx))
-                        question_text = templates[template_idx]
-                    else:
-                        # All templates used, create a generic one
-                        question_text = f"{'Practical' if is_practical else 'Theoretical'} {question_type} question on {topic} ({difficulty} difficulty)"
-                
-                # Create question object
-                question = {
-                    'id': question_id,
-                    'sectionName': section_name,
-                    'text': question_text,
-                    'questionType': question_type,
-                    'difficulty': difficulty,
-                    'cognitiveLevel': cognitive_level,
-                    'marks': marks_per_question,
-                    'isPractical': is_practical,
-                    'answer': 'Sample answer for this question'
-                }
-                
-                # Add options for MCQs
-                if question_type == 'mcq':
-                    if topic in mcq_options and len(mcq_options[topic]) > 0:
-                        options_idx = random.randint(0, len(mcq_options[topic])-1)
-                        question['options'] = mcq_options[topic][options_idx]
-                        
-                        # Get corresponding answer if available
-                        if topic in mcq_answers and options_idx < len(mcq_answers[topic]):
-                            question['answer'] = mcq_answers[topic][options_idx]
-                        else:
-                            question['answer'] = random.choice(['A', 'B', 'C', 'D'])
-                    else:
-                        question['options'] = [f"Option A for {topic}", f"Option B for {topic}", 
-                                              f"Option C for {topic}", f"Option D for {topic}"]
-                        question['answer'] = random.choice(['A', 'B', 'C', 'D'])
-                
-                questions.append(question)
-                question_id += 1
-        
-        return questions
-    
-    def get_random_weighted_category(self, distribution):
-        """Get a random category based on weighted distribution"""
-        rand = random.random() * 100
-        cumulative_weight = 0
-        
-        for category, weight in distribution.items():
-            cumulative_weight += weight
-            if rand <= cumulative_weight:
-                return category
-        
-        # Default fallback
-        return list(distribution.keys())[0]
+        # Pass "seed" in the paper parameters to get a reproducible paper
+        return generate_mock_questions(paper_params, seed=paper_params.get('seed'))
     
     
+class InvalidGenerationParam(ValueError):
+    pass
+
+
+def positive_int_param(value, name, default=1):
+    """`value` as a positive integer, `default` when it is missing; raises InvalidGenerationParam otherwise"""
+    if value in (None, ''):
+        return default
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise InvalidGenerationParam(f"{name} must be a positive integer")
+    if number < 1:
+        raise InvalidGenerationParam(f"{name} must be a positive integer")
+    return number
+
+
+# Fields a generation request must carry, for the paper and for each of its sections
+REQUIRED_PAPER_FIELDS = ('subjectName', 'department', 'topics', 'duration', 'sections')
+REQUIRED_SECTION_FIELDS = ('name', 'questionType', 'numQuestions', 'marksPerQuestion')
+
+
+def require_generation_fields(data):
+    """Raise InvalidGenerationParam naming the fields a generation request lacks; makes numQuestions ints"""
+    missing = [field for field in REQUIRED_PAPER_FIELDS if field not in data]
+    if missing:
+        raise InvalidGenerationParam(f"Missing required field(s): {', '.join(missing)}")
+    if not isinstance(data['sections'], list) or not data['sections']:
+        raise InvalidGenerationParam("sections must be a non-empty list")
+    for index, section in enumerate(data['sections']):
+        missing = [field for field in REQUIRED_SECTION_FIELDS if not isinstance(section, dict) or field not in section]
+        if missing:
+            raise InvalidGenerationParam(f"Section {index + 1} is missing required field(s): {', '.join(missing)}")
+        section['numQuestions'] = positive_int_param(section['numQuestions'], f"sections[{index}].numQuestions")
+
+
+# Question papers list their questions after the candidate instructions, as Q1), Q2), ...
+INSTRUCTIONS_MARKER = "Instructions to the candidates:"
+MAIN_QUESTION_PATTERN = re.compile(r'(Q\d+\))')
+# Paper metadata (year, department, code, name, paper number) is read from at most this many cover pages
+PDF_HEADER_PAGES = 2
+
+
+def open_uploaded_pdf(uploaded_file):
+    """Open an uploaded PDF with PyMuPDF without writing another copy of it"""
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        # Large upload, already spooled to disk by Django
+        return fitz.open(uploaded_file.temporary_file_path())
+    uploaded_file.seek(0)
+    source = uploaded_file.file
+    # In-memory upload: BytesIO.getvalue() shares its buffer rather than copying it
+    # (getbuffer() would force a copy when the BytesIO wraps existing bytes)
+    stream = source.getvalue() if hasattr(source, 'getvalue') else uploaded_file.read()
+    return fitz.open(stream=stream, filetype='pdf')
+
+
+def pyq_question_query(query_params, subjects=None):
+    """(filter, page size or None) for a PYQ listing request; `subjects` are the matches of its subject_name"""
+    subject_code = query_params.get('subject_code')
+    exam_type = query_params.get('exam_type')
+    unit = query_params.get('unit')
+    uploaded_by = query_params.get('uploaded_by')
+    cursor_token = query_params.get('cursor')
+    page_size = query_params.get('page_size')
+
+    # Build filter query
+    filter_query = {}
+    if subjects is not None:
+        filter_query['subject_key'] = {'$in': [subject['subject_key'] for subject in subjects]}
+    if subject_code:
+        filter_query['subject_code'] = subject_code
+    if exam_type:
+        filter_query['exam_type'] = exam_type
+    if unit:
+        filter_query['unit'] = int(unit)
+    if uploaded_by:
+        filter_query['uploaded_by'] = int(uploaded_by)
+    if cursor_token:
+        filter_query = {'$and': [filter_query, keyset_filter(cursor_token)]}
+
+    if page_size:
+        page_size = min(max(int(page_size), 1), settings.PYQ_MAX_PAGE_SIZE)
+    return filter_query, page_size
+
+
+def pyq_question_json(question):
+    """One PYQ question as a line of the NDJSON listing"""
+    return json.dumps(dict(question, _id=str(question['_id']), isEditing=False), cls=JSONEncoder) + '\n'
+
+
+def get_serialized_paper(paper_id):
+    """The serialized paper (None if it does not exist), from the paper cache when it is there"""
+    def load():
+        paper = get_paper(paper_id)
+        return PaperViewSet().serialize_paper(paper, paper["_id"]) if paper else None
+    return get_paper_cache().get_or_load(paper_id, load)
+
+
+def render_paper_pdf(paper):
+    """Render a serialized paper to a PDF buffer, or None if rendering failed"""
+    html = render_to_string("./papers/pdf_template.html", {
+        "paper": paper,
+        "sections": paper["sections"]
+    })
+
+    buffer = BytesIO()
+    pisa_status = pisa.CreatePDF(html, dest=buffer)
+    if pisa_status.err:
+        return None
+    buffer.seek(0)
+    return buffer
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def download_paper_pdf(request, paper_id):
     try:
-        paper = db["papers"].find_one({"_id": ObjectId(paper_id)})
-        if not paper:
+        # The serialized paper carries every field the template reads
+        paper = get_serialized_paper(paper_id)
+        # Other users' papers are reported as missing, as in retrieve()
+        if not paper or paper["user_id"] != str(request.user._id):
             return Response({"error": "Paper not found"}, status=404)
 
-        sections = list(db["sections"].find({"paper_id": ObjectId(paper_id)}).sort("order", 1))
-        for section in sections:
-            section["questions"] = list(db["questions"].find({"section_id": section["_id"]}))
-
-        html = render_to_string("./papers/pdf_template.html", {
-            "paper": paper,
-            "sections": sections
-        })
-
-        buffer = BytesIO()
-        pisa_status = pisa.CreatePDF(html, dest=buffer)
-        if pisa_status.err:
+        buffer = render_paper_pdf(paper)
+        if buffer is None:
             return Response({"error": "PDF generation failed"}, status=500)
 
-        buffer.seek(0)
         return HttpResponse(buffer, content_type='application/pdf', headers={
             'Content-Disposition': f'attachment; filename="{paper["title"]}.pdf"'
         })
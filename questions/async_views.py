@@ -0,0 +1,41 @@
+# questions/async_views.py
+import traceback
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from authentication.authentication import async_authenticated
+from utils.db_utils import is_embedded
+from utils.mongo_client import get_async_db
+from .views import overlap_report
+
+
+@async_authenticated
+async def check_pyq_overlap(request):
+    """Async counterpart of views.check_pyq_overlap, reading through motor"""
+    try:
+        db = get_async_db()
+        latest_paper = await db["papers"].find_one(
+            {"user_id": str(request.user._id)},
+            sort=[("created_at", -1)]
+        )
+        if not latest_paper:
+            return JsonResponse({"detail": "No generated paper found for this user."}, status=404)
+
+        if is_embedded(latest_paper):
+            generated_list = [
+                {"text": question.get("text")}
+                for section in latest_paper.get("sections", [])
+                for question in section.get("questions", [])
+            ]
+        else:
+            generated_list = await db["questions"].find(
+                {"paper_id": latest_paper["_id"]}, {"text": 1, "_id": 0}
+            ).to_list(None)
+
+        pyq_list = await db["pyq_questions"].find({}, {"question_text": 1, "_id": 0}).to_list(None)
+        # Normalizing the whole bank is CPU work; keep it off the event loop
+        report = await sync_to_async(overlap_report, thread_sensitive=False)(generated_list, pyq_list)
+        return JsonResponse(report, status=200)
+
+    except Exception as e:
+        traceback.print_exc()
+        return JsonResponse({"error": str(e)}, status=500)
@@ -0,0 +1,4 @@
+# questions/indexes.py
+INDEXES = [
+    {"collection": "question_banks", "keys": [("subject_name", 1)], "name": "subject_name_1"},
+]
@@ -1,5 +1,6 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 from .views import update_questions, check_pyq_overlap  
 
 
@@ -8,3 +9,9 @@ urlpatterns = [
     path('update/', views.update_questions, name='update_questions'),
     path("check-pyq-overlap/", views.check_pyq_overlap,name='check_pyq_overlap'), 
 ]
+
+if settings.ASYNC_VIEWS_ENABLED:
+    urlpatterns.append(
+        path("async/check-pyq-overlap/", async_views.check_pyq_overlap, name='async_check_pyq_overlap')
+    )
+
@@ -2,10 +2,9 @@ import re
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from bson import ObjectId
 import traceback
 
-from utils.db_utils import db
+from utils.db_utils import db, is_embedded, update_question_fields
 
 @api_view(["PUT"])
 @permission_classes([IsAuthenticated])
@@ -21,24 +20,21 @@ def update_questions(request):
             if not question_id:
                 continue
 
-            update_result = db["questions"].update_one(
-                {"_id": ObjectId(question_id)},
-                {"$set": {
-                    "text": q.get("text"),
-                    "marks": q.get("marks"),
-                    "difficulty": q.get("difficulty"),
-                    "cognitive_level": q.get("cognitive_level"),
-                    "options": q.get("options"),
-                    "answer": q.get("answer"),
-                    "is_practical": q.get("is_practical"),
-                    "formula_required": q.get("formula_required"),
-                    "diagram": q.get("diagram"),
-                    "topic": q.get("topic"),
-                    "tags": q.get("tags", []),
-                }}
-            )
-
-            if update_result.modified_count > 0:
+            updated = update_question_fields(question_id, {
+                "text": q.get("text"),
+                "marks": q.get("marks"),
+                "difficulty": q.get("difficulty"),
+                "cognitive_level": q.get("cognitive_level"),
+                "options": q.get("options"),
+                "answer": q.get("answer"),
+                "is_practical": q.get("is_practical"),
+                "formula_required": q.get("formula_required"),
+                "diagram": q.get("diagram"),
+                "topic": q.get("topic"),
+                "tags": q.get("tags", []),
+            })
+
+            if updated:
                 updated_count += 1
 
         return Response({
@@ -54,6 +50,19 @@ def normalize(text):
     """Lowercase, strip, remove punctuation."""
     return re.sub(r"[^\w\s]", "", text.strip().lower())
 
+def overlap_report(generated_docs, pyq_docs):
+    """Which generated questions (`text`) repeat a PYQ (`question_text`), compared after normalize()"""
+    gen_set = {normalize(doc["text"]) for doc in generated_docs if doc.get("text")}
+    pyq_set = {normalize(doc["question_text"]) for doc in pyq_docs if doc.get("question_text")}
+    repeated = list(gen_set & pyq_set)
+    percent = round(len(repeated) / len(gen_set) * 100, 2) if gen_set else 0
+    return {
+        "matched_questions": repeated,
+        "repeated_percent": percent,
+        "total_generated": len(gen_set),
+        "total_matched": len(repeated)
+    }
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def check_pyq_overlap(request):
@@ -76,57 +85,35 @@ def check_pyq_overlap(request):
         print(f"Latest paper ID: {paper_id}")
 
         # ── 2️⃣  Fetch all questions linked to this paper
-        generated_cursor = db["questions"].find({"paper_id": paper_id}, {"text": 1, "_id": 0})
-        generated_list = list(generated_cursor)
+        if is_embedded(latest_paper):
+            # Embedded layout: the questions came with the paper
+            generated_list = [
+                {"text": question.get("text")}
+                for section in latest_paper.get("sections", [])
+                for question in section.get("questions", [])
+            ]
+        else:
+            generated_cursor = db["questions"].find({"paper_id": paper_id}, {"text": 1, "_id": 0})
+            generated_list = list(generated_cursor)
         print(f"Total generated question docs: {len(generated_list)}")
         print("Generated questions (raw):")
         for doc in generated_list:
             print(doc)
 
-        # Normalize generated questions
-        gen_set = {
-            normalize(doc["text"])
-            for doc in generated_list
-            if doc.get("text")
-        }
-        print(f"\nNormalized Generated Questions ({len(gen_set)}):")
-        for q in list(gen_set)[:5]:  # show sample
-            print(q)
-
         # ── 3️⃣  Get all PYQ questions
         pyq_cursor = db["pyq_questions"].find({}, {"question_text": 1, "_id": 0})
         pyq_list = list(pyq_cursor)
         print(f"\nTotal PYQ question docs: {len(pyq_list)}")
-        print("PYQ questions (raw):")
-        for doc in pyq_list:
-            print(doc)
-
-        # Normalize PYQ questions
-        pyq_set = {
-            normalize(doc["question_text"])
-            for doc in pyq_list
-            if doc.get("question_text")
-        }
-        print(f"\nNormalized PYQ Questions ({len(pyq_set)}):")
-        for q in list(pyq_set)[:5]:  # show sample
-            print(q)
 
         # ── 4️⃣  Calculate overlap
-        repeated = list(gen_set & pyq_set)
-        percent = round(len(repeated) / len(gen_set) * 100, 2) if gen_set else 0
-
-        print(f"\nRepeated Questions ({len(repeated)}):")
-        for q in repeated:
+        report = overlap_report(generated_list, pyq_list)
+        print(f"\nRepeated Questions ({report['total_matched']}):")
+        for q in report["matched_questions"]:
             print(q)
 
-        print(f"\nRepeated percentage: {percent}%")
+        print(f"\nRepeated percentage: {report['repeated_percent']}%")
 
-        return Response({
-            "matched_questions": repeated,
-            "repeated_percent": percent,
-            "total_generated": len(gen_set),
-            "total_matched": len(repeated)
-        }, status=200)
+        return Response(report, status=200)
 
     except Exception as e:
         traceback.print_exc()
@@ -0,0 +1,82 @@
+"""
+Benchmark the constraint-based paper assembler on synthetic candidate pools.
+
+Usage: python scripts/bench_assembler.py [--candidates 500] [--runs 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from papers.assembler import assemble_paper  # noqa: E402
+
+PAPER_PARAMS = {
+    'topics': ['SQL', 'Normalization', 'Transaction Management', 'Indexing', 'ER Modeling'],
+    'sections': [
+        {'name': 'Multiple Choice Questions', 'questionType': 'mcq', 'numQuestions': 10, 'marksPerQuestion': 2},
+        {'name': 'Short Answer Questions', 'questionType': 'descriptive', 'numQuestions': 5, 'marksPerQuestion': 5},
+        {'name': 'SQL Programming', 'questionType': 'programming', 'numQuestions': 3, 'marksPerQuestion': 10},
+        {'name': 'Numerical Problems', 'questionType': 'numerical', 'numQuestions': 5, 'marksPerQuestion': 4},
+    ],
+    'difficultyDistribution': {'easy': 30, 'medium': 50, 'hard': 20},
+    'cognitiveDistribution': {'remember': 20, 'understand': 30, 'apply': 30, 'analyze': 20},
+    'practicalTheoretical': {'theoretical': 60, 'practical': 40},
+}
+
+
+def make_pool(size, rng):
+    pool = []
+    for i in range(size):
+        section = rng.choice(PAPER_PARAMS['sections'])
+        pool.append({
+            'sectionName': section['name'],
+            'text': f"Candidate question {i}",
+            'questionType': section['questionType'],
+            # Skewed on purpose, so hitting the quotas takes actual work
+            'difficulty': rng.choices(['easy', 'medium', 'hard'], weights=[60, 30, 10])[0],
+            'cognitiveLevel': rng.choice(['remember', 'understand', 'apply', 'analyze']),
+            'isPractical': rng.random() < 0.25,
+            'topic': rng.choice(PAPER_PARAMS['topics']),
+            'marks': section['marksPerQuestion'],
+        })
+    return pool
+
+
+def quota_error(report):
+    targets, achieved = report['targets'], report['achieved']
+    error = sum(abs(achieved['difficulty'][k] - v) for k, v in targets['difficulty'].items())
+    error += sum(abs(achieved['cognitive'][k] - v) for k, v in targets['cognitive'].items())
+    error += abs(achieved['practical'] - targets['practical'])
+    return error + len(achieved['uncovered_topics'])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--candidates', type=int, default=500)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--budget-ms', type=float, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    timings, errors = [], []
+    for run in range(args.runs):
+        pool = make_pool(args.candidates, rng)
+        started = time.perf_counter()
+        _, report = assemble_paper(pool, PAPER_PARAMS, time_budget_ms=args.budget_ms, seed=run)
+        timings.append((time.perf_counter() - started) * 1000)
+        errors.append(quota_error(report))
+
+    timings.sort()
+    print(f"{args.runs} runs, {args.candidates} candidates, "
+          f"{sum(s['numQuestions'] for s in PAPER_PARAMS['sections'])} slots")
+    print(f"  median {statistics.median(timings):.1f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95) - 1]:.1f} ms, max {timings[-1]:.1f} ms")
+    print(f"  quota misses per paper: mean {statistics.mean(errors):.2f}, max {max(errors)}")
+
+
+if __name__ == '__main__':
+    main()
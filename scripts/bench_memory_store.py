@@ -0,0 +1,138 @@
+"""
+Benchmark the in-memory Mongo stand-in against the linear-scan DummyCollection
+it replaced, on a synthetic pyq_questions collection.
+
+Usage: python scripts/bench_memory_store.py [--questions 50000] [--lookups 2000]
+"""
+import argparse
+import hashlib
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from papers.indexes import INDEXES  # noqa: E402
+from utils.memory_store import MemoryClient  # noqa: E402
+
+SUBJECTS = [(f"Subject {i}", f"4144{i:02d}") for i in range(40)]
+
+
+class LinearScanCollection:
+    """The matching logic of the old DummyCollection: a full scan per lookup"""
+
+    def __init__(self):
+        self._data = []
+
+    def insert_one(self, document):
+        self._data.append(document)
+
+    def _matches(self, doc, query):
+        return all(k in doc and doc[k] == v for k, v in query.items())
+
+    def find_one(self, query):
+        for doc in self._data:
+            if self._matches(doc, query):
+                return doc
+        return None
+
+    def find(self, query):
+        return [doc for doc in self._data if self._matches(doc, query)]
+
+
+def make_questions(count, rng):
+    started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    questions = []
+    for i in range(count):
+        subject_name, subject_code = rng.choice(SUBJECTS)
+        text = f"Question {i} about {subject_name}"
+        questions.append({
+            'question_text': text,
+            'hash': hashlib.md5(text.encode()).hexdigest(),
+            'subject_name': subject_name,
+            'subject_key': subject_name.lower(),
+            'subject_code': subject_code,
+            'unit': rng.randint(1, 6),
+            'marks': rng.choice([2, 5, 10]),
+            'uploaded_by': f"user{rng.randint(1, 50)}",
+            'uploaded_at': started + timedelta(minutes=i // 40),
+        })
+    return questions
+
+
+def timed(fn, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    print(f"  {label:<38} median {statistics.median(timings):8.3f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95) - 1]:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--questions', type=int, default=50000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    questions = make_questions(args.questions, rng)
+
+    legacy = LinearScanCollection()
+    for question in questions:
+        legacy.insert_one(dict(question))
+
+    collection = MemoryClient()['bench']['pyq_questions']
+    for spec in INDEXES:
+        if spec['collection'] == 'pyq_questions':
+            options = {key: value for key, value in spec.items() if key not in ('collection', 'keys')}
+            collection.create_index(spec['keys'], **options)
+    started = time.perf_counter()
+    collection.insert_many([dict(question) for question in questions])
+    print(f"{args.questions} questions, insert_many with {len(collection.indexes)} indexes: "
+          f"{(time.perf_counter() - started) * 1000:.0f} ms")
+
+    hashes = [rng.choice(questions)['hash'] for _ in range(args.lookups)]
+    lookup = iter(hashes * 2)
+    print(f"duplicate check by hash ({args.lookups} lookups)")
+    report("linear scan find_one", timed(lambda: legacy.find_one({'hash': next(lookup)}), args.lookups))
+    report("indexed find_one", timed(lambda: collection.find_one({'hash': next(lookup)}), args.lookups))
+
+    runs = max(args.lookups // 20, 10)
+    print(f"listing page of one subject and unit ({runs} runs)")
+    subject_code = SUBJECTS[0][1]
+
+    def legacy_page():
+        docs = legacy.find({'subject_code': subject_code, 'unit': 1})
+        docs.sort(key=lambda doc: doc['uploaded_at'], reverse=True)
+        return docs[:20]
+
+    def indexed_page():
+        cursor = collection.find({'subject_code': subject_code, 'unit': 1})
+        return list(cursor.sort([('uploaded_at', -1), ('_id', -1)]).limit(20))
+
+    report("linear scan + sort", timed(legacy_page, runs))
+    report("indexed find + sort", timed(indexed_page, runs))
+
+    print(f"upload history aggregate ({runs} runs)")
+    pipeline = [
+        {'$match': {'uploaded_by': 'user1'}},
+        {'$group': {'_id': {'subject_name': '$subject_name', 'uploaded_at': '$uploaded_at'},
+                    'question_count': {'$sum': 1}}},
+        {'$sort': {'_id.uploaded_at': -1}},
+        {'$limit': 20},
+    ]
+    report("indexed $match + $group", timed(lambda: list(collection.aggregate(pipeline)), runs))
+
+
+if __name__ == '__main__':
+    main()
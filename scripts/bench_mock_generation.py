@@ -0,0 +1,54 @@
+"""
+Benchmark the mock question generator used when Ollama is unavailable.
+
+Usage: python scripts/bench_mock_generation.py [--papers 2000] [--threads 4]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from papers.mock_templates import generate_mock_questions  # noqa: E402
+
+PAPER_PARAMS = {
+    'subjectName': 'Database Management Systems',
+    'topics': ['SQL', 'Normalization', 'Transaction Management', 'Indexing', 'ER Modeling'],
+    'sections': [
+        {'name': 'Multiple Choice Questions', 'questionType': 'mcq', 'numQuestions': 10, 'marksPerQuestion': 2},
+        {'name': 'Short Answer Questions', 'questionType': 'descriptive', 'numQuestions': 5, 'marksPerQuestion': 5},
+        {'name': 'SQL Programming', 'questionType': 'programming', 'numQuestions': 3, 'marksPerQuestion': 10},
+        {'name': 'Numerical Problems', 'questionType': 'numerical', 'numQuestions': 5, 'marksPerQuestion': 4},
+    ],
+    'difficultyDistribution': {'easy': 30, 'medium': 50, 'hard': 20},
+    'cognitiveDistribution': {'remember': 20, 'understand': 30, 'apply': 30, 'analyze': 20},
+    'practicalTheoretical': {'theoretical': 60, 'practical': 40},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--papers', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=1)
+    args = parser.parse_args()
+
+    # Same seed, same paper
+    assert generate_mock_questions(PAPER_PARAMS, seed=7) == generate_mock_questions(PAPER_PARAMS, seed=7)
+
+    started = time.perf_counter()
+    if args.threads > 1:
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            list(executor.map(lambda seed: generate_mock_questions(PAPER_PARAMS, seed=seed), range(args.papers)))
+    else:
+        for seed in range(args.papers):
+            generate_mock_questions(PAPER_PARAMS, seed=seed)
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.papers} papers in {elapsed:.2f}s on {args.threads} thread(s): "
+          f"{args.papers / elapsed:,.0f} papers/s, {elapsed / args.papers * 1e6:.0f} us/paper")
+
+
+if __name__ == '__main__':
+    main()
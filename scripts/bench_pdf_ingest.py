@@ -0,0 +1,147 @@
+"""
+Measure time and peak Python memory of question-paper PDF ingestion: the old
+path (copy the upload to media/temp_pdfs, reopen it, join and collapse the
+whole text) against extract_questions_from_pdf reading the upload page by page.
+
+Usage: python scripts/bench_pdf_ingest.py [--pages 200] [--runs 3]
+
+tracemalloc sees Python allocations only; MuPDF's own buffers are not counted.
+"""
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'examgenie.settings')
+os.environ.setdefault('MONGODB_URI', 'memory://bench')
+os.environ.setdefault('MONGODB_DB', 'bench')
+
+import django  # noqa: E402
+
+django.setup()
+
+import fitz  # noqa: E402
+from django.core.files.base import ContentFile  # noqa: E402
+from django.core.files.storage import FileSystemStorage  # noqa: E402
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile  # noqa: E402
+from papers.views import INSTRUCTIONS_MARKER, MAIN_QUESTION_PATTERN, PaperViewSet  # noqa: E402
+
+HEADER = [
+    "Total No. of Questions : 8]",
+    "[6353] - 125",
+    "T.E. (Computer Engineering)",
+    "DATABASE MANAGEMENT SYSTEMS",
+    "(310241) (Semester - I)",
+    INSTRUCTIONS_MARKER,
+    "1) Answer Q1 or Q2, Q3 or Q4, Q5 or Q6, Q7 or Q8.",
+    "2) Neat diagrams must be drawn wherever necessary.",
+]
+
+
+class Uploader:
+    _id = 'bench-user'
+
+
+def make_pdf(pages):
+    doc = fitz.open()
+    number = 0
+    for page_index in range(pages):
+        page = doc.new_page()
+        lines = list(HEADER) if page_index == 0 else []
+        while len(lines) < 44:
+            number += 1
+            lines += [
+                f"Q{number})",
+                f"a) Explain the role of concept {number} in transaction processing with an",
+                "example and a neat diagram of the states involved. [6]",
+                f"b) Compare approach {number} with the two-phase locking protocol. [4]",
+                "OR",
+                f"a) Describe how index {number} is maintained under concurrent inserts. [5]",
+                f"b) Write short notes on recovery technique {number}. [5]",
+            ]
+        y = 40
+        for line in lines:
+            page.insert_text((40, y), line, fontsize=9)
+            y += 17
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def legacy_extract(view, upload, temp_dir):
+    """The former upload_question_paper + extract_questions_from_pdf text pipeline"""
+    storage = FileSystemStorage(location=temp_dir)
+    upload.seek(0)
+    file_name = storage.save(upload.name, ContentFile(upload.read()))
+    try:
+        doc = fitz.open(storage.path(file_name))
+        full_text = "\n".join([page.get_text() for page in doc])
+        doc.close()
+        question_section = full_text
+        if INSTRUCTIONS_MARKER in full_text:
+            question_section = full_text.split(INSTRUCTIONS_MARKER)[-1]
+        question_section = re.sub(r'\s+', ' ', question_section).strip()
+        parsed = view.parse_main_questions(MAIN_QUESTION_PATTERN.split(question_section)[1:])
+        return view.question_docs(parsed, full_text, 'DBMS', '310241', 'endsem', Uploader(), file_name)
+    finally:
+        storage.delete(file_name)
+
+
+def measure(fn, runs):
+    timings, peaks, result = [], [], None
+    for _ in range(runs):
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return result, min(timings), max(peaks)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    data = make_pdf(args.pages)
+    view = PaperViewSet()
+    temp_dir = tempfile.mkdtemp()
+    print(f"{args.pages}-page paper, {len(data) / 1024:.0f} KiB")
+
+    def in_memory_upload():
+        return SimpleUploadedFile('paper.pdf', data, content_type='application/pdf')
+
+    def spooled_upload():
+        upload = TemporaryUploadedFile('paper.pdf', 'application/pdf', len(data), None)
+        upload.write(data)
+        upload.seek(0)
+        return upload
+
+    try:
+        for label, make_upload in (('in-memory upload', in_memory_upload), ('spooled upload', spooled_upload)):
+            upload = make_upload()
+            legacy, legacy_ms, legacy_peak = measure(lambda: legacy_extract(view, upload, temp_dir), args.runs)
+            current, current_ms, current_peak = measure(
+                lambda: view.extract_questions_from_pdf(upload, 'DBMS', '310241', 'endsem', Uploader()), args.runs
+            )
+            ignored = ('uploaded_at', 'updated_at')
+            same = [{k: v for k, v in q.items() if k not in ignored} for q in legacy] == [
+                {k: v for k, v in q.items() if k not in ignored} for q in current
+            ]
+            print(f"{label}: {len(current)} questions, identical to the old parser: {same}")
+            print(f"  temp file + full text   {legacy_ms:8.1f} ms, peak {legacy_peak / 1024:8.0f} KiB")
+            print(f"  page by page            {current_ms:8.1f} ms, peak {current_peak / 1024:8.0f} KiB")
+            upload.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
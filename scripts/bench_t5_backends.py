@@ -0,0 +1,101 @@
+"""
+Compare the PyTorch and quantized ONNX Runtime T5 question generators.
+
+Each backend runs in its own subprocess so peak RSS is measured separately.
+Export the ONNX model first with `python manage.py export_t5_onnx`.
+
+Usage: python scripts/bench_t5_backends.py [--runs 10] [--batch 8]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+TOPICS = ['SQL', 'Normalization', 'Transaction Management', 'Indexing', 'ER Modeling',
+          'Query Optimization', 'Concurrency Control', 'Recovery']
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_backend(backend, runs, batch):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'examgenie.settings')
+    import django
+    django.setup()
+
+    if backend == 'onnx':
+        from papers.onnx_engine import get_onnx_t5_generator as get_generator
+    else:
+        from papers.t5_engine import get_t5_generator as get_generator
+
+    generator = get_generator()
+    rss_before_load = peak_rss_mb()
+    started = time.perf_counter()
+    generator.load()
+    load_seconds = time.perf_counter() - started
+
+    # Same prompts for both backends
+    prompts = [
+        generator.prompt_template.format(
+            subject='Database Management Systems', topic=TOPICS[i % len(TOPICS)],
+            question_type='descriptive', difficulty='medium', cognitive_level='understand', kind='theoretical'
+        )
+        for i in range(batch)
+    ]
+    generator.generate_texts(prompts)  # warm-up
+
+    tokens = 0
+    started = time.perf_counter()
+    for _ in range(runs):
+        texts = generator.generate_texts(prompts)
+        tokens += sum(len(generator.tokenizer(text).input_ids) for text in texts)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'backend': backend,
+        'load_seconds': round(load_seconds, 2),
+        'tokens_per_second': round(tokens / elapsed, 1),
+        'seconds_per_batch': round(elapsed / runs, 3),
+        'model_rss_mb': round(peak_rss_mb() - rss_before_load, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--batch', type=int, default=8)
+    parser.add_argument('--backend', choices=['torch', 'onnx'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.backend:
+        print(json.dumps(run_backend(args.backend, args.runs, args.batch)))
+        return
+
+    results = []
+    for backend in ('torch', 'onnx'):
+        output = subprocess.run(
+            [sys.executable, __file__, '--backend', backend, '--runs', str(args.runs), '--batch', str(args.batch)],
+            cwd=BASE_DIR, capture_output=True, text=True
+        )
+        if output.returncode != 0:
+            print(f"{backend} failed:\n{output.stderr}")
+            continue
+        results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    print(f"{'backend':<8} {'load s':>8} {'tok/s':>10} {'s/batch':>9} {'model MB':>9} {'peak MB':>9}")
+    for r in results:
+        print(f"{r['backend']:<8} {r['load_seconds']:>8} {r['tokens_per_second']:>10} "
+              f"{r['seconds_per_batch']:>9} {r['model_rss_mb']:>9} {r['peak_rss_mb']:>9}")
+
+
+if __name__ == '__main__':
+    main()
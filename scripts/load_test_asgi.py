@@ -0,0 +1,174 @@
+"""
+Compare WSGI and ASGI throughput of the paper endpoints under concurrent load.
+
+Start a fake Ollama that answers every prompt after a fixed delay, so the test
+measures how many generations a server keeps in flight rather than model speed:
+
+    python scripts/load_test_asgi.py fake-ollama --port 11435 --delay 2
+
+Run both servers against the same MongoDB and the fake Ollama, e.g.
+
+    OLLAMA_URL=http://127.0.0.1:11435 OLLAMA_MAX_INFLIGHT=500 gunicorn examgenie.wsgi -w 1 --threads 8 -b :8000
+    OLLAMA_URL=http://127.0.0.1:11435 OLLAMA_MAX_INFLIGHT=500 uvicorn examgenie.asgi:application --port 8001
+
+then load them with a bearer token of an existing user:
+
+    python scripts/load_test_asgi.py run --token $TOKEN --requests 200 --concurrency 100 \\
+        --target wsgi=http://127.0.0.1:8000/api/papers/generate/ \\
+        --target asgi=http://127.0.0.1:8001/api/papers/async/generate/
+
+Use --method GET (and no body) for the questions, overlap and download endpoints.
+"""
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import time
+
+import httpx
+
+PAPER_PARAMS = {
+    'subjectName': 'Database Management Systems',
+    'department': 'Computer Engineering',
+    'topics': ['SQL', 'Normalization', 'Transactions'],
+    'duration': 180,
+    'totalMarks': 40,
+    'sections': [
+        {'name': 'Multiple Choice Questions', 'questionType': 'mcq', 'numQuestions': 5, 'marksPerQuestion': 2},
+        {'name': 'Short Answer Questions', 'questionType': 'descriptive', 'numQuestions': 3, 'marksPerQuestion': 5},
+        {'name': 'SQL Programming', 'questionType': 'programming', 'numQuestions': 1, 'marksPerQuestion': 15},
+    ],
+    'difficultyDistribution': {'easy': 30, 'medium': 50, 'hard': 20},
+    'cognitiveDistribution': {'remember': 20, 'understand': 30, 'apply': 30, 'analyze': 20},
+    'practicalTheoretical': {'theoretical': 60, 'practical': 40},
+    # Every request should reach the (fake) model
+    'useCache': False,
+    'useQuestionBank': False,
+}
+
+SECTION_LINE = re.compile(r"- (?P<name>[^:\n]+): (?P<count>\d+) (?P<type>\w+) questions, (?P<marks>\d+) marks each")
+
+
+# -- fake Ollama ----------------------------------------------------------
+
+def fake_questions(prompt, counter):
+    questions = []
+    for match in SECTION_LINE.finditer(prompt):
+        for _ in range(int(match['count'])):
+            counter[0] += 1
+            question = {
+                'sectionName': match['name'],
+                'text': f"Load test question {counter[0]} on {match['name']}",
+                'questionType': match['type'],
+                'difficulty': 'medium',
+                'cognitiveLevel': 'apply',
+                'marks': int(match['marks']),
+                'answer': 'A',
+                'isPractical': False,
+            }
+            if match['type'] == 'mcq':
+                question['options'] = ['A', 'B', 'C', 'D']
+            questions.append(question)
+    return questions
+
+
+async def serve_fake_ollama(port, delay):
+    counter = [0]
+
+    async def handle(reader, writer):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+            length = int(re.search(rb'content-length: *(\d+)', head, re.IGNORECASE).group(1))
+            body = json.loads(await reader.readexactly(length))
+            await asyncio.sleep(delay)
+            payload = json.dumps({
+                'model': body.get('model'),
+                'response': json.dumps(fake_questions(body.get('prompt', ''), counter)),
+                'done': True,
+            }).encode()
+            writer.write(
+                b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nConnection: close\r\n'
+                + f'Content-Length: {len(payload)}\r\n\r\n'.encode() + payload
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, AttributeError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', port, backlog=1024)
+    print(f"Fake Ollama on http://127.0.0.1:{port}, answering after {delay}s")
+    async with server:
+        await server.serve_forever()
+
+
+# -- load generator -------------------------------------------------------
+
+async def load(url, method, body, token, total, concurrency, timeout):
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    latencies, statuses = [], {}
+    remaining = iter(range(total))
+
+    async with httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker():
+            for _ in remaining:
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, url, json=body, headers=headers)
+                    key = response.status_code
+                except httpx.HTTPError as e:
+                    key = type(e).__name__
+                latencies.append(time.perf_counter() - started)
+                statuses[key] = statuses.get(key, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'elapsed': elapsed,
+        'throughput': total / elapsed,
+        'p50': statistics.median(latencies),
+        'p95': latencies[int(len(latencies) * 0.95) - 1],
+        'statuses': statuses,
+    }
+
+
+def run(args):
+    body = json.loads(args.body) if args.body else (PAPER_PARAMS if args.method == 'POST' else None)
+    print(f"{args.requests} requests per target, {args.concurrency} concurrent")
+    for target in args.target:
+        label, _, url = target.partition('=')
+        result = asyncio.run(load(url, args.method, body, args.token, args.requests, args.concurrency, args.timeout))
+        print(f"  {label:<6} {result['throughput']:7.2f} req/s, p50 {result['p50']:6.2f} s, "
+              f"p95 {result['p95']:6.2f} s, statuses {result['statuses']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    fake = commands.add_parser('fake-ollama')
+    fake.add_argument('--port', type=int, default=11435)
+    fake.add_argument('--delay', type=float, default=2.0)
+
+    runner = commands.add_parser('run')
+    runner.add_argument('--target', action='append', required=True, help='label=url, e.g. asgi=http://...')
+    runner.add_argument('--token')
+    runner.add_argument('--method', default='POST')
+    runner.add_argument('--body', help='JSON request body (defaults to a small paper for POST)')
+    runner.add_argument('--requests', type=int, default=200)
+    runner.add_argument('--concurrency', type=int, default=50)
+    runner.add_argument('--timeout', type=float, default=600)
+
+    args = parser.parse_args()
+    if args.command == 'fake-ollama':
+        asyncio.run(serve_fake_ollama(args.port, args.delay))
+    else:
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# utils/async_db.py
+"""Async (motor) counterparts of the utils/db_utils.py helpers the async views need"""
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from utils.db_utils import QUESTION_PROJECTION, SECTION_PROJECTION, build_paper_bundle, is_embedded
+from utils.mongo_client import get_async_client, get_async_db
+
+# None until the first bulk write finds out whether the deployment supports transactions
+_transactions_supported = None
+
+
+async def _write_paper_bundle(db, paper_doc, section_docs, question_docs, session=None):
+    await db['papers'].insert_one(paper_doc, session=session)
+    if section_docs and not is_embedded(paper_doc):
+        await db['sections'].insert_many(section_docs, session=session)
+    if question_docs:
+        await db['questions'].insert_many(question_docs, session=session)
+
+
+async def insert_paper_bundle(data, user_id, sections_data, questions_data, status="published"):
+    """Same documents and round trips as db_utils.insert_paper_bundle, written with the async driver"""
+    global _transactions_supported
+
+    paper_doc, section_docs, question_docs = build_paper_bundle(
+        data, user_id, sections_data, questions_data, status=status
+    )
+    db = get_async_db()
+
+    if _transactions_supported is not False:
+        try:
+            async with await get_async_client().start_session() as session:
+                await session.with_transaction(
+                    lambda s: _write_paper_bundle(db, paper_doc, section_docs, question_docs, session=s)
+                )
+            _transactions_supported = True
+            return paper_doc, section_docs, question_docs
+        except OperationFailure as e:
+            # Standalone servers reject transactions (IllegalOperation); any other failure is real
+            if e.code != 20 or _transactions_supported:
+                raise
+            _transactions_supported = False
+
+    await _write_paper_bundle(db, paper_doc, section_docs, question_docs)
+    return paper_doc, section_docs, question_docs
+
+
+async def get_paper(paper_id):
+    return await get_async_db()['papers'].find_one({'_id': ObjectId(paper_id)})
+
+
+async def get_paper_sections(paper_doc):
+    """The paper's sections in order, each with its `questions`, in two queries for a normalized paper"""
+    if is_embedded(paper_doc):
+        return paper_doc.get('sections', [])
+
+    db = get_async_db()
+    paper_id = paper_doc['_id']
+    sections = await db['sections'].find({'paper_id': paper_id}, SECTION_PROJECTION).sort('order', 1).to_list(None)
+
+    questions_by_section = {}
+    async for question in db['questions'].find({'paper_id': paper_id}, QUESTION_PROJECTION):
+        questions_by_section.setdefault(question['section_id'], []).append(question)
+    for section in sections:
+        section['questions'] = questions_by_section.get(section['_id'], [])
+    return sections
@@ -1,9 +1,13 @@
-from pymongo import MongoClient
+from django.conf import settings
+from pymongo.errors import OperationFailure
 from datetime import datetime, timezone
 import traceback
 import os
 from dotenv import load_dotenv
 from bson.objectid import ObjectId
+from utils.mongo_client import LazyDatabase, get_client
+from utils.indexes import ensure_collection_indexes
+from utils.paper_cache import invalidate_paper
 # Load environment variables
 load_dotenv()
 
@@ -13,11 +17,38 @@ MONGODB_DB = os.getenv('MONGODB_DB')
 if not MONGODB_URI or not MONGODB_DB:
     raise Exception("Missing MongoDB configuration in environment variables")
 
-client = MongoClient(MONGODB_URI)
-db = client[MONGODB_DB]
+# Shared, lazily-connected database handle; see utils/mongo_client.py
+db = LazyDatabase()
 
+# Papers are stored either normalized (papers + sections + questions) or
+# embedded (one papers document holding its ordered sections and their
+# questions). Reads handle both so the layout can be switched gradually.
+NORMALIZED_LAYOUT = 'normalized'
+EMBEDDED_LAYOUT = 'embedded'
 
-def insert_paper(data, user_id):
+
+def ensure_embedded_indexes():
+    """Build the papers indexes, including embedded_question_id that lets edits find their paper"""
+    ensure_collection_indexes('papers')
+
+def is_embedded(paper_doc):
+    return paper_doc.get('layout') == EMBEDDED_LAYOUT
+
+def embed_paper(paper_doc, section_docs, question_docs):
+    """Return `paper_doc` in the embedded layout, with its questions nested in their sections"""
+    questions_by_section = {}
+    for question_doc in question_docs:
+        questions_by_section.setdefault(question_doc['section_id'], []).append(question_doc)
+
+    sections = []
+    for section_doc in sorted(section_docs, key=lambda section: section['order']):
+        section = dict(section_doc)
+        section['questions'] = questions_by_section.get(section_doc['_id'], [])
+        sections.append(section)
+    return dict(paper_doc, layout=EMBEDDED_LAYOUT, sections=sections)
+
+
+def build_paper_doc(data, user_id, status="draft"):
     # Ensure data is a dictionary
     if not isinstance(data, dict):
         raise ValueError("Expected 'data' to be a dictionary, but got: {}".format(type(data)))
@@ -27,28 +58,30 @@ def insert_paper(data, user_id):
     
     paper_doc = {
         "user_id": user_id,
-        "title": f"{data['subject_name']} Exam Paper",
+        "title": data.get('title', f"{data['subject_name']} Exam Paper"),
         "subject_name": data['subject_name'],
         "department": data['department'],
         "topics": data['topics'],
         "total_marks": data['total_marks'],
         "duration": data['duration'],
-        "include_formula": data.get('includeFormula', False),
-        "include_diagrams": data.get('includeDiagrams', False),
-        "include_answer_key": data.get('includeAnswerKey', True),
-        "status": "draft",
+        "include_formula": data.get('include_formula', False),
+        "include_diagrams": data.get('include_diagrams', False),
+        "include_answer_key": data.get('include_answer_key', True),
+        "status": status,
         "created_at": created_at,
         "updated_at": updated_at
     }
 
+    # Papers generated together as sets A/B/C... share a set id
+    if data.get('set_id'):
+        paper_doc['set_id'] = data['set_id']
+        paper_doc['variant'] = data.get('variant')
+    return paper_doc
 
-    paper_id = db['papers'].insert_one(paper_doc).inserted_id
-    return paper_id
-
-def insert_section(section_data, paper_id, index):
+def build_section_doc(section_data, paper_id, index):
     created_at = updated_at = datetime.now(timezone.utc)
 
-    section_doc = {
+    return {
         "paper_id": paper_id,
         "name": section_data['name'],
         "question_type": section_data['questionType'],
@@ -59,13 +92,11 @@ def insert_section(section_data, paper_id, index):
         "created_at": created_at,
         "updated_at": updated_at
     }
-    section_id = db['sections'].insert_one(section_doc).inserted_id
-    return section_id
 
-def insert_question(question_data, paper_id, section_id):
+def build_question_doc(question_data, paper_id, section_id):
     created_at = updated_at = datetime.now(timezone.utc)
 
-    question_doc = {
+    return {
         "paper_id": paper_id,
         "section_id": section_id,
         "text": question_data['text'],
@@ -80,10 +111,143 @@ def insert_question(question_data, paper_id, section_id):
         "tags": question_data.get('tags', []),
         "diagram": question_data.get('diagram'),
         "formula_required": question_data.get('formulaRequired', False),
+        "subject_name": question_data.get('subjectName', ''),
+        "source": question_data.get('source', 'llm'),  # llm, mock, bank or pyq
         "created_at": created_at,
         "updated_at": updated_at
     }
-    db['questions'].insert_one(question_doc)
+
+def insert_paper(data, user_id):
+    paper_doc = build_paper_doc(data, user_id)
+    if settings.PAPER_STORAGE_LAYOUT == EMBEDDED_LAYOUT:
+        paper_doc = embed_paper(paper_doc, [], [])
+    paper_id = db['papers'].insert_one(paper_doc).inserted_id
+    return paper_id
+
+def insert_section(section_data, paper_id, index):
+    section_doc = build_section_doc(section_data, paper_id, index)
+    if settings.PAPER_STORAGE_LAYOUT == EMBEDDED_LAYOUT:
+        section_doc['_id'] = ObjectId()
+        result = db['papers'].update_one(
+            {'_id': paper_id, 'layout': EMBEDDED_LAYOUT},
+            {'$push': {'sections': dict(section_doc, questions=[])}}
+        )
+        if result.matched_count:
+            return section_doc['_id']
+    # Normalized paper (or one written before the layout was switched)
+    section_id = db['sections'].insert_one(section_doc).inserted_id
+    return section_id
+
+def insert_question(question_data, paper_id, section_id):
+    question_doc = build_question_doc(question_data, paper_id, section_id)
+    # The questions collection keeps every question in both layouts: it is also the question bank
+    question_id = db['questions'].insert_one(question_doc).inserted_id
+    if settings.PAPER_STORAGE_LAYOUT == EMBEDDED_LAYOUT:
+        db['papers'].update_one(
+            {'_id': paper_id, 'layout': EMBEDDED_LAYOUT},
+            {'$push': {'sections.$[section].questions': question_doc}},
+            array_filters=[{'section._id': section_id}]
+        )
+    return question_id
+
+def insert_questions(questions_data, paper_id, section_ids):
+    """
+    insert_question for many questions at once: one insert_many, plus one
+    update per section in the embedded layout. `section_ids` maps section
+    names to ids; questions whose sectionName matches none are dropped.
+    Returns the question documents written.
+    """
+    question_docs = []
+    for question_data in questions_data:
+        section_id = section_ids.get(question_data['sectionName'])
+        if section_id is None:
+            continue
+        question_docs.append(build_question_doc(question_data, paper_id, section_id))
+    if not question_docs:
+        return []
+
+    db['questions'].insert_many(question_docs)
+    if settings.PAPER_STORAGE_LAYOUT == EMBEDDED_LAYOUT:
+        by_section = {}
+        for question_doc in question_docs:
+            by_section.setdefault(question_doc['section_id'], []).append(question_doc)
+        for section_id, section_questions in by_section.items():
+            db['papers'].update_one(
+                {'_id': paper_id, 'layout': EMBEDDED_LAYOUT},
+                {'$push': {'sections.$[section].questions': {'$each': section_questions}}},
+                array_filters=[{'section._id': section_id}]
+            )
+    return question_docs
+
+# None until the first bulk write finds out whether the deployment supports transactions
+_transactions_supported = None
+
+def _write_paper_bundle(paper_doc, section_docs, question_docs, session=None):
+    db['papers'].insert_one(paper_doc, session=session)
+    if section_docs and not is_embedded(paper_doc):
+        db['sections'].insert_many(section_docs, session=session)
+    if question_docs:
+        db['questions'].insert_many(question_docs, session=session)
+
+def build_paper_bundle(data, user_id, sections_data, questions_data, status="published"):
+    """The documents insert_paper_bundle writes, with client-side `_id`s, laid out for PAPER_STORAGE_LAYOUT"""
+    paper_doc = build_paper_doc(data, user_id, status=status)
+    paper_doc['_id'] = paper_id = ObjectId()
+
+    section_docs = []
+    section_ids = {}
+    for index, section_data in enumerate(sections_data):
+        section_doc = build_section_doc(section_data, paper_id, index)
+        section_doc['_id'] = section_ids[section_data['name']] = ObjectId()
+        section_docs.append(section_doc)
+
+    question_docs = []
+    for question_data in questions_data:
+        section_id = section_ids.get(question_data['sectionName'])
+        if section_id is None:
+            continue
+        question_doc = build_question_doc(question_data, paper_id, section_id)
+        question_doc['_id'] = ObjectId()
+        question_docs.append(question_doc)
+
+    if settings.PAPER_STORAGE_LAYOUT == EMBEDDED_LAYOUT:
+        paper_doc = embed_paper(paper_doc, section_docs, question_docs)
+
+    return paper_doc, section_docs, question_docs
+
+def insert_paper_bundle(data, user_id, sections_data, questions_data, status="published"):
+    """
+    Write a paper, its sections and its questions in three round trips (two
+    in the embedded layout, where the sections live inside the paper).
+
+    Ids are allocated client-side so questions can reference their section
+    before anything is written, and the paper is stored directly in its final
+    `status`. The writes share a transaction when the deployment supports one
+    (replica set or mongos). Questions whose sectionName matches no section are
+    dropped. Returns (paper_doc, section_docs, question_docs), `_id`s included.
+    """
+    global _transactions_supported
+
+    paper_doc, section_docs, question_docs = build_paper_bundle(
+        data, user_id, sections_data, questions_data, status=status
+    )
+
+    if _transactions_supported is not False:
+        try:
+            with get_client().start_session() as session:
+                session.with_transaction(
+                    lambda s: _write_paper_bundle(paper_doc, section_docs, question_docs, session=s)
+                )
+            _transactions_supported = True
+            return paper_doc, section_docs, question_docs
+        except OperationFailure as e:
+            # Standalone servers reject transactions (IllegalOperation); any other failure is real
+            if e.code != 20 or _transactions_supported:
+                raise
+            _transactions_supported = False
+
+    _write_paper_bundle(paper_doc, section_docs, question_docs)
+    return paper_doc, section_docs, question_docs
 
 def update_paper_status(paper_id):
     updated_at = datetime.now(timezone.utc)
@@ -91,7 +255,66 @@ def update_paper_status(paper_id):
         {'_id': ObjectId(paper_id)},
         {'$set': {'status': 'published', 'updated_at': updated_at}}
     )
+    invalidate_paper(paper_id)
+
+def delete_draft_paper(paper_id):
+    """Remove a paper left in draft (e.g. by a failed generation job) with its sections and questions"""
+    paper_id = ObjectId(paper_id)
+    if not db['papers'].delete_one({'_id': paper_id, 'status': 'draft'}).deleted_count:
+        return False
+    db['sections'].delete_many({'paper_id': paper_id})
+    db['questions'].delete_many({'paper_id': paper_id})
+    invalidate_paper(paper_id)
+    return True
 
 def get_paper(paper_id):
     paper = db['papers'].find_one({'_id': ObjectId(paper_id)})
-    return paper
\ No newline at end of file
+    return paper
+
+# Fields the paper serializer and the PDF template read
+SECTION_PROJECTION = {
+    "name": 1, "question_type": 1, "num_questions": 1, "marks_per_question": 1, "instructions": 1, "order": 1,
+}
+QUESTION_PROJECTION = {
+    "section_id": 1, "text": 1, "question_type": 1, "difficulty": 1, "cognitive_level": 1, "marks": 1,
+    "options": 1, "answer": 1, "is_practical": 1, "topic": 1, "tags": 1, "diagram": 1, "formula_required": 1,
+}
+
+def get_paper_sections(paper_doc):
+    """
+    The paper's sections in order, each with its `questions`, for either layout.
+
+    A normalized paper costs two queries however many sections it has: one for
+    the sections and one for all of the paper's questions, grouped here.
+    """
+    if is_embedded(paper_doc):
+        return paper_doc.get('sections', [])
+
+    paper_id = paper_doc['_id']
+    sections = list(db['sections'].find({'paper_id': paper_id}, SECTION_PROJECTION).sort('order', 1))
+
+    questions_by_section = {}
+    for question in db['questions'].find({'paper_id': paper_id}, QUESTION_PROJECTION):
+        questions_by_section.setdefault(question['section_id'], []).append(question)
+    for section in sections:
+        section['questions'] = questions_by_section.get(section['_id'], [])
+    return sections
+
+def update_question_fields(question_id, fields):
+    """Apply `fields` to a question and to its copy inside an embedded paper; returns True if it changed"""
+    question_id = ObjectId(question_id)
+    # The previous values tell us whether anything changed and which paper to invalidate
+    projection = dict.fromkeys(fields, 1)
+    projection['paper_id'] = 1
+    previous = db['questions'].find_one_and_update({'_id': question_id}, {'$set': fields}, projection=projection)
+
+    ensure_embedded_indexes()
+    embedded_result = db['papers'].update_one(
+        {'sections.questions._id': question_id},
+        {'$set': {f'sections.$[].questions.$[question].{name}': value for name, value in fields.items()}},
+        array_filters=[{'question._id': question_id}]
+    )
+    if previous:
+        invalidate_paper(previous['paper_id'])
+    changed = previous is not None and any(previous.get(name) != value for name, value in fields.items())
+    return changed or embedded_result.modified_count > 0
\ No newline at end of file
@@ -0,0 +1,102 @@
+# utils/indexes.py
+import threading
+from importlib import import_module
+from django.apps import apps
+from pymongo.errors import OperationFailure
+from utils.mongo_client import get_db
+
+# Each app may declare, in <app>/indexes.py:
+#   INDEXES      - list of {"collection", "keys", "name", **create_index options}
+#   QUERY_SHAPES - list of {"name", "collection", "filter", "sort"} mirroring the
+#                  queries its views run, used by `ensure_indexes --check`
+INDEX_MODULE = 'indexes'
+
+_ensured_collections = set()
+_collection_locks = {}
+_locks_lock = threading.Lock()
+
+
+def _app_index_modules():
+    for app_config in apps.get_app_configs():
+        module_name = f"{app_config.name}.{INDEX_MODULE}"
+        try:
+            yield import_module(module_name)
+        except ModuleNotFoundError as e:
+            if e.name != module_name:
+                raise
+
+
+def collect_indexes(collection=None):
+    """Every declared index (optionally only those on `collection`)"""
+    specs = []
+    for module in _app_index_modules():
+        specs.extend(getattr(module, 'INDEXES', []))
+    if collection:
+        specs = [spec for spec in specs if spec['collection'] == collection]
+    return specs
+
+
+def collect_query_shapes():
+    shapes = []
+    for module in _app_index_modules():
+        shapes.extend(getattr(module, 'QUERY_SHAPES', []))
+    return shapes
+
+
+def create_declared_index(spec):
+    options = {key: value for key, value in spec.items() if key not in ('collection', 'keys')}
+    return get_db()[spec['collection']].create_index(spec['keys'], **options)
+
+
+def ensure_indexes(collection=None):
+    """
+    Build the declared indexes; creating an index that already exists is a no-op.
+    Returns (created names, {name: error}) - an index whose options changed has
+    to be dropped by hand before it can be rebuilt.
+    """
+    created, failed = [], {}
+    for spec in collect_indexes(collection):
+        try:
+            created.append(create_declared_index(spec))
+        except OperationFailure as e:
+            failed[spec['name']] = str(e)
+    return created, failed
+
+
+def ensure_collection_indexes(collection):
+    """
+    Build the declared indexes of `collection` once per process, for code paths
+    that rely on them. Each collection has its own lock, so a request waiting on
+    one collection's build never blocks requests that touch only other ones.
+    """
+    if collection in _ensured_collections:
+        return
+    with _locks_lock:
+        lock = _collection_locks.setdefault(collection, threading.Lock())
+    with lock:
+        if collection in _ensured_collections:
+            return
+        _, failed = ensure_indexes(collection)
+        for name, error in failed.items():
+            print(f"Could not build index {collection}.{name}: {error}")
+        _ensured_collections.add(collection)
+
+
+def _plan_stages(plan):
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+def explain_query_shape(shape):
+    """Winning-plan stages the server picks for a declared query shape"""
+    command = {'find': shape['collection'], 'filter': shape.get('filter', {})}
+    if shape.get('sort'):
+        command['sort'] = shape['sort']
+    explained = get_db().command('explain', command, verbosity='queryPlanner')
+    return list(_plan_stages(explained['queryPlanner']['winningPlan']))
@@ -0,0 +1,1194 @@
+# utils/memory_store.py
+"""
+In-process stand-in for the parts of pymongo this project uses.
+
+Selected with MONGODB_URI=memory://<name> (see utils/mongo_client.py), and used
+by db_connection.py when MongoDB cannot be reached, so the whole API can run,
+and be benchmarked, without a server. Collections keep documents in insertion
+order; every declared index is a hash index on its first field that narrows
+equality and $in lookups, and unique indexes are enforced. Sorting, projection,
+the update operators, bulk writes and the aggregation stages the views use
+($match, $group, $sort, $limit, $skip, $project, $sample, $unwind, $count) are
+implemented; TTL indexes and transactions are not.
+"""
+import copy
+import random
+import re
+import threading
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError, OperationFailure
+
+_MISSING = object()
+
+
+# -- documents and paths --------------------------------------------------
+
+def _path_values(doc, path):
+    """Every value at dotted `path`, descending through arrays like MongoDB does"""
+    values = [doc]
+    for part in path.split('.'):
+        next_values = []
+        for value in values:
+            if isinstance(value, dict):
+                if part in value:
+                    next_values.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit() and int(part) < len(value):
+                    next_values.append(value[int(part)])
+                else:
+                    next_values.extend(item[part] for item in value if isinstance(item, dict) and part in item)
+        values = next_values
+    return values
+
+
+def _get_path(doc, path, default=None):
+    values = _path_values(doc, path)
+    return values[0] if values else default
+
+
+def _utc(value):
+    """Aware datetimes as naive UTC; MongoDB stores every date in UTC, so naive and aware values compare"""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return ('__list__',) + tuple(_freeze(item) for item in value)
+    if isinstance(value, re.Pattern):
+        return ('__regex__', value.pattern)
+    return _utc(value)
+
+
+_TYPE_ORDER = {type(None): 0, int: 1, float: 1, str: 2, dict: 3, list: 4, ObjectId: 5, bool: 6, datetime: 7}
+
+
+def _sort_value(value):
+    """Key ordering values of different types the way MongoDB compares them"""
+    if value is _MISSING:
+        value = None
+    value = _utc(value)
+    rank = _TYPE_ORDER.get(type(value), 8)
+    if isinstance(value, dict):
+        return rank, tuple((key, _sort_value(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return rank, tuple(_sort_value(item) for item in value)
+    if rank == 8:
+        return rank, str(value)
+    return rank, value
+
+
+def _comparable(a, b):
+    return _TYPE_ORDER.get(type(a), 8) == _TYPE_ORDER.get(type(b), 8) and a is not None and b is not None
+
+
+# -- query matching -------------------------------------------------------
+
+def _match_operator(values, operator, operand, doc_field_present):
+    candidates = values + [item for value in values if isinstance(value, list) for item in value]
+    if operator == '$eq':
+        return _match_value(values, operand)
+    if operator == '$ne':
+        return not _match_value(values, operand)
+    if operator == '$in':
+        return any(_match_value(values, item) for item in operand)
+    if operator == '$nin':
+        return not any(_match_value(values, item) for item in operand)
+    if operator in ('$gt', '$gte', '$lt', '$lte'):
+        operand = _utc(operand)
+        compare = {
+            '$gt': lambda a: a > operand, '$gte': lambda a: a >= operand,
+            '$lt': lambda a: a < operand, '$lte': lambda a: a <= operand,
+        }[operator]
+        return any(_comparable(value, operand) and compare(_utc(value)) for value in candidates)
+    if operator == '$exists':
+        return doc_field_present == bool(operand)
+    if operator == '$regex':
+        return any(isinstance(value, str) and operand.search(value) for value in candidates)
+    if operator == '$all':
+        return all(_match_value(values, item) for item in operand)
+    if operator == '$size':
+        return any(isinstance(value, list) and len(value) == operand for value in values)
+    if operator == '$elemMatch':
+        return any(
+            isinstance(value, list) and any(isinstance(item, dict) and matches(item, operand) for item in value)
+            for value in values
+        )
+    if operator == '$not':
+        return not _match_condition(values, operand, doc_field_present)
+    raise OperationFailure(f"Unsupported query operator {operator} in the in-memory store")
+
+
+def _match_value(values, expected):
+    if isinstance(expected, re.Pattern):
+        return _match_operator(values, '$regex', expected, bool(values))
+    if expected is None:
+        return not values or any(value is None for value in values)
+    expected = _utc(expected)
+    for value in values:
+        if _utc(value) == expected:
+            return True
+        if isinstance(value, list) and not isinstance(expected, list) and any(_utc(item) == expected for item in value):
+            return True
+    return False
+
+
+def _match_condition(values, condition, field_present):
+    if isinstance(condition, dict) and condition and all(key.startswith('$') for key in condition):
+        condition = dict(condition)
+        if '$regex' in condition:
+            pattern = condition.pop('$regex')
+            flags = re.IGNORECASE if 'i' in condition.pop('$options', '') else 0
+            if not isinstance(pattern, re.Pattern):
+                pattern = re.compile(pattern, flags)
+            condition['$regex'] = pattern
+        return all(
+            _match_operator(values, operator, operand, field_present)
+            for operator, operand in condition.items()
+        )
+    return _match_value(values, condition)
+
+
+def matches(doc, query):
+    """True if `doc` satisfies the MongoDB `query`"""
+    for field, condition in (query or {}).items():
+        if field == '$or':
+            if not any(matches(doc, clause) for clause in condition):
+                return False
+        elif field == '$and':
+            if not all(matches(doc, clause) for clause in condition):
+                return False
+        elif field == '$nor':
+            if any(matches(doc, clause) for clause in condition):
+                return False
+        else:
+            values = _path_values(doc, field)
+            if not _match_condition(values, condition, bool(values)):
+                return False
+    return True
+
+
+# -- projection, sorting, updates -----------------------------------------
+
+def _include_path(value, parts):
+    """What an inclusion projection of the dotted path `parts` keeps of the document `value`, or _MISSING"""
+    head, rest = parts[0], parts[1:]
+    if head not in value:
+        return _MISSING
+    child = value[head]
+    if not rest:
+        return {head: copy.deepcopy(child)}
+    if isinstance(child, dict):
+        kept = _include_path(child, rest)
+        return _MISSING if kept is _MISSING else {head: kept}
+    if isinstance(child, list):
+        # Like MongoDB: subdocuments keep what matched (possibly nothing), other elements are dropped
+        kept = [_include_path(item, rest) for item in child if isinstance(item, dict)]
+        return {head: [{} if item is _MISSING else item for item in kept]}
+    return _MISSING
+
+
+def _merge_projected(target, addition):
+    for key, value in addition.items():
+        current = target.get(key)
+        if isinstance(current, dict) and isinstance(value, dict):
+            _merge_projected(current, value)
+        elif isinstance(current, list) and isinstance(value, list):
+            # Both come from the same array, element for element
+            for current_item, item in zip(current, value):
+                _merge_projected(current_item, item)
+        else:
+            target[key] = value
+
+
+def _exclude_path(value, parts):
+    if isinstance(value, list):
+        for item in value:
+            _exclude_path(item, parts)
+    elif isinstance(value, dict):
+        if len(parts) == 1:
+            value.pop(parts[0], None)
+        elif parts[0] in value:
+            _exclude_path(value[parts[0]], parts[1:])
+
+
+def project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = dict.fromkeys(projection, 1)
+    for field, flag in projection.items():
+        if isinstance(flag, dict) or '$' in field:
+            raise OperationFailure(f"Unsupported projection {field}: {flag} in the in-memory store")
+    include_id = projection.get('_id', 1)
+    fields = {field: flag for field, flag in projection.items() if field != '_id'}
+    if any(fields.values()):
+        result = {'_id': doc['_id']} if include_id and '_id' in doc else {}
+        for field in fields:
+            kept = _include_path(doc, field.split('.'))
+            if kept is not _MISSING:
+                _merge_projected(result, kept)
+        return result
+    result = copy.deepcopy(doc)
+    for field in fields:
+        _exclude_path(result, field.split('.'))
+    if not include_id:
+        result.pop('_id', None)
+    return result
+
+
+def _normalize_sort(key_or_list, direction=None):
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return list(key_or_list)
+
+
+def sort_documents(docs, sort_spec):
+    # Stable sorts applied from the least to the most significant key
+    for field, direction in reversed(sort_spec):
+        docs.sort(key=lambda doc: _sort_value(_get_path(doc, field, None)), reverse=direction < 0)
+    return docs
+
+
+def _update_targets(container, parts, array_filters):
+    """(parent, key) pairs that dotted path `parts` addresses, expanding $[] and $[identifier]"""
+    part, rest = parts[0], parts[1:]
+    if isinstance(container, list) and part.startswith('$['):
+        identifier = part[2:-1]
+        indexes = [
+            index for index, item in enumerate(container)
+            if not identifier or matches({identifier: item}, array_filters.get(identifier, {}))
+        ]
+    elif isinstance(container, list):
+        indexes = [int(part)]
+    else:
+        indexes = [part]
+
+    targets = []
+    for index in indexes:
+        if not rest:
+            targets.append((container, index))
+            continue
+        if isinstance(container, dict) and index not in container:
+            container[index] = {}
+        child = container[index]
+        if isinstance(child, (dict, list)):
+            targets.extend(_update_targets(child, rest, array_filters))
+    return targets
+
+
+def _parse_array_filters(array_filters):
+    parsed = {}
+    for array_filter in array_filters or []:
+        for path, condition in array_filter.items():
+            identifier, _, field = path.partition('.')
+            parsed.setdefault(identifier, {})[f"{identifier}.{field}" if field else identifier] = condition
+    return parsed
+
+
+def apply_update(doc, update, array_filters=None, inserting=False):
+    """Apply update operators to `doc` in place"""
+    if not any(key.startswith('$') for key in update):
+        raise OperationFailure("Use replace_one to replace a whole document")
+    filters = _parse_array_filters(array_filters)
+    for operator, fields in update.items():
+        if operator == '$setOnInsert' and not inserting:
+            continue
+        for path, value in fields.items():
+            for parent, key in _update_targets(doc, path.split('.'), filters):
+                if operator in ('$set', '$setOnInsert'):
+                    parent[key] = copy.deepcopy(value)
+                elif operator == '$unset':
+                    if isinstance(parent, dict):
+                        parent.pop(key, None)
+                elif operator == '$inc':
+                    current = parent[key] if (isinstance(parent, list) or key in parent) else 0
+                    parent[key] = current + value
+                elif operator == '$push':
+                    if isinstance(parent, dict) and key not in parent:
+                        parent[key] = []
+                    items = value['$each'] if isinstance(value, dict) and '$each' in value else [value]
+                    parent[key].extend(copy.deepcopy(items))
+                elif operator == '$addToSet':
+                    if isinstance(parent, dict) and key not in parent:
+                        parent[key] = []
+                    items = value['$each'] if isinstance(value, dict) and '$each' in value else [value]
+                    parent[key].extend(copy.deepcopy(item) for item in items if item not in parent[key])
+                elif operator == '$pull':
+                    if isinstance(parent, dict) and key in parent:
+                        parent[key] = [item for item in parent[key] if not _match_value([item], value)]
+                else:
+                    raise OperationFailure(f"Unsupported update operator {operator} in the in-memory store")
+
+
+def _equality_seed(query):
+    """Fields of `query` pinned to one value, used to build upserted documents"""
+    seed = {}
+    for field, condition in (query or {}).items():
+        if field.startswith('$') or '.' in field:
+            continue
+        if isinstance(condition, dict) and any(key.startswith('$') for key in condition):
+            if '$eq' in condition:
+                seed[field] = condition['$eq']
+            continue
+        seed[field] = copy.deepcopy(condition)
+    return seed
+
+
+# -- aggregation ----------------------------------------------------------
+
+def _evaluate(expression, doc):
+    if isinstance(expression, str) and expression.startswith('$'):
+        return _get_path(doc, expression[1:])
+    if isinstance(expression, dict):
+        return {key: _evaluate(value, doc) for key, value in expression.items()}
+    return expression
+
+
+def _group(docs, spec):
+    groups = {}
+    for doc in docs:
+        key = _evaluate(spec['_id'], doc)
+        frozen = _freeze(key)
+        if frozen not in groups:
+            groups[frozen] = {'_id': key, '__state__': {}}
+        group = groups[frozen]
+        for field, accumulator in spec.items():
+            if field == '_id':
+                continue
+            (operator, expression), = accumulator.items()
+            value = _evaluate(expression, doc)
+            state = group['__state__']
+            if operator == '$sum':
+                group[field] = group.get(field, 0) + (value if isinstance(value, (int, float)) else 0)
+            elif operator == '$avg':
+                total, count = state.get(field, (0, 0))
+                if isinstance(value, (int, float)):
+                    total, count = total + value, count + 1
+                state[field] = (total, count)
+                group[field] = total / count if count else None
+            elif operator == '$first':
+                if field not in group:
+                    group[field] = value
+            elif operator == '$last':
+                group[field] = value
+            elif operator == '$max':
+                if value is not None and (group.get(field) is None or value > group[field]):
+                    group[field] = value
+            elif operator == '$min':
+                if value is not None and (group.get(field) is None or value < group[field]):
+                    group[field] = value
+            elif operator == '$push':
+                group.setdefault(field, []).append(value)
+            elif operator == '$addToSet':
+                items = group.setdefault(field, [])
+                if value not in items:
+                    items.append(value)
+            else:
+                raise OperationFailure(f"Unsupported accumulator {operator} in the in-memory store")
+    results = []
+    for group in groups.values():
+        group.pop('__state__')
+        results.append(group)
+    return results
+
+
+def _project_stage(docs, spec):
+    computed = {field: value for field, value in spec.items() if not isinstance(value, (int, bool))}
+    flags = {field: value for field, value in spec.items() if isinstance(value, (int, bool))}
+    results = []
+    for doc in docs:
+        result = project(doc, flags) if flags else dict(doc)
+        if not flags and not computed:
+            result = dict(doc)
+        for field, expression in computed.items():
+            result[field] = _evaluate(expression, doc)
+        results.append(result)
+    return results
+
+
+def run_pipeline(docs, pipeline):
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == '$match':
+            docs = [doc for doc in docs if matches(doc, spec)]
+        elif name == '$group':
+            docs = _group(docs, spec)
+        elif name == '$sort':
+            docs = sort_documents(docs, list(spec.items()))
+        elif name == '$limit':
+            docs = docs[:spec]
+        elif name == '$skip':
+            docs = docs[spec:]
+        elif name == '$project':
+            docs = _project_stage(docs, spec)
+        elif name == '$sample':
+            docs = random.sample(docs, min(spec['size'], len(docs)))
+        elif name == '$unwind':
+            path = spec if isinstance(spec, str) else spec['path']
+            field = path[1:]
+            docs = [
+                dict(doc, **{field: item})
+                for doc in docs
+                for item in (doc.get(field) if isinstance(doc.get(field), list) else [])
+            ]
+        elif name == '$count':
+            docs = [{spec: len(docs)}]
+        else:
+            raise OperationFailure(f"Unsupported aggregation stage {name} in the in-memory store")
+    return docs
+
+
+# -- results and cursors --------------------------------------------------
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+        self.acknowledged = True
+
+
+class InsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+        self.acknowledged = True
+
+
+class UpdateResult:
+    def __init__(self, matched_count, modified_count, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+        self.acknowledged = True
+
+
+class DeleteResult:
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+        self.acknowledged = True
+
+
+class BulkWriteResult:
+    def __init__(self):
+        self.inserted_count = 0
+        self.matched_count = 0
+        self.modified_count = 0
+        self.deleted_count = 0
+        self.upserted_count = 0
+        self.upserted_ids = {}
+        self.acknowledged = True
+
+
+class MemoryCursor:
+    """Lazy cursor: filtering, sorting and slicing happen on first iteration"""
+
+    def __init__(self, collection, query, projection):
+        self.collection = collection
+        self.query = query
+        self.projection = projection
+        self.sort_spec = []
+        self.skip_count = 0
+        self.limit_count = 0
+        self.results = None
+
+    def sort(self, key_or_list, direction=None):
+        self.sort_spec = _normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, count):
+        self.skip_count = count
+        return self
+
+    def limit(self, count):
+        self.limit_count = count
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def _materialize(self):
+        if self.results is None:
+            docs = self.collection._find_documents(self.query)
+            if self.sort_spec:
+                docs = sort_documents(docs, self.sort_spec)
+            docs = docs[self.skip_count:]
+            if self.limit_count:
+                docs = docs[:self.limit_count]
+            self.results = [project(doc, self.projection) for doc in docs]
+        return self.results
+
+    def __iter__(self):
+        return iter(self._materialize())
+
+    def __len__(self):
+        return len(self._materialize())
+
+    def close(self):
+        pass
+
+
+# -- collections ----------------------------------------------------------
+
+class HashIndex:
+    """Maps values of the index's first field to the ids of the documents holding them"""
+
+    def __init__(self, name, keys, unique=False, sparse=False, **options):
+        self.name = name
+        self.keys = keys
+        self.field = keys[0][0]
+        self.unique = unique
+        self.sparse = sparse
+        self.options = options
+        self.entries = {}
+        self.unique_keys = {}
+
+    def _values(self, doc):
+        values = _path_values(doc, self.field)
+        flattened = []
+        for value in values:
+            flattened.extend(value if isinstance(value, list) else [value])
+        return flattened or [None]
+
+    def _unique_key(self, doc):
+        parts = []
+        for field, _ in self.keys:
+            values = _path_values(doc, field)
+            parts.append(_freeze(values[0]) if values else None)
+        if self.sparse and all(part is None for part in parts):
+            return None
+        return tuple(parts)
+
+    def check(self, doc, doc_id=None):
+        if self.unique:
+            key = self._unique_key(doc)
+            if key is not None and self.unique_keys.get(key, doc_id) != doc_id:
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error index: {self.name} dup key: {key}",
+                    11000, {'keyValue': dict(zip((field for field, _ in self.keys), key))}
+                )
+
+    def add(self, doc):
+        for value in self._values(doc):
+            self.entries.setdefault(_freeze(value), set()).add(doc['_id'])
+        if self.unique:
+            key = self._unique_key(doc)
+            if key is not None:
+                self.unique_keys[key] = doc['_id']
+
+    def remove(self, doc):
+        for value in self._values(doc):
+            ids = self.entries.get(_freeze(value))
+            if ids:
+                ids.discard(doc['_id'])
+        if self.unique:
+            key = self._unique_key(doc)
+            if key is not None and self.unique_keys.get(key) == doc['_id']:
+                del self.unique_keys[key]
+
+    def lookup(self, condition):
+        """Candidate ids for a condition on the indexed field, or None if the index cannot help"""
+        if isinstance(condition, dict) and any(key.startswith('$') for key in condition):
+            if set(condition) == {'$in'}:
+                values = condition['$in']
+            elif set(condition) == {'$eq'}:
+                values = [condition['$eq']]
+            else:
+                return None
+        else:
+            values = [condition]
+        if any(isinstance(value, (re.Pattern, dict, list)) or value is None for value in values):
+            return None
+        ids = set()
+        for value in values:
+            ids |= self.entries.get(_freeze(value), set())
+        return ids
+
+
+class MemoryCollection:
+    def __init__(self, database, name, capped=False, max_documents=None):
+        self.database = database
+        self.name = name
+        self.capped = capped
+        self.max_documents = max_documents
+        self.documents = {}  # _id -> document, in insertion order
+        self.positions = {}  # _id -> insertion sequence number, to order index hits
+        self.sequence = 0
+        self.indexes = {'_id_': HashIndex('_id_', [('_id', 1)], unique=True)}
+        self.lock = threading.RLock()
+
+    @property
+    def full_name(self):
+        return f"{self.database.name}.{self.name}"
+
+    # -- indexes
+
+    def create_index(self, keys, name=None, unique=False, sparse=False, **options):
+        keys = _normalize_sort(keys, 1)
+        name = name or '_'.join(f"{field}_{direction}" for field, direction in keys)
+        with self.lock:
+            existing = self.indexes.get(name)
+            if existing:
+                if existing.keys != keys or existing.unique != unique:
+                    raise OperationFailure(f"Index with name: {name} already exists with different options", 85)
+                return name
+            index = HashIndex(name, keys, unique=unique, sparse=sparse, **options)
+            for doc in self.documents.values():
+                index.check(doc, doc['_id'])
+                index.add(doc)
+            self.indexes[name] = index
+            return name
+
+    def list_indexes(self):
+        return [
+            dict({'name': index.name, 'key': dict(index.keys), 'unique': index.unique}, **index.options)
+            for index in self.indexes.values()
+        ]
+
+    def index_information(self):
+        return {index['name']: index for index in self.list_indexes()}
+
+    def drop_index(self, name):
+        with self.lock:
+            self.indexes.pop(name, None)
+
+    def drop(self):
+        self.database.drop_collection(self.name)
+
+    # -- reads
+
+    def _candidate_ids(self, query):
+        candidates = None
+        for index in self.indexes.values():
+            if index.field in (query or {}):
+                ids = index.lookup(query[index.field])
+                if ids is not None:
+                    candidates = ids if candidates is None else candidates & ids
+        return candidates
+
+    def _find_documents(self, query):
+        with self.lock:
+            ids = self._candidate_ids(query)
+            if ids is None:
+                docs = self.documents.values()
+            else:
+                # Keep insertion order so unsorted results match a full scan
+                docs = sorted((self.documents[doc_id] for doc_id in ids if doc_id in self.documents),
+                              key=lambda doc: self.positions[doc['_id']])
+            return [doc for doc in docs if matches(doc, query)]
+
+    def find(self, filter=None, projection=None, batch_size=None, sort=None, limit=0, skip=0, **kwargs):
+        cursor = MemoryCursor(self, filter or {}, projection)
+        if sort:
+            cursor.sort(sort)
+        return cursor.skip(skip).limit(limit)
+
+    def find_one(self, filter=None, projection=None, sort=None, **kwargs):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {'_id': filter}
+        for doc in self.find(filter, projection, sort=sort).limit(1):
+            return doc
+        return None
+
+    def count_documents(self, filter, **kwargs):
+        return len(self._find_documents(filter))
+
+    def estimated_document_count(self, **kwargs):
+        return len(self.documents)
+
+    def distinct(self, key, filter=None, **kwargs):
+        values = []
+        for doc in self._find_documents(filter or {}):
+            for value in _path_values(doc, key):
+                for item in (value if isinstance(value, list) else [value]):
+                    if item not in values:
+                        values.append(item)
+        return values
+
+    def aggregate(self, pipeline, allowDiskUse=False, **kwargs):
+        with self.lock:
+            if pipeline and '$match' in pipeline[0]:
+                docs = self._find_documents(pipeline[0]['$match'])
+                pipeline = pipeline[1:]
+            else:
+                docs = list(self.documents.values())
+            docs = [copy.deepcopy(doc) for doc in docs]
+        return iter(run_pipeline(docs, pipeline))
+
+    # -- writes
+
+    def _insert(self, doc):
+        doc = copy.deepcopy(doc)
+        doc.setdefault('_id', ObjectId())
+        for index in self.indexes.values():
+            index.check(doc)
+        for index in self.indexes.values():
+            index.add(doc)
+        self.documents[doc['_id']] = doc
+        self.sequence += 1
+        self.positions[doc['_id']] = self.sequence
+        if self.capped and self.max_documents and len(self.documents) > self.max_documents:
+            self._remove(next(iter(self.documents.values())))
+        return doc['_id']
+
+    def _remove(self, doc):
+        for index in self.indexes.values():
+            index.remove(doc)
+        del self.documents[doc['_id']]
+        del self.positions[doc['_id']]
+
+    def _replace(self, old, new):
+        for index in self.indexes.values():
+            index.check(new, old['_id'])
+        for index in self.indexes.values():
+            index.remove(old)
+        for index in self.indexes.values():
+            index.add(new)
+        self.documents[old['_id']] = new
+
+    def insert_one(self, document, session=None, **kwargs):
+        with self.lock:
+            inserted_id = self._insert(document)
+        document['_id'] = inserted_id
+        return InsertOneResult(inserted_id)
+
+    def insert_many(self, documents, ordered=True, session=None, **kwargs):
+        inserted_ids, errors = [], []
+        with self.lock:
+            for position, document in enumerate(documents):
+                try:
+                    inserted_id = self._insert(document)
+                except DuplicateKeyError as e:
+                    errors.append({'index': position, 'code': 11000, 'errmsg': str(e),
+                                   'keyValue': (e.details or {}).get('keyValue'), 'op': document})
+                    if ordered:
+                        break
+                    continue
+                document['_id'] = inserted_id
+                inserted_ids.append(inserted_id)
+        if errors:
+            raise BulkWriteError({
+                'writeErrors': errors, 'writeConcernErrors': [], 'nInserted': len(inserted_ids),
+                'nUpserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'upserted': [],
+            })
+        return InsertManyResult(inserted_ids)
+
+    def _update(self, filter, update, upsert, many, array_filters):
+        with self.lock:
+            docs = self._find_documents(filter)
+            if not many:
+                docs = docs[:1]
+            modified = 0
+            for doc in docs:
+                updated = copy.deepcopy(doc)
+                apply_update(updated, update, array_filters)
+                if updated != doc:
+                    self._replace(doc, updated)
+                    modified += 1
+            if docs or not upsert:
+                return UpdateResult(len(docs), modified), docs
+            new_doc = _equality_seed(filter)
+            apply_update(new_doc, update, array_filters, inserting=True)
+            upserted_id = self._insert(new_doc)
+            return UpdateResult(0, 0, upserted_id), []
+
+    def update_one(self, filter, update, upsert=False, array_filters=None, session=None, **kwargs):
+        return self._update(filter, update, upsert, False, array_filters)[0]
+
+    def update_many(self, filter, update, upsert=False, array_filters=None, session=None, **kwargs):
+        return self._update(filter, update, upsert, True, array_filters)[0]
+
+    def replace_one(self, filter, replacement, upsert=False, session=None, **kwargs):
+        with self.lock:
+            docs = self._find_documents(filter)[:1]
+            if docs:
+                new_doc = copy.deepcopy(replacement)
+                new_doc['_id'] = docs[0]['_id']
+                modified = int(new_doc != docs[0])
+                if modified:
+                    self._replace(docs[0], new_doc)
+                return UpdateResult(1, modified)
+            if not upsert:
+                return UpdateResult(0, 0)
+            new_doc = copy.deepcopy(replacement)
+            if '_id' not in new_doc and '_id' in (filter or {}):
+                new_doc['_id'] = filter['_id']
+            return UpdateResult(0, 0, self._insert(new_doc))
+
+    def find_one_and_update(self, filter, update, projection=None, sort=None, upsert=False,
+                            return_document=ReturnDocument.BEFORE, array_filters=None, session=None, **kwargs):
+        with self.lock:
+            docs = self._find_documents(filter)
+            if sort:
+                docs = sort_documents(docs, _normalize_sort(sort))
+            if not docs:
+                if not upsert:
+                    return None
+                new_doc = _equality_seed(filter)
+                apply_update(new_doc, update, array_filters, inserting=True)
+                inserted_id = self._insert(new_doc)
+                return project(self.documents[inserted_id], projection) if return_document else None
+            before = docs[0]
+            updated = copy.deepcopy(before)
+            apply_update(updated, update, array_filters)
+            if updated != before:
+                self._replace(before, updated)
+            return project(updated if return_document else before, projection)
+
+    def find_one_and_delete(self, filter, projection=None, sort=None, session=None, **kwargs):
+        with self.lock:
+            docs = self._find_documents(filter)
+            if sort:
+                docs = sort_documents(docs, _normalize_sort(sort))
+            if not docs:
+                return None
+            self._remove(docs[0])
+            return project(docs[0], projection)
+
+    def delete_one(self, filter, session=None, **kwargs):
+        with self.lock:
+            docs = self._find_documents(filter)[:1]
+            for doc in docs:
+                self._remove(doc)
+            return DeleteResult(len(docs))
+
+    def delete_many(self, filter, session=None, **kwargs):
+        with self.lock:
+            docs = self._find_documents(filter)
+            for doc in docs:
+                self._remove(doc)
+            return DeleteResult(len(docs))
+
+    def bulk_write(self, requests, ordered=True, session=None, **kwargs):
+        """Apply pymongo InsertOne/UpdateOne/UpdateMany/ReplaceOne/DeleteOne/DeleteMany requests"""
+        result = BulkWriteResult()
+        errors = []
+        with self.lock:
+            for position, request in enumerate(requests):
+                kind = type(request).__name__
+                document = getattr(request, '_doc', None)
+                filter = getattr(request, '_filter', None)
+                try:
+                    if kind == 'InsertOne':
+                        self._insert(document)
+                        result.inserted_count += 1
+                    elif kind in ('UpdateOne', 'UpdateMany'):
+                        outcome, _ = self._update(filter, request._doc, request._upsert, kind == 'UpdateMany',
+                                                  getattr(request, '_array_filters', None))
+                        result.matched_count += outcome.matched_count
+                        result.modified_count += outcome.modified_count
+                        if outcome.upserted_id is not None:
+                            result.upserted_count += 1
+                            result.upserted_ids[position] = outcome.upserted_id
+                    elif kind == 'ReplaceOne':
+                        outcome = self.replace_one(filter, request._doc, upsert=request._upsert)
+                        result.matched_count += outcome.matched_count
+                        result.modified_count += outcome.modified_count
+                    elif kind in ('DeleteOne', 'DeleteMany'):
+                        delete = self.delete_many if kind == 'DeleteMany' else self.delete_one
+                        result.deleted_count += delete(filter).deleted_count
+                    else:
+                        raise OperationFailure(f"Unsupported bulk request {kind} in the in-memory store")
+                except DuplicateKeyError as e:
+                    errors.append({'index': position, 'code': 11000, 'errmsg': str(e), 'op': document})
+                    if ordered:
+                        break
+        if errors:
+            raise BulkWriteError({
+                'writeErrors': errors, 'writeConcernErrors': [], 'nInserted': result.inserted_count,
+                'nUpserted': result.upserted_count, 'nMatched': result.matched_count,
+                'nModified': result.modified_count, 'nRemoved': result.deleted_count, 'upserted': [],
+            })
+        return result
+
+    def explain(self, query, sort=None):
+        """
+        A queryPlanner-shaped plan, picked roughly the way MongoDB's planner would.
+
+        An index serves the query when its first field has an indexable condition,
+        when each branch of a top-level $or has such an index (an OR stage), or when
+        its keys, after fields the query pins by equality, give the sort order; the
+        SORT stage is left out in that last case. The store itself only ever uses
+        hash indexes for equality and $in, so this describes the plan MongoDB would
+        run, for `ensure_indexes --check`, not what the store does.
+        """
+        query = _flatten_and(query or {})
+        sort = _normalize_sort(sort) if sort else []
+        filtering = [index for index in self.indexes.values() if _index_filters(index, query)]
+        sorting = [index for index in self.indexes.values() if _index_sorts(index, query, sort)]
+
+        plan, sorted_by_index = None, False
+        both = [index for index in filtering if index in sorting]
+        if both or filtering:
+            index = (both or filtering)[0]
+            plan, sorted_by_index = _fetch(_ixscan(index)), bool(both)
+        elif '$or' in query:
+            rest = {field: condition for field, condition in query.items() if field != '$or'}
+            branches = []
+            for clause in query['$or']:
+                branch = dict(rest, **clause)
+                index = next((index for index in self.indexes.values() if _index_filters(index, branch)), None)
+                if index is None:
+                    break
+                branches.append(_ixscan(index))
+            else:
+                plan = _fetch({'stage': 'OR', 'inputStages': branches})
+        if plan is None and sorting:
+            plan, sorted_by_index = _fetch(_ixscan(sorting[0])), True
+        if plan is None:
+            plan = {'stage': 'COLLSCAN'}
+        if sort and not sorted_by_index:
+            plan = {'stage': 'SORT', 'inputStage': plan}
+        return {'queryPlanner': {'namespace': self.full_name, 'winningPlan': plan}}
+
+
+# Conditions MongoDB can answer from an index on the field
+_INDEXABLE_OPERATORS = {'$eq', '$in', '$all', '$gt', '$gte', '$lt', '$lte', '$regex'}
+
+
+def _flatten_and(query):
+    """`query` with the clauses of a top-level $and merged in, as the planner sees it"""
+    if '$and' not in query:
+        return query
+    flat = {field: condition for field, condition in query.items() if field != '$and'}
+    for clause in query['$and']:
+        clause = _flatten_and(clause)
+        if set(clause) & set(flat):
+            return query
+        flat.update(clause)
+    return flat
+
+
+def _is_operator_condition(condition):
+    return isinstance(condition, dict) and any(key.startswith('$') for key in condition)
+
+
+def _index_filters(index, query):
+    if index.field not in query:
+        return False
+    condition = query[index.field]
+    return not _is_operator_condition(condition) or bool(_INDEXABLE_OPERATORS & set(condition))
+
+
+def _index_sorts(index, query, sort):
+    """Whether walking `index` returns the query's matches already in `sort` order"""
+    if not sort:
+        return False
+    keys = list(index.keys)
+    # Fields pinned to one value by the query don't change the order of the rest
+    while keys and keys[0][0] in query and not _is_operator_condition(query[keys[0][0]]):
+        keys.pop(0)
+    keys = keys[:len(sort)]
+    if [field for field, _ in keys] != [field for field, _ in sort]:
+        return False
+    same = [direction for _, direction in keys] == [direction for _, direction in sort]
+    reversed_ = [-direction for _, direction in keys] == [direction for _, direction in sort]
+    return same or reversed_
+
+
+def _ixscan(index):
+    return {'stage': 'IXSCAN', 'indexName': index.name}
+
+
+def _fetch(input_stage):
+    return {'stage': 'FETCH', 'inputStage': input_stage}
+
+
+# -- databases and clients ------------------------------------------------
+
+class MemoryDatabase:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.collections = {}
+        self.lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self.lock:
+            if name not in self.collections:
+                self.collections[name] = MemoryCollection(self, name)
+            return self.collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name, **kwargs):
+        return self[name]
+
+    def create_collection(self, name, capped=False, size=None, max=None, **kwargs):
+        with self.lock:
+            if name in self.collections:
+                raise CollectionInvalid(f"collection {name} already exists")
+            self.collections[name] = MemoryCollection(self, name, capped=capped, max_documents=max)
+            return self.collections[name]
+
+    def list_collection_names(self, **kwargs):
+        return list(self.collections)
+
+    def drop_collection(self, name, **kwargs):
+        with self.lock:
+            self.collections.pop(name, None)
+
+    def command(self, command, value=1, verbosity=None, **kwargs):
+        if command in ('ping', 'buildInfo', 'serverStatus'):
+            return {'ok': 1.0}
+        if command == 'explain':
+            return self[value['find']].explain(value.get('filter', {}), value.get('sort'))
+        raise OperationFailure(f"Unsupported command {command} in the in-memory store")
+
+
+class MemorySession:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def with_transaction(self, callback, **kwargs):
+        # Same answer a standalone mongod gives, so callers fall back to plain writes
+        raise OperationFailure("Transaction numbers are only allowed on a replica set member or mongos", 20)
+
+    def end_session(self):
+        pass
+
+
+class MemoryClient:
+    """Drop-in for the MongoClient methods the project calls"""
+
+    def __init__(self, uri='memory://', **kwargs):
+        self.uri = uri
+        self.databases = {}
+        self.lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self.lock:
+            if name not in self.databases:
+                self.databases[name] = MemoryDatabase(self, name)
+            return self.databases[name]
+
+    def get_database(self, name, **kwargs):
+        return self[name]
+
+    @property
+    def admin(self):
+        return self['admin']
+
+    def start_session(self, **kwargs):
+        return MemorySession()
+
+    def list_database_names(self):
+        return list(self.databases)
+
+    def close(self):
+        pass
+
+
+# -- async facade ---------------------------------------------------------
+
+# Motor-shaped wrappers used by get_async_client() for memory:// URIs. The
+# store never blocks on I/O, so each call simply runs inline on the event loop.
+
+class AsyncMemoryCursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def sort(self, key_or_list, direction=None):
+        self.cursor.sort(key_or_list, direction)
+        return self
+
+    def skip(self, count):
+        self.cursor.skip(count)
+        return self
+
+    def limit(self, count):
+        self.cursor.limit(count)
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def to_list(self, length=None):
+        docs = list(self.cursor)
+        return docs[:length] if length else docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.cursor:
+            yield doc
+
+
+class AsyncMemoryCollection:
+    def __init__(self, collection):
+        self.collection = collection
+        self.name = collection.name
+
+    def find(self, *args, **kwargs):
+        return AsyncMemoryCursor(self.collection.find(*args, **kwargs))
+
+    def aggregate(self, pipeline, **kwargs):
+        return AsyncMemoryCursor(self.collection.aggregate(pipeline, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+class AsyncMemoryDatabase:
+    def __init__(self, database):
+        self.database = database
+        self.name = database.name
+
+    def __getitem__(self, name):
+        return AsyncMemoryCollection(self.database[name])
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    async def command(self, *args, **kwargs):
+        return self.database.command(*args, **kwargs)
+
+
+class AsyncMemorySession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def with_transaction(self, callback, **kwargs):
+        raise OperationFailure("Transaction numbers are only allowed on a replica set member or mongos", 20)
+
+    async def end_session(self):
+        pass
+
+
+class AsyncMemoryClient:
+    def __init__(self, client):
+        self.client = client
+
+    def __getitem__(self, name):
+        return AsyncMemoryDatabase(self.client[name])
+
+    @property
+    def admin(self):
+        return self['admin']
+
+    async def start_session(self, **kwargs):
+        return AsyncMemorySession()
+
+    def close(self):
+        pass
@@ -0,0 +1,240 @@
+# utils/mongo_client.py
+import os
+import threading
+import time
+import certifi
+from django.conf import settings
+from pymongo import MongoClient, monitoring
+from utils.memory_store import AsyncMemoryClient, MemoryClient
+
+MEMORY_URI_SCHEME = "memory://"
+
+_clients = {}
+_clients_pid = None
+_async_clients = {}
+_async_clients_pid = None
+_lock = threading.Lock()
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Counts connection pool activity per server from pymongo's monitoring events.
+
+    Checkout wait is the time between a thread asking the pool for a connection
+    and getting one; it grows when maxPoolSize is too small for the load.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.pools = {}
+
+    def _pool(self, address):
+        key = f"{address[0]}:{address[1]}"
+        pool = self.pools.get(key)
+        if pool is None:
+            pool = self.pools[key] = {
+                "connections_created": 0,
+                "connections_closed": 0,
+                "checkouts": 0,
+                "checkout_failures": 0,
+                "checked_out": 0,
+                "wait_ms_total": 0.0,
+                "wait_ms_max": 0.0,
+                "pool_clears": 0,
+            }
+        return pool
+
+    def _bump(self, address, field, amount=1):
+        with self.lock:
+            self._pool(address)[field] += amount
+
+    def pool_created(self, event):
+        with self.lock:
+            self._pool(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._bump(event.address, "pool_clears")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._bump(event.address, "connections_created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._bump(event.address, "connections_closed")
+
+    def connection_check_out_started(self, event):
+        # Check-out events fire on the thread doing the check-out
+        self.local.started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self.local.started = None
+        self._bump(event.address, "checkout_failures")
+
+    def connection_checked_out(self, event):
+        started = getattr(self.local, "started", None)
+        self.local.started = None
+        wait_ms = (time.perf_counter() - started) * 1000 if started else 0.0
+        with self.lock:
+            pool = self._pool(event.address)
+            pool["checkouts"] += 1
+            pool["checked_out"] += 1
+            pool["wait_ms_total"] += wait_ms
+            pool["wait_ms_max"] = max(pool["wait_ms_max"], wait_ms)
+
+    def connection_checked_in(self, event):
+        self._bump(event.address, "checked_out", -1)
+
+    def stats(self):
+        with self.lock:
+            pools = {}
+            for address, pool in self.pools.items():
+                pools[address] = dict(
+                    pool,
+                    wait_ms_total=round(pool["wait_ms_total"], 2),
+                    wait_ms_max=round(pool["wait_ms_max"], 2),
+                    wait_ms_avg=round(pool["wait_ms_total"] / pool["checkouts"], 2) if pool["checkouts"] else 0.0,
+                )
+            return pools
+
+
+pool_stats = PoolStatsListener()
+
+
+def _client_options(uri):
+    options = {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+        "event_listeners": [pool_stats],
+        # Don't open sockets at import time; the first operation connects
+        "connect": False,
+    }
+    lowered = (uri or "").lower()
+    if lowered.startswith("mongodb+srv://") or "tls=true" in lowered or "ssl=true" in lowered:
+        options["tlsCAFile"] = certifi.where()
+    return options
+
+
+def get_client(uri=None):
+    """
+    The process-wide MongoClient for `uri` (MONGODB_URI by default).
+
+    Clients are created on first use and shared by every thread. A client
+    inherited across fork() is not reused: the child process builds its own,
+    since pymongo clients are not fork-safe. A `memory://` URI selects the
+    in-process store from utils/memory_store.py instead of a server.
+    """
+    global _clients_pid
+    uri = uri or settings.MONGODB_URI
+    pid = os.getpid()
+    if _clients_pid == pid and uri in _clients:
+        return _clients[uri]
+
+    with _lock:
+        if _clients_pid != pid:
+            # Forked: the parent's sockets and monitor threads are not ours to use or close
+            _clients.clear()
+            _clients_pid = pid
+        if uri not in _clients:
+            if uri.startswith(MEMORY_URI_SCHEME):
+                _clients[uri] = MemoryClient(uri)
+            else:
+                _clients[uri] = MongoClient(uri, **_client_options(uri))
+        return _clients[uri]
+
+
+def get_db(name=None):
+    """The application database (MONGODB_DB by default) on the shared client"""
+    return get_client()[name or settings.MONGODB_DB]
+
+
+def get_async_client(uri=None):
+    """
+    The process-wide motor client for `uri`, for the async views.
+
+    Motor clients belong to the event loop they were created on, which for
+    the ASGI server (examgenie/asgi.py) is the one loop it runs for its whole
+    life; close_async_clients() is awaited on it at lifespan shutdown. A client
+    whose loop has since closed is replaced, never kept alongside the new one,
+    and asking for a client from a second running loop is an error. A
+    `memory://` URI gets an async view of the same in-process store that
+    get_client() returns.
+    """
+    global _async_clients_pid
+    import asyncio
+    uri = uri or settings.MONGODB_URI
+    loop = asyncio.get_running_loop()
+    pid = os.getpid()
+    memory_client = get_client(uri) if uri.startswith(MEMORY_URI_SCHEME) else None
+
+    with _lock:
+        if _async_clients_pid != pid:
+            _async_clients.clear()
+            _async_clients_pid = pid
+        entry = _async_clients.get(uri)
+        if entry is not None and entry[0] is not loop:
+            if not entry[0].is_closed():
+                raise RuntimeError(
+                    "The async MongoDB client belongs to another running event loop; "
+                    "serve the async views through examgenie.asgi"
+                )
+            # Its loop is gone, so nothing can await it again; release its sockets
+            entry[1].close()
+            entry = None
+        if entry is None:
+            if memory_client:
+                instance = AsyncMemoryClient(memory_client)
+            else:
+                # Only the async views need motor
+                from motor.motor_asyncio import AsyncIOMotorClient
+                options = _client_options(uri)
+                options.pop("connect")
+                instance = AsyncIOMotorClient(uri, io_loop=loop, **options)
+            entry = _async_clients[uri] = (loop, instance)
+        return entry[1]
+
+
+async def close_async_clients():
+    """Close the motor clients created on the running loop (ASGI lifespan shutdown)"""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    with _lock:
+        entries = [(uri, entry) for uri, entry in _async_clients.items() if entry[0] is loop]
+        for uri, _ in entries:
+            del _async_clients[uri]
+    for _, (_, client) in entries:
+        client.close()
+
+
+def get_async_db(name=None):
+    """The application database on the running loop's async client"""
+    return get_async_client()[name or settings.MONGODB_DB]
+
+
+class LazyDatabase:
+    """
+    Module-level stand-in for a pymongo Database that resolves the shared
+    client on first use, so importing a module never opens a connection.
+    """
+
+    def __init__(self, name=None):
+        self._name = name
+
+    def __getitem__(self, collection_name):
+        return get_db(self._name)[collection_name]
+
+    def __getattr__(self, attr):
+        return getattr(get_db(self._name), attr)
+
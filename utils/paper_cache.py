@@ -0,0 +1,190 @@
+# utils/paper_cache.py
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+
+
+class PaperCache:
+    """
+    Read-through cache of serialized papers.
+
+    Entries are keyed by paper id and a per-paper version that every write
+    bumps, so a stale copy can never be read back once its paper changed. An
+    in-process LRU sits in front of an optional shared Django cache backend;
+    with a shared backend the versions live there too, so a write in one
+    process invalidates the copies held by every other process. Without one,
+    invalidation is per process: another worker keeps serving its copy until it
+    expires, `timeout` seconds after it was cached, so that mode is only exact
+    with a single worker. There the "version" is a process-wide invalidation
+    clock read when a load starts; a load's result is only kept if its paper
+    was not invalidated since, and only the last `max_entries` invalidations
+    are remembered (older ones raise a floor every load must have started
+    after), so the bookkeeping stays bounded. Only published papers are cached,
+    since drafts still change while they are generated.
+    """
+
+    def __init__(self, max_entries, backend=None, timeout=3600):
+        self.max_entries = max_entries
+        self.shared = caches[backend] if backend else None
+        self.timeout = timeout
+        self.memory = OrderedDict()  # paper id -> (version, serialized paper, expiry on the monotonic clock)
+        # Without a shared backend: paper id -> clock value of its last invalidation
+        self.invalidated = OrderedDict()
+        self.clock = 0
+        self.floor = 0
+        self.lock = threading.Lock()
+        self.counters = {'memory_hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def _version_key(self, paper_id):
+        return f"paper-version:{paper_id}"
+
+    def _data_key(self, paper_id, version):
+        return f"paper:{paper_id}:v{version}"
+
+    def current_version(self, paper_id):
+        if self.shared:
+            return self.shared.get(self._version_key(paper_id), 0)
+        with self.lock:
+            return self.clock
+
+    def get_or_load(self, paper_id, loader):
+        """Return the serialized paper, calling `loader()` (which may return None) on a miss"""
+        paper_id = str(paper_id)
+        # Read the version before loading: a write that lands while we load bumps it,
+        # and the copy we are about to store then goes in under the old, unreachable version
+        version = self.current_version(paper_id)
+
+        data = self._memory_hit(paper_id, version)
+        if data is not None:
+            return data
+
+        if self.shared:
+            data = self.shared.get(self._data_key(paper_id, version))
+            if data is not None:
+                self._remember(paper_id, version, data)
+                self._count('shared_hits')
+                return data
+
+        self._count('misses')
+        data = loader()
+        if self._cacheable(data):
+            self._remember(paper_id, version, data)
+            if self.shared:
+                self.shared.set(self._data_key(paper_id, version), data, self.timeout)
+        return data
+
+    async def aget_or_load(self, paper_id, loader):
+        """get_or_load for async views: `loader` is a coroutine function, the shared backend is awaited"""
+        paper_id = str(paper_id)
+        if self.shared:
+            version = await self.shared.aget(self._version_key(paper_id), 0)
+        else:
+            version = self.current_version(paper_id)
+
+        data = self._memory_hit(paper_id, version)
+        if data is not None:
+            return data
+
+        if self.shared:
+            data = await self.shared.aget(self._data_key(paper_id, version))
+            if data is not None:
+                self._remember(paper_id, version, data)
+                self._count('shared_hits')
+                return data
+
+        self._count('misses')
+        data = await loader()
+        if self._cacheable(data):
+            self._remember(paper_id, version, data)
+            if self.shared:
+                await self.shared.aset(self._data_key(paper_id, version), data, self.timeout)
+        return data
+
+    def invalidate(self, paper_id):
+        paper_id = str(paper_id)
+        with self.lock:
+            self.memory.pop(paper_id, None)
+            if not self.shared:
+                self.clock += 1
+                self.invalidated[paper_id] = self.clock
+                self.invalidated.move_to_end(paper_id)
+                while len(self.invalidated) > self.max_entries:
+                    _, self.floor = self.invalidated.popitem(last=False)
+        if self.shared:
+            version_key = self._version_key(paper_id)
+            # add() is a no-op if the key exists; incr() then bumps it atomically
+            self.shared.add(version_key, 0, None)
+            self.shared.incr(version_key)
+        self._count('invalidations')
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+            counters['memory_size'] = len(self.memory)
+            counters['tracked_invalidations'] = len(self.invalidated)
+        counters['shared_backend'] = bool(self.shared)
+        return counters
+
+    def _memory_hit(self, paper_id, version):
+        with self.lock:
+            entry = self.memory.get(paper_id)
+            # Without a shared backend invalidate() drops the entry itself
+            if entry and (entry[0] == version or not self.shared):
+                if entry[2] <= time.monotonic():
+                    del self.memory[paper_id]
+                    return None
+                self.memory.move_to_end(paper_id)
+                self.counters['memory_hits'] += 1
+                return entry[1]
+        return None
+
+    def _cacheable(self, data):
+        # Drafts still change while they are generated
+        return data is not None and data.get('status') == 'published'
+
+    def _remember(self, paper_id, version, data):
+        with self.lock:
+            if not self.shared and version < self.invalidated.get(paper_id, self.floor):
+                # Invalidated (or possibly so) while it was loading
+                return
+            self.memory[paper_id] = (version, data, time.monotonic() + self.timeout)
+            self.memory.move_to_end(paper_id)
+            while len(self.memory) > self.max_entries:
+                self.memory.popitem(last=False)
+
+    def _count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+
+_paper_cache = None
+_paper_cache_lock = threading.Lock()
+
+
+def get_paper_cache():
+    """Return the process-wide paper cache"""
+    global _paper_cache
+    with _paper_cache_lock:
+        if _paper_cache is None:
+            if not settings.PAPER_CACHE_BACKEND:
+                print(
+                    "Paper cache is in-process only: with more than one worker, an edit reaches other "
+                    f"workers' copies after up to PAPER_CACHE_TIMEOUT ({settings.PAPER_CACHE_TIMEOUT}s). "
+                    "Set PAPER_CACHE_REDIS_URL to share the cache."
+                )
+            _paper_cache = PaperCache(
+                max_entries=settings.PAPER_CACHE_ENTRIES,
+                backend=settings.PAPER_CACHE_BACKEND or None,
+                timeout=settings.PAPER_CACHE_TIMEOUT,
+            )
+    return _paper_cache
+
+
+def invalidate_paper(paper_id):
+    """Drop every cached copy of a paper; call after any write to it, its sections or its questions"""
+    try:
+        get_paper_cache().invalidate(paper_id)
+    except Exception as e:
+        print(f"Paper cache invalidation failed for {paper_id}: {e}")
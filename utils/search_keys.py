@@ -0,0 +1,28 @@
+# utils/search_keys.py
+import re
+import unicodedata
+
+
+def fold_text(text):
+    """Lowercase, strip accents and collapse everything but letters and digits to single spaces"""
+    text = unicodedata.normalize('NFKD', str(text or ''))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return re.sub(r'[\W_]+', ' ', text.casefold()).strip()
+
+
+def subject_key(subject_name):
+    """'Data Structures & Algorithms' -> 'data structures algorithms'"""
+    return fold_text(subject_name)
+
+
+def code_key(subject_code):
+    """'414 441-A' -> '414441a'"""
+    return fold_text(subject_code).replace(' ', '')
+
+
+def subject_search_fields(subject_name, subject_code):
+    """Normalized keys stored on each previous-year question so subject searches can use an index"""
+    return {
+        "subject_key": subject_key(subject_name),
+        "subject_code_key": code_key(subject_code),
+    }